@@ -0,0 +1,268 @@
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from sqlalchemy import Date, bindparam, func, select
+from models import db, Data, DataDailyRollup, Ship, SamplePoint
+from timebucket import date_bucket, BUCKETS
+import partitions
+
+# Declarative GROUP BY over the sample data, behind /api/aggregate and the
+# count/average endpoints.
+#
+# A Spec names the dimensions to group by (categorical columns and at most one
+# time bucket), the metrics, an inclusive date range and IN filters on the
+# categorical dimensions. Everything is checked against the whitelists below
+# and compiled to one SELECT:
+#   - against the daily rollup when the metrics are counts and averages (the
+#     rollup keeps sums and non-null counts, so averages stay exact);
+#   - against Data (hot table plus the archived years in range) for min/max.
+# Statements are built once per shape (dimensions, metrics, which filters are
+# present, archived years read) with bound parameters for the values, so a
+# repeated shape skips both building the statement and SQLAlchemy's SQL
+# compilation; only the parameters change.
+
+# Categorical dimensions; each is also a filter
+DIMENSIONS = ['Ship', 'Samp_Type', 'vlims_lo_samp_point_Desc']
+
+PARTICLE_COLUMNS = {
+    '4_micron': 'VLIMS_PARTICLE_COUNT_4_MICRON_SCALE',
+    '6_micron': 'VLIMS_PARTICLE_COUNT_6_MICRON_SCALE',
+    '14_micron': 'VLIMS_PARTICLE_COUNT_14_MICRON_SCALE',
+}
+
+METRICS = ['count'] + [f'{kind}_{size}' for kind in ('avg', 'min', 'max') for size in PARTICLE_COLUMNS]
+
+# Metrics the daily rollup can answer
+ROLLUP_METRICS = {'count'} | {f'avg_{size}' for size in PARTICLE_COLUMNS}
+
+# Distinct statement shapes kept compiled
+STATEMENT_CACHE_SIZE = 512
+
+Spec = namedtuple('Spec', ['dimensions', 'metrics', 'start_date', 'end_date', 'filters'])
+Spec.__doc__ = """One aggregation: tuples of dimension and metric names, optional dates, ((dimension, values), ...) filters."""
+
+
+def spec(dimensions=(), metrics=('count',), start_date=None, end_date=None, **filters):
+    """Build and validate a Spec; filters are dimension=value or dimension=[values]. Raises ValueError."""
+    dimensions, metrics = tuple(dimensions), tuple(metrics)
+    for name in dimensions:
+        if name not in DIMENSIONS and name not in BUCKETS:
+            raise ValueError(f"Unknown dimension {name!r}. Use any of: {', '.join(DIMENSIONS + BUCKETS)}")
+    if len(set(dimensions)) != len(dimensions):
+        raise ValueError("Dimensions must not repeat")
+    if sum(name in BUCKETS for name in dimensions) > 1:
+        raise ValueError(f"Use at most one time bucket ({', '.join(BUCKETS)})")
+    if not metrics:
+        raise ValueError("At least one metric is required")
+    for name in metrics:
+        if name not in METRICS:
+            raise ValueError(f"Unknown metric {name!r}. Use any of: {', '.join(METRICS)}")
+    if len(set(metrics)) != len(metrics):
+        raise ValueError("Metrics must not repeat")
+
+    normalised = []
+    for name in sorted(filters):
+        if name not in DIMENSIONS:
+            raise ValueError(f"Unknown filter {name!r}. Use any of: {', '.join(DIMENSIONS)}")
+        values = filters[name]
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        if not values:
+            raise ValueError(f"Filter {name!r} needs at least one value")
+        normalised.append((name, tuple(values)))
+    return Spec(dimensions, metrics, start_date, end_date, tuple(normalised))
+
+
+def _list(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else []
+
+
+def _date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def parse_dates(args, required=False):
+    """{'start_date': date, 'end_date': date} from query parameters. Raises ValueError.
+
+    Either date may be left out unless `required`, in which case both must be given.
+    """
+    if required:
+        if not args.get('start_date') or not args.get('end_date'):
+            raise ValueError("Missing required parameters")
+        try:
+            return {'start_date': _date(args['start_date']), 'end_date': _date(args['end_date'])}
+        except ValueError:
+            raise ValueError("Invalid date format. Use YYYY-MM-DD")
+
+    dates = {}
+    for name in ('start_date', 'end_date'):
+        if args.get(name):
+            try:
+                dates[name] = _date(args[name])
+            except ValueError:
+                raise ValueError(f"Invalid {name} format. Use YYYY-MM-DD")
+    return dates
+
+
+def parse_args(args, alias=None, required_dates=False):
+    """Spec from /api/aggregate query parameters (a werkzeug MultiDict). Raises ValueError.
+
+    The count/average routes are aliases: they pass their fixed Spec (see
+    queries.py) as `alias`, and only its dates are taken from `args`.
+    """
+    dates = parse_dates(args, required_dates)
+    if alias is not None:
+        return alias._replace(**dates)
+    filters = {name: args.getlist(name) for name in DIMENSIONS if name in args}
+    return spec(_list(args.get('dimensions')), _list(args.get('metrics')) or ['count'], **dates, **filters)
+
+
+def _uses_rollup(spec):
+    return set(spec.metrics) <= ROLLUP_METRICS
+
+
+def _archived_years(spec):
+    first = spec.start_date.year if spec.start_date else None
+    last = spec.end_date.year if spec.end_date else None
+    return tuple(
+        year for year in partitions.archived_years()
+        if (first is None or year >= first) and (last is None or year <= last)
+    )
+
+
+def _date_filters(testdate, has_start, has_end):
+    filters = []
+    if has_start:
+        filters.append(testdate >= bindparam('start_date', type_=Date))
+    if has_end:
+        filters.append(testdate <= bindparam('end_date', type_=Date))
+    return filters
+
+
+def _rollup_statement(dimensions, metrics, has_start, has_end, filtered):
+    table = DataDailyRollup
+    columns, group_by = [], []
+    for name in dimensions:
+        if name == 'Ship':
+            columns.append(Ship.name.label(name))
+            group_by.append(Ship.id)
+        elif name == 'vlims_lo_samp_point_Desc':
+            columns.append(SamplePoint.name.label(name))
+            group_by.append(SamplePoint.id)
+        elif name == 'Samp_Type':
+            columns.append(table.Samp_Type.label(name))
+            group_by.append(table.Samp_Type)
+        else:
+            bucket = date_bucket(name, table.testdate)
+            columns.append(bucket.label(name))
+            group_by.append(bucket)
+
+    for name in metrics:
+        if name == 'count':
+            # An ungrouped SUM over no rows is NULL; a count of none is 0
+            columns.append(func.coalesce(func.sum(table.sample_count), 0).label(name))
+        else:
+            size = name[len('avg_'):]
+            # Sums and non-null counts are added up before dividing: the same average AVG() gives over Data
+            columns.append((func.sum(getattr(table, f'sum_{size}')) /
+                            func.nullif(func.sum(getattr(table, f'count_{size}')), 0)).label(name))
+
+    statement = select(*columns).select_from(table)
+    if 'Ship' in dimensions or 'Ship' in filtered:
+        statement = statement.join(Ship, table.ship_id == Ship.id)
+    if 'vlims_lo_samp_point_Desc' in dimensions or 'vlims_lo_samp_point_Desc' in filtered:
+        statement = statement.outerjoin(SamplePoint, table.sample_point_id == SamplePoint.id)
+
+    names = {'Ship': Ship.name, 'Samp_Type': table.Samp_Type, 'vlims_lo_samp_point_Desc': SamplePoint.name}
+    filters = [names[name].in_(bindparam(name, expanding=True)) for name in filtered]
+    filters += _date_filters(table.testdate, has_start, has_end)
+    return statement.where(*filters).group_by(*group_by).order_by(*columns[:len(dimensions)])
+
+
+def _data_statement(dimensions, metrics, has_start, has_end, filtered, years):
+    data = partitions.data_source(min(years), max(years)) if years else Data
+    columns = []
+    for name in dimensions:
+        column = getattr(data, name) if name in DIMENSIONS else date_bucket(name, data.testdate)
+        columns.append(column.label(name))
+
+    aggregates = {'avg': func.avg, 'min': func.min, 'max': func.max}
+    for name in metrics:
+        if name == 'count':
+            columns.append(func.count().label(name))
+        else:
+            kind, size = name.split('_', 1)
+            columns.append(aggregates[kind](getattr(data, PARTICLE_COLUMNS[size])).label(name))
+
+    # Ship and sample point filters go through the integer keys, which the indexes cover
+    filters = []
+    for name in filtered:
+        values = bindparam(name, expanding=True)
+        if name == 'Ship':
+            filters.append(data.ship_id.in_(select(Ship.id).where(Ship.name.in_(values))))
+        elif name == 'vlims_lo_samp_point_Desc':
+            filters.append(data.sample_point_id.in_(select(SamplePoint.id).where(SamplePoint.name.in_(values))))
+        else:
+            filters.append(data.Samp_Type.in_(values))
+    filters += _date_filters(data.testdate, has_start, has_end)
+
+    groups = columns[:len(dimensions)]
+    return select(*columns).where(*filters).group_by(*groups).order_by(*groups)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _statement(dimensions, metrics, has_start, has_end, filtered, years):
+    if years is None:
+        return _rollup_statement(dimensions, metrics, has_start, has_end, filtered)
+    return _data_statement(dimensions, metrics, has_start, has_end, filtered, years)
+
+
+def statement(spec):
+    """The SELECT for a Spec with its values bound; one column per dimension, then per metric."""
+    years = None if _uses_rollup(spec) else _archived_years(spec)
+    template = _statement(
+        spec.dimensions, spec.metrics, spec.start_date is not None, spec.end_date is not None,
+        tuple(name for name, _ in spec.filters), years
+    )
+    values = {name: list(values) for name, values in spec.filters}
+    if spec.start_date is not None:
+        values['start_date'] = spec.start_date
+    if spec.end_date is not None:
+        values['end_date'] = spec.end_date
+    return template.params(values) if values else template
+
+
+def statement_cache_info():
+    """Hits, misses and size of the compiled statement cache."""
+    info = _statement.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+def run(spec, store=None):
+    """Rows for a Spec, with attributes named after its dimensions and metrics.
+
+    With a columnar store (ANALYTICS_ENGINE = 'memory') grouped specs without a
+    time bucket are answered from memory; everything else runs as SQL.
+    """
+    if store is not None and spec.dimensions and not any(name in BUCKETS for name in spec.dimensions):
+        return store.aggregate(
+            list(spec.dimensions), spec.start_date, spec.end_date,
+            **{name: list(values) for name, values in spec.filters}
+        )
+    return db.session.execute(statement(spec)).all()
+
+
+def to_dict(row, spec):
+    """A result row as {dimension or metric: value}; dates as YYYY-MM-DD, counts as int."""
+    values = row._asdict()
+    item = {}
+    for name in spec.dimensions + spec.metrics:
+        value = values[name]
+        if name in BUCKETS and value is not None and not isinstance(value, str):
+            value = value.strftime('%Y-%m-%d')
+        elif name == 'count':
+            value = int(value)
+        elif value is not None and name in METRICS:
+            value = float(value)
+        item[name] = value
+    return item
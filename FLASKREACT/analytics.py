@@ -0,0 +1,618 @@
+from flask import Blueprint, current_app, request, jsonify, session, Response, stream_with_context
+from models import db, Ship, SamplePoint
+from sqlalchemy import func, or_, select
+from extensions import response_cache, columnar_store
+import rollup
+import queries
+import aggregate
+import partitions
+import cleanliness
+import sketches
+import ingest
+import streaming
+import export
+from timebucket import date_bucket, BUCKETS
+from downsample import lttb
+import metrics
+import routing
+import serialization
+from datetime import datetime, date
+
+# Read-only analytics routes (/api/...), the lab data import and /metrics.
+
+bp = Blueprint('analytics', __name__)
+
+
+@bp.before_request
+def _read_from_replica():
+    # GET routes only read; the import (POST) stays on the primary
+    if request.method == 'GET':
+        routing.use_replica()
+
+
+def _aggregate_alias(aliases, respond, required_dates=False, shaped=False):
+    """Serve a count/average route, an alias of /api/aggregate for fixed Specs.
+
+    Each of `aliases` (see queries.py) gets the request's dates through
+    aggregate.parse_args() and is run with aggregate.run(); `respond(specs,
+    results, stats)` builds the response from one result list per Spec.
+    `shaped` routes also take `format` and percentile `stats`. Invalid
+    parameters are a 400, a failed query a 500.
+    """
+    try:
+        specs = [aggregate.parse_args(request.args, alias, required_dates) for alias in aliases]
+        if shaped and serialization.requested_format() is None:
+            raise ValueError(f"Invalid format. Use one of: {', '.join(serialization.FORMATS)}")
+        # Optional percentiles, e.g. stats=p50,p90,p99
+        stats = sketches.parse_stats(request.args['stats']) if shaped and request.args.get('stats') else []
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        return respond(specs, [aggregate.run(spec, columnar_store()) for spec in specs], stats)
+    except Exception as e:
+        db.session.rollback()  # Rollback in case of error
+        return jsonify({'error': str(e)}), 500  # Internal Server Error
+
+
+def _respond_counts(specs, results, stats):
+    return serialization.respond(queries.format_counts(results[0]))  # JSON, or MessagePack if preferred
+
+
+@bp.route("/api/sample-type-count", methods=["GET"])
+@response_cache.cached
+def get_sample_type_count():
+    """Fetch count of each Samp_Type within a date range."""
+    return _aggregate_alias([queries.sample_type_counts()], _respond_counts)
+
+
+@bp.route("/api/ship-hcu-count", methods=["GET"])
+@response_cache.cached
+def get_ship_hcu_count():
+    """Fetch count of 'HCU' in Samp_Type for each unique ship within a date range."""
+    return _aggregate_alias([queries.ship_counts("HCU")], _respond_counts)
+
+
+@bp.route("/api/purifier-count", methods=["GET"])
+@response_cache.cached
+def get_purifier_count():
+    """Fetch count of 'Purifier' in Samp_Type for each unique ship within a date range."""
+    return _aggregate_alias([queries.ship_counts("Purifier")], _respond_counts)
+
+
+@bp.route('/api/aggregate', methods=['GET'])
+@response_cache.cached
+def get_aggregate():
+    """Grouped counts and particle statistics, described by query parameters.
+
+    `dimensions`: comma-separated, any of Ship, Samp_Type, vlims_lo_samp_point_Desc
+    and at most one of day, week, month. `metrics`: comma-separated, count (the
+    default) and avg_/min_/max_ of 4_micron, 6_micron, 14_micron. Filters:
+    optional `start_date` / `end_date` (inclusive) and Ship, Samp_Type or
+    vlims_lo_samp_point_Desc, each repeatable to allow several values.
+    """
+    try:
+        spec = aggregate.parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if serialization.requested_format() is None:
+        return jsonify({'error': f"Invalid format. Use one of: {', '.join(serialization.FORMATS)}"}), 400
+
+    try:
+        data_list = [aggregate.to_dict(row, spec) for row in aggregate.run(spec, columnar_store())]
+        return serialization.respond(serialization.shape(data_list, [*spec.dimensions, *spec.metrics]))
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/ships', methods=['GET'])
+@response_cache.cached
+def get_ships():
+    try:
+        # Read from the ship dimension table rather than a DISTINCT over Data
+        ships = db.session.query(Ship.name).order_by(Ship.name).all()
+        ship_names = [ship[0] for ship in ships if ship[0]]
+        return serialization.respond(ship_names)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+HCU_DETAIL_FIELDS = [
+    'Ship', 'Sample_Point', 'Test_Date',
+    'Particle_Count_4_Micron', 'Particle_Count_6_Micron', 'Particle_Count_14_Micron'
+]
+
+
+def _hcu_detail_row(row):
+    return {
+        'Ship': row.Ship,
+        'Sample_Point': row.vlims_lo_samp_point_Desc,
+        'Test_Date': row.testdate.strftime('%Y-%m-%d'),
+        'Particle_Count_4_Micron': row.VLIMS_PARTICLE_COUNT_4_MICRON_SCALE or 0.0,
+        'Particle_Count_6_Micron': row.VLIMS_PARTICLE_COUNT_6_MICRON_SCALE or 0.0,
+        'Particle_Count_14_Micron': row.VLIMS_PARTICLE_COUNT_14_MICRON_SCALE or 0.0
+    }
+
+
+PARTICLE_FIELDS = [
+    ('VLIMS_PARTICLE_COUNT_4_MICRON_SCALE', '4_Micron'),
+    ('VLIMS_PARTICLE_COUNT_6_MICRON_SCALE', '6_Micron'),
+    ('VLIMS_PARTICLE_COUNT_14_MICRON_SCALE', '14_Micron'),
+]
+
+
+def _hcu_details_by_bucket(data, ship_name, filters, bucket):
+    """Per sample point and day/week/month: sample count plus mean/min/max of each particle column.
+
+    `data` is Data or the partition route from partitions.data_source().
+    """
+    bucket_start = date_bucket(bucket, data.testdate).label('bucket_start')
+    sample_point = SamplePoint.name.label('vlims_lo_samp_point_Desc')
+    aggregates = []
+    for column, suffix in PARTICLE_FIELDS:
+        aggregates += [
+            func.avg(getattr(data, column)).label(f'avg_{suffix}'),
+            func.min(getattr(data, column)).label(f'min_{suffix}'),
+            func.max(getattr(data, column)).label(f'max_{suffix}'),
+        ]
+
+    results = db.session.query(
+        sample_point,
+        bucket_start,
+        func.count(data.id).label('sample_count'),
+        *aggregates
+    ).select_from(data).join(
+        SamplePoint, data.sample_point_id == SamplePoint.id
+    ).filter(*filters).group_by(
+        SamplePoint.id, bucket_start
+    ).order_by(bucket_start, sample_point).all()
+
+    data_list = []
+    for row in results:
+        item = {
+            'Ship': ship_name,
+            'Sample_Point': row.vlims_lo_samp_point_Desc,
+            'Bucket_Start': row.bucket_start.strftime('%Y-%m-%d'),
+            'Count': row.sample_count
+        }
+        for _, suffix in PARTICLE_FIELDS:
+            for stat, prefix in (('avg', 'Average'), ('min', 'Min'), ('max', 'Max')):
+                value = getattr(row, f'{stat}_{suffix}')
+                item[f'{prefix}_Particle_Count_{suffix}'] = round(value, 2) if value else 0.0
+        data_list.append(item)
+    return data_list
+
+
+def _downsample_hcu_series(results, points):
+    """Keep at most `points` rows of each HCU series, picked by LTTB over its three particle lines at once.
+
+    Each line is scaled to its range first, so the small 14 micron counts weigh
+    as much as the 4 micron ones.
+    """
+    series = {}
+    for index, row in enumerate(results):
+        series.setdefault(row.vlims_lo_samp_point_Desc, []).append(index)
+
+    keep = []
+    for indices in series.values():
+        lines = []
+        for column, _ in PARTICLE_FIELDS:
+            values = [getattr(results[i], column) or 0.0 for i in indices]
+            scale = (max(values) - min(values)) or 1.0
+            lines.append([value / scale for value in values])
+        line = [(results[i].testdate.toordinal(), *ys) for i, *ys in zip(indices, *lines)]
+        keep += [indices[i] for i in lttb(line, points)]
+
+    return [_hcu_detail_row(results[i]) for i in sorted(keep)]
+
+
+@bp.route('/api/ship-hcu-details', methods=['GET'])
+@response_cache.cached(bypass=lambda: streaming.stream_mimetype() is not None)
+def get_ship_hcu_details():
+    """HCU samples for a ship and year range.
+
+    Returns the full JSON list by default, one keyset page when `limit` or
+    `cursor` is given, or a row-by-row NDJSON/CSV stream when the client sends
+    Accept: application/x-ndjson or text/csv. For charts, `bucket=day|week|month`
+    aggregates per sample point and bucket, and `points=N` downsamples each HCU
+    series to at most N samples with largest-triangle-three-buckets. `format=columnar` returns one
+    array per field instead of one object per row.
+    """
+    try:
+        ship_name = request.args.get('ship')
+        start_year = request.args.get('startYear')
+        end_year = request.args.get('endYear')
+        limit = request.args.get('limit')
+        cursor = request.args.get('cursor')
+        bucket = request.args.get('bucket')
+        points = request.args.get('points')
+
+        if not ship_name or not start_year or not end_year:
+            return jsonify({'error': 'Missing required parameters'}), 400
+
+        # Convert years to a half-open date range [Jan 1 start_year, Jan 1 end_year + 1)
+        # so the (ship_id, sample_point_id, testdate) index can serve the filter
+        try:
+            start_date = date(int(start_year), 1, 1)
+            end_date = date(int(end_year) + 1, 1, 1)
+        except ValueError:
+            return jsonify({'error': 'Invalid year format. Use integers for years.'}), 400
+
+        if serialization.requested_format() is None:
+            return jsonify({'error': f"Invalid format. Use one of: {', '.join(serialization.FORMATS)}"}), 400
+
+        if bucket and bucket not in BUCKETS:
+            return jsonify({'error': f"Invalid bucket. Use one of: {', '.join(BUCKETS)}"}), 400
+
+        if points is not None:
+            try:
+                points = int(points)
+                if points < 3:
+                    raise ValueError
+            except ValueError:
+                return jsonify({'error': 'points must be an integer of at least 3'}), 400
+
+        # Only the hot table and the archived years inside the range are read
+        data = partitions.data_source(start_date.year, end_date.year - 1)
+
+        filters = [
+            data.ship_id == select(Ship.id).where(Ship.name == ship_name).scalar_subquery(),
+            data.sample_point_id.in_(select(SamplePoint.id).where(SamplePoint.name.like('HCU%'))),
+            data.testdate >= start_date,
+            data.testdate < end_date
+        ]
+
+        if bucket:
+            data_list = _hcu_details_by_bucket(data, ship_name, filters, bucket)
+            if not data_list:
+                return jsonify({'message': 'No data found for the specified ship and year range'}), 404
+            return serialization.respond(serialization.shape(data_list))
+
+        query = db.session.query(
+            data.id,
+            data.Ship,
+            data.testdate,
+            data.vlims_lo_samp_point_Desc,
+            data.VLIMS_PARTICLE_COUNT_4_MICRON_SCALE,
+            data.VLIMS_PARTICLE_COUNT_6_MICRON_SCALE,
+            data.VLIMS_PARTICLE_COUNT_14_MICRON_SCALE
+        ).filter(*filters).order_by(data.testdate, data.id)
+
+        if points:
+            results = query.all()
+            if not results:
+                return jsonify({'message': 'No data found for the specified ship and year range'}), 404
+            return serialization.respond(
+                serialization.shape(_downsample_hcu_series(results, points), HCU_DETAIL_FIELDS)
+            )
+
+        # Streaming mode: read keyset chunks and write rows as they arrive
+        mimetype = streaming.stream_mimetype()
+        if mimetype:
+            chunks = streaming.keyset_chunks(
+                query.statement, data.testdate, data.id, streaming.STREAM_CHUNK_SIZE, db.session.execute
+            )
+            rows = (_hcu_detail_row(row) for chunk in chunks for row in chunk)
+            if mimetype == 'text/csv':
+                body = streaming.csv_lines(rows, HCU_DETAIL_FIELDS)
+            else:
+                body = streaming.ndjson_lines(rows)
+            return Response(stream_with_context(body), mimetype=mimetype)
+
+        # Keyset pagination on (testdate, id)
+        if limit is not None or cursor is not None:
+            try:
+                limit = int(limit or current_app.config['MAX_PAGE_SIZE'])
+                if not 1 <= limit <= current_app.config['MAX_PAGE_SIZE']:
+                    raise ValueError
+            except ValueError:
+                return jsonify({'error': f"limit must be between 1 and {current_app.config['MAX_PAGE_SIZE']}"}), 400
+
+            if cursor:
+                try:
+                    after_date, after_id = streaming.decode_cursor(cursor)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                query = query.filter(streaming.after(data.testdate, data.id, after_date, after_id))
+
+            # Fetch one extra row to learn whether another page follows
+            results = query.limit(limit + 1).all()
+            page = results[:limit]
+            next_cursor = None
+            if len(results) > limit:
+                next_cursor = streaming.encode_cursor(page[-1].testdate, page[-1].id)
+
+            return serialization.respond({
+                'data': serialization.shape([_hcu_detail_row(row) for row in page], HCU_DETAIL_FIELDS),
+                'next_cursor': next_cursor
+            })
+
+        results = query.all()
+
+        if not results:
+            return jsonify({'message': 'No data found for the specified ship and year range'}), 404
+
+        data_list = [_hcu_detail_row(row) for row in results]
+
+        return serialization.respond(serialization.shape(data_list, HCU_DETAIL_FIELDS))
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/average-particle-count', methods=['GET'])
+@response_cache.cached
+def get_average_particle_count():
+    """Average particle counts per HCU sample point, fleet-wide or for `ship_name`."""
+    ship_name = request.args.get('ship_name', None)
+    if not ship_name or ship_name.lower() == 'all':
+        ship_name = None
+
+    def respond(specs, results, stats):
+        (spec,), (rows,) = specs, results
+        if not rows:
+            return jsonify({'message': 'No data found for the specified date range'}), 404
+        data_list = queries.format_hcu_points(rows)
+
+        # Percentiles merged from the daily rollup sketches (within 1%, see sketches.py)
+        if stats:
+            merged = sketches.merge_rows(
+                db.session.execute(queries.hcu_point_sketches(spec.start_date, spec.end_date, ship_name)),
+                'vlims_lo_samp_point_Desc', rollup.SKETCH_NAMES
+            )
+            for item in data_list:
+                item.update(queries.format_quantiles(merged.get(item['Sample_Point']), stats))
+
+        return serialization.respond(serialization.shape(
+            data_list, ['Sample_Point', *queries.AVERAGE_FIELDS, *queries.quantile_fields(stats)]
+        ))
+
+    return _aggregate_alias([queries.hcu_point_averages(ship_name=ship_name)], respond,
+                            required_dates=True, shaped=True)
+
+
+@bp.route('/api/filtered-average-particle-count', methods=['GET'])
+@response_cache.cached
+def filtered_average_particle_count():
+    """Average particle counts per ship BEFORE and AFTER FILTER."""
+    def respond(specs, results, stats):
+        data_list = queries.format_filter_sides(*results)
+
+        # Percentiles merged from the daily rollup sketches (within 1%, see sketches.py)
+        if stats:
+            merged = {
+                sample_point: sketches.merge_rows(
+                    db.session.execute(queries.ship_sketches(sample_point, spec.start_date, spec.end_date)),
+                    'Ship', rollup.SKETCH_NAMES
+                )
+                for sample_point, spec in zip(queries.FILTER_POINTS, specs)
+            }
+            for item in data_list:
+                item.update(queries.format_quantiles(
+                    merged[item['vlims_lo_samp_point_Desc']].get(item['Ship']), stats
+                ))
+
+        return serialization.respond(serialization.shape(
+            data_list,
+            ['Ship', 'vlims_lo_samp_point_Desc', *queries.AVERAGE_FIELDS, *queries.quantile_fields(stats)]
+        ))
+
+    return _aggregate_alias([queries.ship_averages(side) for side in queries.FILTER_POINTS], respond,
+                            required_dates=True, shaped=True)
+
+
+@bp.route('/api/filter-efficiency', methods=['GET'])
+@response_cache.cached
+def get_filter_efficiency():
+    """BEFORE / AFTER FILTER averages and reduction ratio per ship and `bucket` (day/week/month, default month).
+
+    One scan of the daily rollup with conditional aggregation. Optional
+    `ship_name` (or 'all') narrows it to one ship; `paired=true` only compares
+    days on which both sides were sampled.
+    """
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        ship_name = request.args.get('ship_name', None)
+        bucket = request.args.get('bucket', 'month')
+        paired = request.args.get('paired', 'false').lower() in ('1', 'true', 'yes')
+
+        if not start_date or not end_date:
+            return jsonify({'error': 'Missing required parameters'}), 400
+
+        # Convert dates
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+        if bucket not in BUCKETS:
+            return jsonify({'error': f"Invalid bucket. Use one of: {', '.join(BUCKETS)}"}), 400
+
+        if serialization.requested_format() is None:
+            return jsonify({'error': f"Invalid format. Use one of: {', '.join(serialization.FORMATS)}"}), 400
+
+        if not ship_name or ship_name.lower() == 'all':
+            ship_name = None
+
+        results = db.session.execute(
+            queries.filter_efficiency(start_date, end_date, bucket, ship_name, paired)
+        ).all()
+
+        if not results:
+            return jsonify({'message': 'No data found for the specified date range'}), 404
+
+        data_list = [queries.format_filter_efficiency(row) for row in results]
+        return serialization.respond(serialization.shape(data_list, queries.FILTER_EFFICIENCY_FIELDS))
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/cleanliness-distribution', methods=['GET'])
+@response_cache.cached
+def get_cleanliness_distribution():
+    """ISO 4406 code histogram per ship and sample point for a date range.
+
+    Optional `ship_name` (or 'all') narrows it to one ship. Counts come from one
+    GROUP BY over the precomputed iso_4406_* columns, covered by their index.
+    """
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        ship_name = request.args.get('ship_name', None)
+
+        if not start_date or not end_date:
+            return jsonify({'error': 'Missing required parameters'}), 400
+
+        # Convert dates
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+        if not ship_name or ship_name.lower() == 'all':
+            ship_name = None
+
+        data = partitions.data_source(start_date.year, end_date.year)
+        codes = [getattr(data, column) for _, column in cleanliness.CODE_COLUMNS]
+        filters = [
+            data.testdate >= start_date,
+            data.testdate <= end_date,
+            or_(*[code.isnot(None) for code in codes])
+        ]
+        if ship_name:
+            filters.append(data.ship_id == select(Ship.id).where(Ship.name == ship_name).scalar_subquery())
+
+        # Aggregate on the integer keys first, then look up the names of the (few) groups
+        histogram = select(
+            data.ship_id, data.sample_point_id, *codes, func.count().label('sample_count')
+        ).where(*filters).group_by(data.ship_id, data.sample_point_id, *codes).subquery()
+
+        results = db.session.query(
+            Ship.name.label('Ship'),
+            SamplePoint.name.label('Sample_Point'),
+            *[histogram.c[column] for _, column in cleanliness.CODE_COLUMNS],
+            histogram.c.sample_count
+        ).select_from(histogram).join(
+            Ship, histogram.c.ship_id == Ship.id
+        ).outerjoin(
+            SamplePoint, histogram.c.sample_point_id == SamplePoint.id
+        ).order_by(Ship.name, SamplePoint.name).all()
+
+        data_list = []
+        for row in results:
+            group = (row.Ship, row.Sample_Point)
+            if not data_list or (data_list[-1]['Ship'], data_list[-1]['Sample_Point']) != group:
+                data_list.append({'Ship': row.Ship, 'Sample_Point': row.Sample_Point, 'Samples': 0, 'Codes': {}})
+            code = cleanliness.format_code(*[getattr(row, column) for _, column in cleanliness.CODE_COLUMNS])
+            data_list[-1]['Codes'][code] = row.sample_count
+            data_list[-1]['Samples'] += row.sample_count
+
+        return serialization.respond(data_list)
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/export', methods=['GET'])
+def export_data():
+    """Data as an Arrow IPC stream (`format=arrow`, the default) or a Parquet file.
+
+    Optional `ship_name`, `sample_point` and an inclusive `start_date` /
+    `end_date` range narrow the rows. The body is streamed one record batch
+    (EXPORT_CHUNK_SIZE rows, one query) at a time.
+    """
+    if not export.available():
+        return jsonify({'error': 'Export requires the pyarrow package'}), 501
+
+    fmt = request.args.get('format', 'arrow')
+    if fmt not in export.FORMATS:
+        return jsonify({'error': f"Invalid format. Use one of: {', '.join(export.FORMATS)}"}), 400
+
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    try:
+        statement = export.export_query(
+            ship_name=request.args.get('ship_name'),
+            start_date=start_date,
+            end_date=end_date,
+            sample_point=request.args.get('sample_point'),
+        )
+        batches = export.record_batches(statement, current_app.config['EXPORT_CHUNK_SIZE'])
+        return Response(
+            stream_with_context(export.stream(batches, fmt)),
+            mimetype=export.MIMETYPES[fmt],
+            headers={'Content-Disposition': f'attachment; filename=data.{fmt}'},
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/data/import', methods=['POST'])
+def import_data():
+    """Stream an uploaded CSV/XLSX lab export into Data in batches."""
+    if "user_id" not in session:
+        return jsonify({'error': 'Login required'}), 401
+
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'error': 'Missing file upload'}), 400
+
+    try:
+        chunk_size = int(request.args.get('chunk_size', current_app.config['IMPORT_CHUNK_SIZE']))
+        if chunk_size < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'chunk_size must be a positive integer'}), 400
+
+    try:
+        summary = ingest.import_rows(
+            ingest.read_export(upload.stream, upload.filename), chunk_size=chunk_size
+        )
+        return jsonify(summary), 200
+
+    except ingest.InvalidExportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/replica-status', methods=['GET'])
+def get_replica_status():
+    """Last health check (healthy, replication lag) of each read replica; null until first used."""
+    return jsonify(current_app.extensions['replicas'].status()), 200
+
+
+@bp.route('/api/cache-warm-status', methods=['GET'])
+def get_cache_warm_status():
+    """Which standard dashboard windows the cache warmer has fresh, and its last pass."""
+    return jsonify(current_app.extensions['cache_warmer'].status()), 200
+
+
+@bp.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Hit/miss/eviction counters for sizing the analytics response cache."""
+    return jsonify({**response_cache.stats(), 'aggregate_statements': aggregate.statement_cache_info()}), 200
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Per-endpoint query, DB time, row, serialisation and size histograms for Prometheus."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,256 @@
+import asyncio
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from flask_cors.core import get_cors_headers, get_cors_options
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.datastructures import Headers, MultiDict, MIMEAccept
+from werkzeug.http import parse_accept_header, parse_cookie
+
+from app import create_app, CORS_OPTIONS
+from models import db
+import cache
+import extensions
+import queries
+import aggregate
+import routing
+import serialization
+from singleflight import SingleFlightTimeout
+
+# ASGI entry point: `uvicorn asgi:application`.
+#
+# The read-only count/average routes run natively on SQLAlchemy's async engine,
+# so a slow aggregation waits on the database without holding an OS thread and
+# independent sub-queries run concurrently. Every other route (auth, imports,
+# HCU details, metrics) is served by the Flask app through WsgiToAsgi. With
+# ANALYTICS_ENGINE = 'memory' all routes go to Flask, as do requests for the
+# columnar format or MessagePack. Native reads are routed to the read replicas
+# the same way as the Flask views' (see routing.py).
+
+app = create_app()
+wsgi_application = WsgiToAsgi(app)
+
+# The app's Flask-CORS policy, for the responses built here without Flask
+cors_options = get_cors_options(app, CORS_OPTIONS)
+
+# Async drivers standing in for the sync ones in SQLALCHEMY_DATABASE_URI
+ASYNC_DRIVERS = {
+    'mysql+mysqlconnector': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'mysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+# Async engines by bind key; None is the primary
+_engines = {}
+
+
+def async_url(url):
+    scheme, rest = url.split('://', 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def async_database_url():
+    return app.config.get('ASYNC_DATABASE_URL') or async_url(app.config['SQLALCHEMY_DATABASE_URI'])
+
+
+def engine(key=None):
+    """The async engine of the primary, or of the replica with bind `key`."""
+    if key not in _engines:
+        if key is None:
+            _engines[key] = create_async_engine(async_database_url(), pool_pre_ping=True)
+        else:
+            _engines[key] = create_async_engine(async_url(app.config['SQLALCHEMY_BINDS'][key]), pool_pre_ping=True)
+            event.listen(_engines[key].sync_engine, 'handle_error',
+                         routing.mark_down_on_disconnect(app.extensions['replicas'], key))
+    return _engines[key]
+
+
+async def read_engine(scope):
+    """A healthy replica's engine, or the primary's when there is none or the client wrote recently."""
+    replicas = app.extensions['replicas']
+    cookies = parse_cookie(_header(scope, b'cookie') or '')
+    if not replicas.binds or routing.recent_write(cookies.get(routing.WRITE_COOKIE),
+                                                  app.config['REPLICA_MAX_LAG_SECONDS']):
+        return engine()
+    # Health checks (cached for REPLICA_CHECK_INTERVAL) use the sync engines, off the event loop
+    with app.app_context():
+        engines = db.engines
+    key = await asyncio.to_thread(replicas.pick_key, engines)
+    return engine(key)
+
+
+async def fetch_all(bind, statement):
+    async with bind.connect() as connection:
+        result = await connection.execute(statement)
+        return result.all()
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _parse(args, aliases, required_dates=False):
+    """Complete fixed Specs with the request's dates, exactly as the Flask views do."""
+    try:
+        return [aggregate.parse_args(args, alias, required_dates) for alias in aliases]
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+
+async def _counts(args, bind, alias):
+    (spec,) = _parse(args, [alias])
+    return queries.format_counts(await fetch_all(bind, aggregate.statement(spec))), 200
+
+
+async def get_sample_type_count(args, bind):
+    return await _counts(args, bind, queries.sample_type_counts())
+
+
+async def get_ship_hcu_count(args, bind):
+    return await _counts(args, bind, queries.ship_counts('HCU'))
+
+
+async def get_purifier_count(args, bind):
+    return await _counts(args, bind, queries.ship_counts('Purifier'))
+
+
+async def get_average_particle_count(args, bind):
+    ship_name = args.get('ship_name')
+    if not ship_name or ship_name.lower() == 'all':
+        ship_name = None
+    (spec,) = _parse(args, [queries.hcu_point_averages(ship_name=ship_name)], required_dates=True)
+
+    results = await fetch_all(bind, aggregate.statement(spec))
+    if not results:
+        return {'message': 'No data found for the specified date range'}, 404
+    return queries.format_hcu_points(results), 200
+
+
+async def filtered_average_particle_count(args, bind):
+    specs = _parse(args, [queries.ship_averages(side) for side in queries.FILTER_POINTS], required_dates=True)
+
+    # BEFORE and AFTER FILTER aggregations are independent, so run them side by side
+    results = await asyncio.gather(*[fetch_all(bind, aggregate.statement(spec)) for spec in specs])
+    return queries.format_filter_sides(*results), 200
+
+
+# Paths served natively, keyed to the Flask endpoint names so cache keys match
+ANALYTICS_ROUTES = {
+    '/api/sample-type-count': get_sample_type_count,
+    '/api/ship-hcu-count': get_ship_hcu_count,
+    '/api/purifier-count': get_purifier_count,
+    '/api/average-particle-count': get_average_particle_count,
+    '/api/filtered-average-particle-count': filtered_average_particle_count,
+}
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _cors_headers(scope):
+    """The Access-Control-* (and Vary) headers Flask-CORS would add to this GET's response."""
+    request_headers = Headers([(key.decode('latin-1'), value.decode('latin-1')) for key, value in scope['headers']])
+    return [
+        (name.lower().encode('latin-1'), str(value).encode('latin-1'))
+        for name, value in get_cors_headers(cors_options, request_headers, scope['method']).items(multi=True)
+    ]
+
+
+async def _send(send, status, body, headers=()):
+    headers = [(b'content-length', str(len(body)).encode())] + list(headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _query_args(scope):
+    return MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+
+
+def _served_natively(scope, args):
+    """Plain row JSON without percentiles only; everything else is left to the Flask views."""
+    if 'format' in args or 'stats' in args:
+        return False
+    return not serialization.wants_msgpack(parse_accept_header(_header(scope, b'accept'), MIMEAccept))
+
+
+async def _serve_analytics(scope, send, handler, args):
+    response_cache = extensions.response_cache
+    # Same key as the Flask view's, so both modes share cached responses
+    key = cache.make_key(f'analytics.{handler.__name__}', args)
+
+    if cache.watermark_due(app.config['DATA_VERSION_CHECK_INTERVAL']):
+        # Writes by other processes invalidate cached responses, as in the Flask views
+        cache.observe_watermark(tuple((await fetch_all(engine(), cache.watermark_statement()))[0]))
+
+    refresh = cache.valid_refresh_token(app.config['SECRET_KEY'], _header(scope, cache.REFRESH_HEADER.lower().encode()))
+    cached = None if refresh else response_cache.get(key)
+    if cached is not None:
+        body, mimetype, etag = cached
+    else:
+        version = cache.data_version()
+        try:
+            bind = await read_engine(scope)
+            # Identical concurrent misses share one query, as in the Flask views
+            payload, status = await response_cache.flights.do_async((key, version), lambda: handler(args, bind))
+        except BadRequest as e:
+            payload, status = {'error': str(e)}, 400
+        except SingleFlightTimeout as e:
+            payload, status = {'error': str(e)}, 503
+        except Exception as e:
+            payload, status = {'error': str(e)}, 500
+
+        # Same encoder and settings as jsonify, so both modes produce identical bodies and ETags
+        body = (app.json.dumps(payload, separators=(',', ':')) + '\n').encode()
+        mimetype = 'application/json'
+        if status != 200:
+            await _send(send, status, body, [(b'content-type', mimetype.encode())] + _cors_headers(scope))
+            return
+        etag = response_cache.put(key, body, mimetype, version)
+
+    headers = [(b'etag', f'"{etag}"'.encode()), (b'cache-control', b'no-cache')]
+    # The body served here depends on Accept: clients preferring MessagePack get the Flask view's
+    headers += [(b'vary', name.encode()) for name in serialization.VARY]
+    if_none_match = _header(scope, b'if-none-match')
+    if if_none_match and f'"{etag}"' in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+        await _send(send, 304, b'', headers + _cors_headers(scope))
+        return
+
+    headers.append((b'content-type', mimetype.encode()))
+    threshold = app.config['COMPRESS_MIN_SIZE']
+    if threshold is not None:
+        headers.append((b'vary', b'Accept-Encoding'))
+        encoding = serialization.choose_encoding(parse_accept_header(_header(scope, b'accept-encoding')))
+        if encoding and len(body) >= threshold:
+            body = serialization.compress(body, encoding, app.config['COMPRESS_LEVEL'])
+            headers[0] = (b'etag', f'W/"{etag}"'.encode())
+            headers.append((b'content-encoding', encoding.encode()))
+    await _send(send, 200, body, headers + _cors_headers(scope))
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for async_engine in _engines.values():
+                    await async_engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    handler = ANALYTICS_ROUTES.get(scope.get('path'))
+    if (scope['type'] == 'http' and scope['method'] == 'GET' and handler is not None
+            and app.config['ANALYTICS_ENGINE'] == 'sql'):
+        args = _query_args(scope)
+        if _served_natively(scope, args):
+            await _serve_analytics(scope, send, handler, args)
+            return
+
+    await wsgi_application(scope, receive, send)
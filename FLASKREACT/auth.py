@@ -0,0 +1,66 @@
+from flask import Blueprint, current_app, request, jsonify, session
+from models import db, User
+from passwords import HasherBusy
+import extensions
+
+# Sign-up and login. Password hashing runs in the extensions.bcrypt pool.
+
+bp = Blueprint('auth', __name__)
+
+
+@bp.errorhandler(HasherBusy)
+def password_hasher_busy(e):
+    response = jsonify({"error": "Server busy, please retry"})
+    response.headers["Retry-After"] = str(current_app.config['PASSWORD_HASH_RETRY_AFTER'])
+    return response, 503  # Service Unavailable
+
+@bp.route("/")
+def hello_world():
+    return "Hello, World!"
+
+
+
+@bp.route("/signup", methods=["POST"])
+def signup():
+    data = request.json
+    email = data.get("email")
+    password = data.get("password")
+
+    if not email or not password:
+        return jsonify({"error": "Email and password are required"}), 400  # Bad Request
+
+    user_exists = User.query.filter_by(email=email).first() is not None
+    if user_exists:
+        return jsonify({"error": "Email already exists"}), 409  # Conflict
+
+    hashed_password = extensions.bcrypt.generate_password_hash(password)
+    new_user = User(email=email, password=hashed_password)
+    db.session.add(new_user)
+    db.session.commit()
+
+    session["user_id"] = new_user.id  # Store user session
+
+    return jsonify({
+        "id": new_user.id,
+        "email": new_user.email
+    }), 201  # Created
+
+@bp.route("/login", methods=["POST"])
+def login_user():
+    data = request.json
+    email = data.get("email")
+    password = data.get("password")
+
+    if not email or not password:
+        return jsonify({"error": "Email and password are required"}), 400
+
+    user = User.query.filter_by(email=email).first()
+    if not user or not extensions.bcrypt.check_password_hash(user.password, password):
+        return jsonify({"error": "Invalid credentials"}), 401  # Unauthorized
+
+    session["user_id"] = user.id
+
+    return jsonify({
+        "id": user.id,
+        "email": user.email
+    }), 200  # OK
@@ -0,0 +1,13 @@
+"""Synthetic VLIMS dataset generator and endpoint benchmark harness.
+
+Run from the FLASKREACT directory:
+
+    python -m benchmarks.generate --rows 10000 --db bench_10000.db
+    python -m benchmarks.harness --sizes 10000,1000000 --output results.json
+    python -m benchmarks.harness --sizes 10000 --baseline baseline.json
+    python -m benchmarks.login_burst --rows 10000 --logins 40
+    python -m benchmarks.asgi_vs_wsgi --rows 10000 --concurrency 32
+    python -m benchmarks.serialisation --rows 100000
+    python -m benchmarks.startup --rows 10000 --runs 10
+    python -m benchmarks.export_throughput --rows 100000
+"""
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import generate
+
+# The dashboard's parallel analytics calls for one page load
+END = generate.END_DATE
+SPAN = f'start_date={END.replace(month=1, day=1)}&end_date={END}'
+DASHBOARD = [
+    ('/api/sample-type-count', SPAN),
+    ('/api/ship-hcu-count', SPAN),
+    ('/api/purifier-count', SPAN),
+    ('/api/average-particle-count', f'{SPAN}&ship_name=all'),
+    ('/api/average-particle-count', f'{SPAN}&ship_name={generate.ship_names()[0]}'),
+    ('/api/filtered-average-particle-count', SPAN),
+]
+
+
+async def _asgi_get(application, path, query):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': query.encode(), 'headers': [], 'server': ('bench', 80), 'client': ('bench', 1),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]['status']
+
+
+async def _run_asgi(application, requests, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(path, query):
+        async with limit:
+            return await _asgi_get(application, path, query)
+
+    started = time.perf_counter()
+    statuses = await asyncio.gather(*(one(path, query) for path, query in requests))
+    return time.perf_counter() - started, statuses
+
+
+def _run_wsgi(app, requests, concurrency):
+    def one(path, query):
+        return app.test_client().get(f'{path}?{query}').status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(lambda request: one(*request), requests))
+    return time.perf_counter() - started, statuses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent analytics throughput: ASGI mode vs WSGI.')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--page-loads', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    path = os.path.abspath(f'bench_{args.rows}.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    if not os.path.exists(path):
+        generate.populate(args.rows)
+
+    import asgi
+    app = asgi.app
+    app.config['SLOW_REQUEST_SECONDS'] = None
+    asgi.extensions.response_cache.max_entries = 0
+
+    requests = DASHBOARD * args.page_loads
+    results = {}
+    for mode in ('wsgi', 'asgi'):
+        if mode == 'wsgi':
+            elapsed, statuses = _run_wsgi(app, requests, args.concurrency)
+        else:
+            elapsed, statuses = asyncio.run(_run_asgi(asgi.application, requests, args.concurrency))
+        results[mode] = {
+            'requests': len(requests),
+            'concurrency': args.concurrency,
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_rps': round(len(requests) / elapsed, 1),
+            'errors': sum(1 for status in statuses if status >= 500),
+        }
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
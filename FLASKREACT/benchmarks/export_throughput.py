@@ -0,0 +1,97 @@
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+from benchmarks import generate
+
+# Rows per second pulled by a client, end to end (query, encode, decode):
+# paging every ship through /api/ship-hcu-details as JSON, the way the data
+# science notebooks did, against one /api/export request as Arrow and Parquet.
+# The JSON path only covers HCU samples; compare rows/s, not seconds.
+
+FIRST_YEAR = generate.END_DATE.year - generate.YEARS + 1
+LAST_YEAR = generate.END_DATE.year
+
+
+def json_pages(client, page_size):
+    rows = size = 0
+    for ship in generate.ship_names():
+        cursor = None
+        while True:
+            query = {'ship': ship, 'startYear': FIRST_YEAR, 'endYear': LAST_YEAR, 'limit': page_size}
+            if cursor:
+                query['cursor'] = cursor
+            response = client.get('/api/ship-hcu-details', query_string=query)
+            body = response.get_data()
+            page = json.loads(body)
+            rows += len(page['data'])
+            size += len(body)
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+    return rows, size
+
+
+def arrow_export(client):
+    import pyarrow as pa
+    body = client.get('/api/export', query_string={'format': 'arrow'}).get_data()
+    return pa.ipc.open_stream(io.BytesIO(body)).read_all().num_rows, len(body)
+
+
+def parquet_export(client):
+    import pyarrow.parquet as pq
+    body = client.get('/api/export', query_string={'format': 'parquet'}).get_data()
+    return pq.read_table(io.BytesIO(body)).num_rows, len(body)
+
+
+def measure(client, fetch, runs):
+    seconds = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        rows, size = fetch(client)
+        seconds.append(time.perf_counter() - started)
+    median = statistics.median(seconds)
+    return {
+        'rows': rows,
+        'bytes': size,
+        'median_seconds': round(median, 3),
+        'rows_per_second': round(rows / median) if median else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk pull throughput: JSON paging vs Arrow / Parquet export.')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--page-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    path = os.path.abspath(f'bench_{args.rows}.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    if not os.path.exists(path):
+        generate.populate(args.rows)
+
+    from app import create_app
+    import export
+    if not export.available():
+        print('pyarrow is not installed', file=sys.stderr)
+        return 1
+    app = create_app({'SLOW_REQUEST_SECONDS': None, 'RESPONSE_CACHE_MAX_ENTRIES': 0,
+                      'MAX_PAGE_SIZE': max(args.page_size, 1)})
+    client = app.test_client()
+
+    results = {
+        'json_pages': measure(client, lambda c: json_pages(c, args.page_size), args.runs),
+        'arrow': measure(client, arrow_export, args.runs),
+        'parquet': measure(client, parquet_export, args.runs),
+    }
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
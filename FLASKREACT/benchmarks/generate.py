@@ -0,0 +1,111 @@
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+
+# Defaults shared with the harness so its query parameters hit real data
+SHIPS = 20
+YEARS = 5
+END_DATE = date(2024, 12, 31)
+SEED = 4406
+
+SAMPLE_TYPES = [('HCU', 0.6), ('Purifier', 0.3), ('Main Engine', 0.1)]
+HCU_POINTS = [f'HCU#{i}' for i in range(1, 10)]
+FILTER_POINTS = ['BEFORE FILTER', 'AFTER FILTER']
+OTHER_POINTS = ['ME SUMP', 'ME INLET', None]
+
+# Share of samples with no reading for a given particle size
+NULL_RATE = 0.08
+
+INSERT_CHUNK_SIZE = 20000
+
+
+def ship_names(count=SHIPS):
+    return [f'Ship {i:03d}' for i in range(1, count + 1)]
+
+
+def _particle_count(rng, median):
+    if rng.random() < NULL_RATE:
+        return None
+    return round(rng.lognormvariate(0, 0.9) * median, 1)
+
+
+def generate_rows(rows, ships=SHIPS, years=YEARS, end_date=END_DATE, seed=SEED):
+    """Yield `rows` reproducible Data column mappings."""
+    rng = random.Random(seed)
+    names = ship_names(ships)
+    span = years * 365
+    first_day = end_date - timedelta(days=span - 1)
+    types, weights = zip(*SAMPLE_TYPES)
+
+    for _ in range(rows):
+        samp_type = rng.choices(types, weights)[0]
+        if samp_type == 'HCU':
+            point = rng.choice(HCU_POINTS)
+            scale = 1.0
+        elif samp_type == 'Purifier':
+            point = rng.choice(FILTER_POINTS)
+            scale = 4.0 if point == 'BEFORE FILTER' else 0.8
+        else:
+            point = rng.choice(OTHER_POINTS)
+            scale = 2.0
+
+        yield {
+            'Ship': rng.choice(names),
+            'Samp_Type': samp_type,
+            'testdate': first_day + timedelta(days=rng.randrange(span)),
+            'vlims_lo_samp_point_Desc': point,
+            'VLIMS_PARTICLE_COUNT_4_MICRON_SCALE': _particle_count(rng, 2500 * scale),
+            'VLIMS_PARTICLE_COUNT_6_MICRON_SCALE': _particle_count(rng, 600 * scale),
+            'VLIMS_PARTICLE_COUNT_14_MICRON_SCALE': _particle_count(rng, 40 * scale),
+        }
+
+
+def populate(rows, **options):
+    """Fill the configured database's Data table, its derived columns and the rollup; return seconds taken."""
+    from sqlalchemy import insert, delete
+    from app import create_app
+    from models import db, Data
+    import cache
+    import cleanliness
+    import dimensions
+    import rollup
+
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(delete(Data.__table__))
+        batch = []
+        for row in generate_rows(rows, **options):
+            batch.append(row)
+            if len(batch) == INSERT_CHUNK_SIZE:
+                db.session.execute(insert(Data.__table__), cleanliness.assign_codes(batch))
+                batch = []
+        if batch:
+            db.session.execute(insert(Data.__table__), cleanliness.assign_codes(batch))
+        cache.bump_shared_version(db.session)
+        db.session.commit()
+        dimensions.backfill()
+        rollup.rebuild()
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fill a SQLite database with synthetic VLIMS samples.')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--db', default=None, help='SQLite file (default bench_<rows>.db)')
+    parser.add_argument('--ships', type=int, default=SHIPS)
+    parser.add_argument('--years', type=int, default=YEARS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args(argv)
+
+    path = os.path.abspath(args.db or f'bench_{args.rows}.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    seconds = populate(args.rows, ships=args.ships, years=args.years, seed=args.seed)
+    print(f'Wrote {args.rows} rows to {path} in {seconds:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
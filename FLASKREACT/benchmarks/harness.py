@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks import generate
+
+DEFAULT_SIZES = [10000, 1000000, 10000000]
+
+# A route regresses when its p95 grows by more than this fraction (and by more
+# than NOISE_FLOOR_MS, so sub-millisecond jitter on tiny datasets is ignored)
+DEFAULT_TOLERANCE = 0.25
+NOISE_FLOOR_MS = 1.0
+
+
+def build_requests():
+    """(name, method, url, json body) for every route but the upload import, using the generator's data."""
+    import export
+    ship = generate.ship_names()[0]
+    end = generate.END_DATE
+    year_start = end.replace(month=1, day=1)
+    last_90 = end - timedelta(days=89)
+    span = f'start_date={year_start}&end_date={end}'
+    hcu = f'ship={ship}&startYear={end.year}&endYear={end.year}'
+    recent = f'start_date={last_90}&end_date={end}'
+    credentials = {'email': 'bench@example.com', 'password': 'bench-password'}
+
+    requests = [
+        ('index', 'GET', '/', None),
+        ('sample_type_count', 'GET', f'/api/sample-type-count?{span}', None),
+        ('sample_type_count_all', 'GET', '/api/sample-type-count', None),
+        ('ship_hcu_count', 'GET', f'/api/ship-hcu-count?{span}', None),
+        ('purifier_count', 'GET', f'/api/purifier-count?{span}', None),
+        ('ships', 'GET', '/api/ships', None),
+        ('ship_hcu_details', 'GET', f'/api/ship-hcu-details?{hcu}', None),
+        ('ship_hcu_details_page', 'GET', f'/api/ship-hcu-details?{hcu}&limit=500', None),
+        ('ship_hcu_details_week', 'GET', f'/api/ship-hcu-details?{hcu}&bucket=week', None),
+        ('ship_hcu_details_lttb', 'GET', f'/api/ship-hcu-details?{hcu}&points=500', None),
+        ('average_particle_count', 'GET',
+         f'/api/average-particle-count?start_date={last_90}&end_date={end}&ship_name=all', None),
+        ('average_particle_count_ship', 'GET',
+         f'/api/average-particle-count?start_date={last_90}&end_date={end}&ship_name={ship}', None),
+        ('filtered_average_particle_count', 'GET', f'/api/filtered-average-particle-count?{span}', None),
+        ('aggregate', 'GET', f'/api/aggregate?dimensions=Ship,month&metrics=count,avg_4_micron&{span}', None),
+        ('aggregate_min_max', 'GET',
+         f'/api/aggregate?dimensions=vlims_lo_samp_point_Desc&metrics=min_4_micron,max_4_micron'
+         f'&Samp_Type=HCU&{recent}', None),
+        ('filter_efficiency', 'GET', f'/api/filter-efficiency?{span}', None),
+        ('filter_efficiency_paired', 'GET', f'/api/filter-efficiency?{span}&bucket=week&paired=true', None),
+        ('cleanliness_distribution', 'GET', f'/api/cleanliness-distribution?{span}', None),
+        ('replica_status', 'GET', '/api/replica-status', None),
+        ('cache_warm_status', 'GET', '/api/cache-warm-status', None),
+        ('cache_stats', 'GET', '/api/cache-stats', None),
+        ('metrics', 'GET', '/metrics', None),
+        ('login', 'POST', '/login', credentials),
+    ]
+    if export.available():
+        requests += [
+            ('export_arrow', 'GET', f'/api/export?format=arrow&ship_name={ship}&{recent}', None),
+            ('export_parquet', 'GET', f'/api/export?format=parquet&ship_name={ship}&{recent}', None),
+        ]
+    return requests
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_size(rows, iterations, use_cache, regenerate):
+    """Benchmark every route against a `rows`-row SQLite database in this process."""
+    path = os.path.abspath(f'bench_{rows}.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    generate_seconds = None
+    if regenerate or not os.path.exists(path):
+        generate_seconds = round(generate.populate(rows), 2)
+
+    from app import create_app
+    from models import db, User
+    app = create_app(None if use_cache else {'RESPONSE_CACHE_MAX_ENTRIES': 0})
+
+    client = app.test_client()
+    with app.app_context():
+        if not User.query.filter_by(email='bench@example.com').first():
+            client.post('/signup', json={'email': 'bench@example.com', 'password': 'bench-password'})
+        db.session.remove()
+
+    routes = {}
+    for name, method, url, body in build_requests():
+        client.open(url, method=method, json=body)  # warm-up
+        timings = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            request_started = time.perf_counter()
+            response = client.open(url, method=method, json=body)
+            response.get_data()  # streamed bodies are produced while being read
+            timings.append((time.perf_counter() - request_started) * 1000)
+            if response.status_code >= 500:
+                raise RuntimeError(f'{name} failed with {response.status_code}: {response.get_data(as_text=True)}')
+        total = time.perf_counter() - started
+
+        timings.sort()
+        routes[name] = {
+            'p50_ms': round(_percentile(timings, 0.50), 3),
+            'p95_ms': round(_percentile(timings, 0.95), 3),
+            'p99_ms': round(_percentile(timings, 0.99), 3),
+            'throughput_rps': round(iterations / total, 1),
+            'status': response.status_code,
+        }
+
+    return {
+        'rows': rows,
+        'iterations': iterations,
+        'cache': use_cache,
+        'generate_seconds': generate_seconds,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'routes': routes,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Routes whose p95 regressed against the baseline, as readable messages."""
+    regressions = []
+    for size, result in results.items():
+        expected = baseline.get(size)
+        if not expected:
+            continue
+        for name, stats in result['routes'].items():
+            before = expected['routes'].get(name)
+            if not before:
+                continue
+            limit = max(before['p95_ms'] * (1 + tolerance), before['p95_ms'] + NOISE_FLOOR_MS)
+            if stats['p95_ms'] > limit:
+                regressions.append(
+                    f"{size} rows {name}: p95 {stats['p95_ms']} ms > {round(limit, 3)} ms "
+                    f"(baseline {before['p95_ms']} ms)"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every app.py route at several dataset sizes.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES))
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--cache', action='store_true', help='Leave the response cache on.')
+    parser.add_argument('--regenerate', action='store_true', help='Rebuild bench_<rows>.db files.')
+    parser.add_argument('--output', help='Write results JSON here.')
+    parser.add_argument('--baseline', help='Fail (exit 1) when a route regresses against this results file.')
+    parser.add_argument('--write-baseline', action='store_true', help='Store the results as --baseline.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--run-one', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one:
+        print(json.dumps(run_size(args.run_one, args.iterations, args.cache, args.regenerate)))
+        return 0
+
+    # Each size runs in its own interpreter so peak RSS and module state are per size
+    results = {}
+    for size in [int(size) for size in args.sizes.split(',')]:
+        command = [sys.executable, '-m', 'benchmarks.harness', '--run-one', str(size),
+                   '--iterations', str(args.iterations)]
+        command += ['--cache'] if args.cache else []
+        command += ['--regenerate'] if args.regenerate else []
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results[str(size)] = json.loads(output.strip().splitlines()[-1])
+
+    report = json.dumps(results, indent=2, sort_keys=True)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+
+    if args.baseline and args.write_baseline:
+        with open(args.baseline, 'w') as f:
+            f.write(report + '\n')
+    elif args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import generate
+from benchmarks.harness import _percentile
+
+# Analytics request polled throughout the burst
+ANALYTICS_URL = (f'/api/filtered-average-particle-count?start_date={generate.END_DATE.replace(month=1, day=1)}'
+                 f'&end_date={generate.END_DATE}')
+CREDENTIALS = {'email': 'burst@example.com', 'password': 'burst-password'}
+
+
+def _timed(app, method, url, body, scheduled):
+    response = app.test_client().open(url, method=method, json=body)
+    return response.status_code, (time.perf_counter() - scheduled) * 1000
+
+
+def run_burst(app, server_threads, logins, analytics, interval):
+    """Fire `logins` logins at once while polling analytics every `interval` seconds.
+
+    server_threads stands in for the WSGI server's worker threads; analytics
+    latency is measured from when the request was sent, so it includes time
+    spent queued behind logins for a free thread.
+    """
+    with ThreadPoolExecutor(max_workers=server_threads) as server:
+        login_futures = [
+            server.submit(_timed, app, 'POST', '/login', CREDENTIALS, time.perf_counter())
+            for _ in range(logins)
+        ]
+        analytics_futures = []
+        for _ in range(analytics):
+            analytics_futures.append(
+                server.submit(_timed, app, 'GET', ANALYTICS_URL, None, time.perf_counter())
+            )
+            time.sleep(interval)
+
+        login_results = [future.result() for future in login_futures]
+        timings = sorted(future.result()[1] for future in analytics_futures)
+
+    statuses = {}
+    for status, _ in login_results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'analytics_p50_ms': round(_percentile(timings, 0.50), 2),
+        'analytics_p99_ms': round(_percentile(timings, 0.99), 2),
+        'login_statuses': statuses,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analytics latency during a login burst, inline vs pooled bcrypt.')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--server-threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--analytics', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=0.005, help='Seconds between analytics polls.')
+    args = parser.parse_args(argv)
+
+    path = os.path.abspath(f'bench_{args.rows}.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    if not os.path.exists(path):
+        generate.populate(args.rows)
+
+    from app import create_app
+    from passwords import PasswordHasher
+    import extensions
+    app = create_app({'SLOW_REQUEST_SECONDS': None, 'RESPONSE_CACHE_MAX_ENTRIES': 0})
+    app.test_client().post('/signup', json=CREDENTIALS)
+
+    pooled = extensions.bcrypt
+    inline = PasswordHasher(rounds=pooled.rounds, workers=0)
+
+    results = {'quiet': run_burst(app, args.server_threads, 0, args.analytics, args.interval)}
+    for mode, hasher in (('inline', inline), ('pooled', pooled)):
+        extensions.bcrypt = hasher
+        results[mode] = run_burst(app, args.server_threads, args.logins, args.analytics, args.interval)
+    pooled.shutdown()
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
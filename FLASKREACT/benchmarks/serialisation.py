@@ -0,0 +1,87 @@
+import argparse
+import json
+import sys
+import time
+
+from benchmarks import generate
+import serialization
+
+# Byte size and encode time of an /api/ship-hcu-details body in each format,
+# uncompressed and gzip/brotli compressed at the app's default level. Needs no
+# database: rows come straight from the synthetic generator.
+
+HCU_DETAIL_FIELDS = [
+    'Ship', 'Sample_Point', 'Test_Date',
+    'Particle_Count_4_Micron', 'Particle_Count_6_Micron', 'Particle_Count_14_Micron'
+]
+
+
+def hcu_detail_rows(rows):
+    return [
+        {
+            'Ship': row['Ship'],
+            'Sample_Point': row['vlims_lo_samp_point_Desc'],
+            'Test_Date': row['testdate'].strftime('%Y-%m-%d'),
+            'Particle_Count_4_Micron': row['VLIMS_PARTICLE_COUNT_4_MICRON_SCALE'] or 0.0,
+            'Particle_Count_6_Micron': row['VLIMS_PARTICLE_COUNT_6_MICRON_SCALE'] or 0.0,
+            'Particle_Count_14_Micron': row['VLIMS_PARTICLE_COUNT_14_MICRON_SCALE'] or 0.0,
+        }
+        for row in generate.generate_rows(rows)
+        if row['Samp_Type'] == 'HCU'
+    ]
+
+
+def _encoders():
+    encoders = {'json': lambda payload: json.dumps(payload, separators=(',', ':'), sort_keys=True).encode()}
+    if serialization.orjson is not None:
+        option = serialization.orjson.OPT_NON_STR_KEYS | serialization.orjson.OPT_SORT_KEYS
+        encoders['orjson'] = lambda payload: serialization.orjson.dumps(payload, option=option)
+    if serialization.msgpack is not None:
+        encoders['msgpack'] = serialization.msgpack.packb
+    return encoders
+
+
+def _timed(function, argument, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = function(argument)
+    return result, (time.perf_counter() - started) / iterations * 1000
+
+
+def measure(records, iterations=5, level=6):
+    payloads = {
+        'rows': records,
+        'columnar': serialization.to_columnar(records, HCU_DETAIL_FIELDS),
+    }
+    encodings = ['gzip'] + (['br'] if serialization.brotli is not None else [])
+
+    results = {}
+    for shape, payload in payloads.items():
+        for name, encode in _encoders().items():
+            body, encode_ms = _timed(encode, payload, iterations)
+            result = {'bytes': len(body), 'encode_ms': round(encode_ms, 2)}
+            for encoding in encodings:
+                compressed, compress_ms = _timed(
+                    lambda data: serialization.compress(data, encoding, level), body, iterations
+                )
+                result[f'{encoding}_bytes'] = len(compressed)
+                result[f'{encoding}_ms'] = round(compress_ms, 2)
+            results[f'{shape}/{name}'] = result
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Response size and encode time per serialisation format.')
+    parser.add_argument('--rows', type=int, default=100000, help='Generated samples (about 60%% are HCU).')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--level', type=int, default=6, help='gzip level / brotli quality.')
+    args = parser.parse_args(argv)
+
+    records = hcu_detail_rows(args.rows)
+    results = measure(records, args.iterations, args.level)
+    print(json.dumps({'records': len(records), 'formats': results}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import generate
+
+# Worker cold start: import of the app module, create_app(), and the first
+# response (which opens the first database connection), each in a fresh
+# interpreter as a restarted gunicorn worker would see it.
+
+FIRST_REQUEST = '/api/sample-type-count'
+
+
+def run_once(url):
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app()
+    created = time.perf_counter()
+    response = app.test_client().get(url)
+    responded = time.perf_counter()
+    if response.status_code >= 500:
+        raise RuntimeError(f'{url} failed with {response.status_code}: {response.get_data(as_text=True)}')
+    return {
+        'import_ms': (imported - started) * 1000,
+        'create_app_ms': (created - imported) * 1000,
+        'first_response_ms': (responded - created) * 1000,
+        'total_ms': (responded - started) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import-to-first-response time of a fresh app process.')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--url', default=FIRST_REQUEST)
+    parser.add_argument('--run-one', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one:
+        print(json.dumps(run_once(args.url)))
+        return 0
+
+    path = os.path.abspath(f'bench_{args.rows}.db')
+    if not os.path.exists(path):
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+        generate.populate(args.rows)
+
+    environment = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    command = [sys.executable, '-m', 'benchmarks.startup', '--run-one', '--url', args.url]
+    runs = [
+        json.loads(subprocess.run(command, check=True, capture_output=True, text=True, env=environment)
+                   .stdout.strip().splitlines()[-1])
+        for _ in range(args.runs)
+    ]
+
+    results = {
+        'runs': args.runs,
+        'url': args.url,
+        **{name: {'median': round(statistics.median(run[name] for run in runs), 2),
+                  'max': round(max(run[name] for run in runs), 2)}
+           for name in runs[0]},
+    }
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
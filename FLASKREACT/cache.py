@@ -0,0 +1,315 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, make_response, jsonify
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+from models import db, Data, DataVersion
+from singleflight import SingleFlight, SingleFlightTimeout
+
+# Bumped after every commit that touches Data; cached responses built against an
+# older version are treated as misses. The counter is per process; writes made
+# by other processes bump it when the shared watermark below is next read from
+# the primary (at most every DATA_VERSION_CHECK_INTERVAL seconds).
+_data_version = 0
+_version_lock = threading.Lock()
+
+
+def data_version():
+    return _data_version
+
+
+def bump_data_version():
+    """Invalidate every cached response (call after writes that bypass the ORM)."""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+
+
+# Across processes, every transaction that writes Data also increments the one
+# row of data_version. shared_watermark() reads it together with MAX(Data.id),
+# which catches inserts made with plain SQL; the versions committed by this
+# process are remembered so its own writes can be told apart. A lagging replica
+# can report an earlier watermark than one already seen, so watermarks only
+# ever move forward.
+_own_versions = set()
+MAX_OWN_VERSIONS = 100000
+
+_seen_watermark = None
+_watermark_checked_at = float('-inf')
+
+
+def bump_shared_version(session):
+    """Increment data_version in the session's current transaction (once per transaction)."""
+    if 'shared_version' in session.info:
+        return
+    connection = session.connection()
+    table = DataVersion.__table__
+    connection.execute(update(table).values(version=table.c.version + 1))
+    session.info['shared_version'] = connection.execute(select(table.c.version)).scalar()
+
+
+def watermark_statement():
+    """SELECT of (data_version, MAX(Data.id)); either is None on an empty database."""
+    return select(select(DataVersion.version).scalar_subquery(), select(func.max(Data.id)).scalar_subquery())
+
+
+def shared_watermark(session):
+    return tuple(session.execute(watermark_statement()).one())
+
+
+def primary_watermark():
+    """shared_watermark() read from the primary, whichever database the request reads from."""
+    with db.engine.connect() as connection:
+        return tuple(connection.execute(watermark_statement()).one())
+
+
+def _moved_forward(old, new):
+    (old_version, old_max_id), (version, max_id) = old, new
+    if version != old_version:
+        return (version or 0) > (old_version or 0)
+    return (max_id or 0) > (old_max_id or 0)
+
+
+def latest(old, new):
+    """The later of two watermarks (`old` may be None)."""
+    return new if old is None or _moved_forward(old, new) else old
+
+
+def _written_here(old, new):
+    """Whether every data_version after `old` up to `new` was committed by this process."""
+    if old is None or new is None or new < old:
+        return False
+    return all(version in _own_versions for version in range(old + 1, new + 1))
+
+
+def changed_elsewhere(old, new):
+    """Whether watermark `new` includes writes to Data since `old` that this process did not commit."""
+    if old is None:
+        return True
+    if not _moved_forward(old, new):
+        return False
+    (old_version, _), (version, _) = old, new
+    # A new MAX(Data.id) under the same version is an insert made with plain SQL
+    return version == old_version or not _written_here(old_version, version)
+
+
+def watermark_due(interval):
+    return time.monotonic() - _watermark_checked_at >= interval
+
+
+def observe_watermark(watermark):
+    """Record a freshly read watermark; cached responses are dropped if another process changed Data."""
+    global _seen_watermark, _watermark_checked_at
+    with _version_lock:
+        previous, _seen_watermark = _seen_watermark, latest(_seen_watermark, watermark)
+        _watermark_checked_at = time.monotonic()
+    if previous is not None and changed_elsewhere(previous, watermark):
+        bump_data_version()
+
+
+def sync_data_version(interval):
+    """Read the shared watermark from the primary if the last read is `interval` seconds old."""
+    if watermark_due(interval):
+        observe_watermark(primary_watermark())
+
+
+# Marks a request that must recompute and re-store its response (cache warming):
+# set in the WSGI environ in process, or sent over HTTP as a header holding a
+# timestamp signed with SECRET_KEY. Signed headers expire after
+# REFRESH_TOKEN_MAX_AGE seconds, and are refused while SECRET_KEY is still the
+# placeholder from app.py, which anyone could sign with.
+REFRESH_ENVIRON = 'cache.refresh'
+REFRESH_HEADER = 'X-Cache-Refresh'
+REFRESH_TOKEN_MAX_AGE = 60
+PLACEHOLDER_SECRET_KEYS = {None, '', 'your_secret_key'}
+
+
+def _sign(secret_key, timestamp):
+    return hmac.new(str(secret_key).encode(), f'cache-refresh:{timestamp}'.encode(), hashlib.sha256).hexdigest()
+
+
+def refresh_token(secret_key, now=None):
+    """A REFRESH_HEADER value: the current time and its signature."""
+    timestamp = str(int(time.time() if now is None else now))
+    return f'{timestamp}.{_sign(secret_key, timestamp)}'
+
+
+def valid_refresh_token(secret_key, token, max_age=REFRESH_TOKEN_MAX_AGE):
+    """Whether `token` was signed with `secret_key` within max_age seconds (either way, for clock skew)."""
+    if not token or secret_key in PLACEHOLDER_SECRET_KEYS:
+        return False
+    timestamp, _, signature = token.partition('.')
+    try:
+        age = time.time() - int(timestamp)
+    except ValueError:
+        return False
+    return abs(age) <= max_age and hmac.compare_digest(signature, _sign(secret_key, timestamp))
+
+
+def _remember_own_version(version):
+    global _own_versions
+    with _version_lock:
+        _own_versions.add(version)
+        if len(_own_versions) > MAX_OWN_VERSIONS:
+            _own_versions = {v for v in _own_versions if v > version - MAX_OWN_VERSIONS // 2}
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_data_writes(session, flush_context):
+    if any(isinstance(obj, Data) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['data_changed'] = True
+        bump_shared_version(session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop('data_changed', False):
+        bump_data_version()
+    version = session.info.pop('shared_version', None)
+    if version is not None:
+        _remember_own_version(version)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('data_changed', None)
+    session.info.pop('shared_version', None)
+
+
+def make_key(endpoint, args, variant=None):
+    """Cache key for an endpoint and its query parameters, independent of their order.
+
+    `variant` names a header-negotiated representation (e.g. MessagePack).
+    """
+    return (endpoint, tuple(sorted(args.items(multi=True))), variant)
+
+
+class ResponseCache:
+    """Thread-safe LRU + TTL cache of serialised responses, with single-flight misses.
+
+    `variant`, if given, is called per request and its result added to the key,
+    for representations chosen from headers rather than query parameters;
+    `vary` names those headers, and is sent in Vary with every cached response.
+    """
+
+    def __init__(self, max_entries=256, ttl=300, variant=None, flight_timeout=30.0, check_interval=2, vary=()):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.variant = variant
+        self.vary = list(vary)
+        self.flights = SingleFlight(flight_timeout)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        """Size the cache from RESPONSE_CACHE_MAX_ENTRIES and RESPONSE_CACHE_TTL."""
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', self.max_entries)
+        app.config.setdefault('RESPONSE_CACHE_TTL', self.ttl)
+        app.config.setdefault('DATA_VERSION_CHECK_INTERVAL', self.check_interval)
+        self.max_entries = app.config['RESPONSE_CACHE_MAX_ENTRIES']
+        self.ttl = app.config['RESPONSE_CACHE_TTL']
+        self.check_interval = app.config['DATA_VERSION_CHECK_INTERVAL']
+        app.config.setdefault('SINGLE_FLIGHT_TIMEOUT', self.flights.timeout)
+        self.flights.timeout = app.config['SINGLE_FLIGHT_TIMEOUT']
+
+    def get(self, key):
+        """Return (body, mimetype, etag) for a fresh entry, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, expires_at, body, mimetype, etag = entry
+                if version == _data_version and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return body, mimetype, etag
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, body, mimetype, version):
+        """Store a response body built against data `version`; return its ETag."""
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, body, mimetype, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'data_version': _data_version,
+                'single_flight': self.flights.stats(),
+            }
+
+    def cached(self, view=None, bypass=None):
+        """Decorator for GET views: serve from cache and answer If-None-Match with 304.
+
+        Use as @cache.cached, or @cache.cached(bypass=predicate) to skip the cache
+        for requests where predicate() is true (e.g. streamed responses). Refresh
+        requests (see REFRESH_ENVIRON) skip the lookup but store their response.
+        """
+        if view is None:
+            return lambda view: self.cached(view, bypass=bypass)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if bypass is not None and bypass():
+                return view(*args, **kwargs)
+
+            sync_data_version(self.check_interval)
+            key = make_key(request.endpoint, request.args, self.variant() if self.variant else None)
+            refresh = request.environ.get(REFRESH_ENVIRON) or valid_refresh_token(
+                current_app.config['SECRET_KEY'], request.headers.get(REFRESH_HEADER)
+            )
+            cached = None if refresh else self.get(key)
+            if cached is not None:
+                body, mimetype, etag = cached
+                response = make_response(body)
+                response.mimetype = mimetype
+            else:
+                # Read the version before querying so a concurrent import is never masked
+                version = _data_version
+
+                def compute():
+                    response = make_response(view(*args, **kwargs))
+                    etag = None
+                    if response.status_code == 200:
+                        etag = self.put(key, response.get_data(), response.mimetype, version)
+                    return response.status_code, response.get_data(), response.mimetype, etag
+
+                # Identical concurrent misses share one view call (and its error response)
+                try:
+                    status, body, mimetype, etag = self.flights.do((key, version), compute)
+                except SingleFlightTimeout as e:
+                    return jsonify({'error': str(e)}), 503
+                response = make_response(body, status)
+                response.mimetype = mimetype
+                if status != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.vary.update(self.vary)
+            return response.make_conditional(request)
+        return wrapper
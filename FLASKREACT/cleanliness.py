@@ -0,0 +1,101 @@
+import bisect
+from sqlalchemy import event, select, update, bindparam, and_, or_
+from sqlalchemy.orm import Session
+from models import db, Data
+
+# ISO 4406 cleanliness codes for the three particle counts (particles per mL at
+# >=4, >=6 and >=14 micron), stored on Data as scale numbers so the fleet
+# histogram is a plain indexed GROUP BY. Codes are computed per insert batch
+# (NumPy when installed, bisect otherwise) and by a before_flush hook for ORM writes.
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Upper limit (inclusive) of particles per mL for scale numbers 0..28; larger
+# counts get 29, reported as ">28"
+SCALE_UPPER_LIMITS = [
+    0.01, 0.02, 0.04, 0.08, 0.16, 0.32, 0.64, 1.3, 2.5, 5, 10, 20, 40, 80, 160, 320, 640,
+    1300, 2500, 5000, 10000, 20000, 40000, 80000, 160000, 320000, 640000, 1300000, 2500000,
+]
+
+# Particle count column -> scale number column
+CODE_COLUMNS = [
+    ('VLIMS_PARTICLE_COUNT_4_MICRON_SCALE', 'iso_4406_4_micron'),
+    ('VLIMS_PARTICLE_COUNT_6_MICRON_SCALE', 'iso_4406_6_micron'),
+    ('VLIMS_PARTICLE_COUNT_14_MICRON_SCALE', 'iso_4406_14_micron'),
+]
+
+BACKFILL_CHUNK_SIZE = 10000
+
+
+def scale_number(count):
+    if count is None:
+        return None
+    return bisect.bisect_left(SCALE_UPPER_LIMITS, count)
+
+
+def scale_numbers(counts):
+    """Scale numbers for a sequence of counts (None stays None), vectorised when NumPy is available."""
+    if np is None:
+        return [scale_number(count) for count in counts]
+    values = np.array([np.nan if count is None else count for count in counts], dtype=np.float64)
+    numbers = np.searchsorted(SCALE_UPPER_LIMITS, values, side='left')
+    return [None if missing else int(number) for number, missing in zip(numbers, np.isnan(values))]
+
+
+def assign_codes(rows):
+    """Set the iso_4406_* scale numbers on a batch of Data column mappings."""
+    for count_column, code_column in CODE_COLUMNS:
+        for row, number in zip(rows, scale_numbers([row.get(count_column) for row in rows])):
+            row[code_column] = number
+    return rows
+
+
+def format_code(*numbers):
+    """'19/17/14' style code; '-' for a size that was not measured, '>28' above the table."""
+    return '/'.join('-' if number is None else '>28' if number > 28 else str(number) for number in numbers)
+
+
+@event.listens_for(Session, 'before_flush')
+def _assign_orm_codes(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Data):
+            for count_column, code_column in CODE_COLUMNS:
+                setattr(obj, code_column, scale_number(getattr(obj, count_column)))
+
+
+def backfill(table=None, chunk_size=BACKFILL_CHUNK_SIZE):
+    """Fill missing scale numbers in `table` (default Data) chunk by chunk, in id order; return rows updated.
+
+    Each chunk is committed on its own, so the backfill can run against a live
+    database and resume where it stopped.
+    """
+    table = Data.__table__ if table is None else table
+    missing = or_(*[
+        and_(table.c[code_column].is_(None), table.c[count_column].isnot(None))
+        for count_column, code_column in CODE_COLUMNS
+    ])
+    statement = update(table).where(table.c.id == bindparam('row_id')).values(
+        {code_column: bindparam(f'new_{code_column}') for _, code_column in CODE_COLUMNS}
+    )
+
+    updated, last_id = 0, 0
+    while True:
+        rows = [dict(row) for row in db.session.execute(
+            select(table.c.id, *[table.c[count_column] for count_column, _ in CODE_COLUMNS])
+            .where(table.c.id > last_id, missing).order_by(table.c.id).limit(chunk_size)
+        ).mappings()]
+        if not rows:
+            return updated
+
+        assign_codes(rows)
+        db.session.execute(statement, [
+            {'row_id': row['id'],
+             **{f'new_{code_column}': row[code_column] for _, code_column in CODE_COLUMNS}}
+            for row in rows
+        ])
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1]['id']
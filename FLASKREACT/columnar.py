@@ -0,0 +1,318 @@
+import threading
+import time
+import weakref
+from collections import namedtuple
+from datetime import date
+import numpy as np
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from models import db, Data
+import cache
+import ingest
+import partitions
+import streaming
+
+# Optional in-memory analytics engine (ANALYTICS_ENGINE = 'memory').
+#
+# Data is held column by column, sorted by testdate:
+#   day                          int32 days since 1970-01-01
+#   Ship / Samp_Type / sample pt int32 codes into a per-column Dictionary
+#   particle counts              float64, NaN for NULL
+# so a date range is a searchsorted slice and every aggregate is a vectorised
+# pass over that slice.
+#
+# Inserts made through this process are appended as they commit. Anything else
+# (another worker, `flask import-data`, plain SQL inserts) shows up in the
+# shared watermark from cache.py, which is read at most every check_interval
+# seconds; a change this process did not make reloads the store.
+
+EPOCH = date(1970, 1, 1).toordinal()
+
+DIMENSIONS = ['Ship', 'Samp_Type', 'vlims_lo_samp_point_Desc']
+
+PARTICLE_COLUMNS = [
+    ('VLIMS_PARTICLE_COUNT_4_MICRON_SCALE', '4_micron'),
+    ('VLIMS_PARTICLE_COUNT_6_MICRON_SCALE', '6_micron'),
+    ('VLIMS_PARTICLE_COUNT_14_MICRON_SCALE', '14_micron'),
+]
+
+LOAD_CHUNK_SIZE = 50000
+
+
+def day_number(value):
+    return value.toordinal() - EPOCH
+
+
+class Dictionary:
+    """Dictionary encoding for one categorical column; None is encoded like any value."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        return self.codes.get(value, -1)
+
+
+def _empty_columns():
+    columns = {'day': np.empty(0, dtype=np.int32)}
+    for dimension in DIMENSIONS:
+        columns[dimension] = np.empty(0, dtype=np.int32)
+    for column, _ in PARTICLE_COLUMNS:
+        columns[column] = np.empty(0, dtype=np.float64)
+    return columns
+
+
+def _encode(rows, dictionaries):
+    """Turn a list of Data column mappings into column arrays."""
+    count = len(rows)
+    columns = {'day': np.fromiter((day_number(row['testdate']) for row in rows), np.int32, count)}
+    for dimension in DIMENSIONS:
+        encode = dictionaries[dimension].encode
+        columns[dimension] = np.fromiter((encode(row[dimension]) for row in rows), np.int32, count)
+    for column, _ in PARTICLE_COLUMNS:
+        columns[column] = np.fromiter(
+            (np.nan if row[column] is None else row[column] for row in rows), np.float64, count
+        )
+    return columns
+
+
+def _concatenate(parts):
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+class ColumnarStore:
+    """Date-sorted NumPy copy of Data answering grouped count/mean/min/max queries."""
+
+    def __init__(self, check_interval=2.0):
+        self._lock = threading.Lock()
+        # Held while loading or checking the watermark, so concurrent requests reload once
+        self._load_lock = threading.Lock()
+        self.columns = _empty_columns()
+        self.dictionaries = {dimension: Dictionary() for dimension in DIMENSIONS}
+        self.check_interval = check_interval
+        self.watermark = None
+        self.stale = False
+        self._loading = False
+        self._checked_at = float('-inf')
+
+    def __len__(self):
+        return len(self.columns['day'])
+
+    def load(self):
+        """(Re)build the store from Data (hot and archived years), LOAD_CHUNK_SIZE rows per query."""
+        with self._load_lock:
+            self._load()
+
+    def _load(self):
+        with self._lock:
+            self._loading = True
+            self.stale = False
+        try:
+            # Read first, so anything committed during the load is seen by the next check
+            watermark = cache.shared_watermark(db.session)
+            dictionaries = {dimension: Dictionary() for dimension in DIMENSIONS}
+            data = partitions.data_source()
+            query = select(
+                data.id, data.testdate, *[getattr(data, d) for d in DIMENSIONS],
+                *[getattr(data, c) for c, _ in PARTICLE_COLUMNS]
+            ).order_by(data.testdate, data.id)
+
+            parts = [_empty_columns()]
+            chunks = streaming.keyset_chunks(query, data.testdate, data.id, LOAD_CHUNK_SIZE, db.session.execute)
+            for chunk in chunks:
+                parts.append(_encode([row._mapping for row in chunk], dictionaries))
+
+            with self._lock:
+                self.columns = _concatenate(parts)
+                self.dictionaries = dictionaries
+                self.watermark = watermark
+        except Exception:
+            self.stale = True
+            raise
+        finally:
+            with self._lock:
+                self._loading = False
+        self._checked_at = time.monotonic()
+
+    def refresh(self):
+        """Reload if Data changed other than through this process; checks at most every check_interval seconds."""
+        if not self.stale and time.monotonic() < self._checked_at + self.check_interval:
+            return
+        with self._load_lock:
+            if not self.stale and time.monotonic() < self._checked_at + self.check_interval:
+                return
+            watermark = cache.shared_watermark(db.session)
+            # Writes committed by this process were appended as they committed
+            if self.stale or cache.changed_elsewhere(self.watermark, watermark):
+                self._load()
+            else:
+                self.watermark = cache.latest(self.watermark, watermark)
+                self._checked_at = time.monotonic()
+
+    def append(self, rows):
+        """Add newly inserted Data rows (mappings of column values) to the store."""
+        if not rows:
+            return
+        with self._lock:
+            if self._loading:
+                # The snapshot being loaded may predate these rows; load again afterwards
+                self.stale = True
+                return
+            new = _encode(rows, self.dictionaries)
+            columns = _concatenate([self.columns, new])
+            if len(self.columns['day']) and new['day'].min() < self.columns['day'][-1]:
+                order = np.argsort(columns['day'], kind='stable')
+                columns = {name: values[order] for name, values in columns.items()}
+            self.columns = columns
+
+    def _select(self, start_date, end_date, filters):
+        self.refresh()
+
+        with self._lock:
+            columns, dictionaries = self.columns, self.dictionaries
+
+        days = columns['day']
+        low = np.searchsorted(days, day_number(start_date), 'left') if start_date else 0
+        high = np.searchsorted(days, day_number(end_date), 'right') if end_date else len(days)
+        selected = {name: values[low:high] for name, values in columns.items()}
+
+        if filters:
+            mask = np.ones(high - low, dtype=bool)
+            for dimension, wanted in filters.items():
+                if not isinstance(wanted, (list, tuple, set)):
+                    wanted = [wanted]
+                codes = [dictionaries[dimension].lookup(value) for value in wanted]
+                mask &= np.isin(selected[dimension], [code for code in codes if code >= 0])
+            selected = {name: values[mask] for name, values in selected.items()}
+
+        return selected, dictionaries
+
+    def aggregate(self, group_by, start_date=None, end_date=None, **filters):
+        """Group rows in [start_date, end_date] matching filters by the given dimensions.
+
+        Filters are dimension=value or dimension=[values]. Returns one named tuple
+        per group with the group values followed by count and avg_/min_/max_ fields
+        for each particle column (None where the group has no non-null values).
+        """
+        columns, dictionaries = self._select(start_date, end_date, filters)
+
+        fields = list(group_by) + ['count']
+        for _, suffix in PARTICLE_COLUMNS:
+            fields += [f'avg_{suffix}', f'min_{suffix}', f'max_{suffix}']
+        Row = namedtuple('Row', fields)
+
+        if not len(columns['day']):
+            return []
+
+        keys = np.stack([columns[dimension] for dimension in group_by], axis=1)
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        size = len(groups)
+
+        results = [list(np.bincount(inverse, minlength=size))]
+        for column, _ in PARTICLE_COLUMNS:
+            values = columns[column]
+            present = ~np.isnan(values)
+            non_null = np.bincount(inverse, weights=present, minlength=size)
+            sums = np.bincount(inverse, weights=np.where(present, values, 0.0), minlength=size)
+            minimums = np.full(size, np.inf)
+            maximums = np.full(size, -np.inf)
+            np.fmin.at(minimums, inverse, values)
+            np.fmax.at(maximums, inverse, values)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = sums / non_null
+            empty = non_null == 0
+            for metric in (means, minimums, maximums):
+                metric[empty] = np.nan
+                results.append(metric.tolist())
+
+        rows = []
+        for index, codes in enumerate(groups):
+            labels = [dictionaries[d].values[code] for d, code in zip(group_by, codes)]
+            metrics = [int(results[0][index])] + [
+                None if np.isnan(values[index]) else values[index] for values in results[1:]
+            ]
+            rows.append(Row(*labels, *metrics))
+        return rows
+
+
+# Stores kept in step with Data by the write hooks below. The hooks are
+# registered once for the process and reach every live store, so creating apps
+# (and stores) does not pile up listeners; a store drops out when collected.
+_tracked = weakref.WeakSet()
+
+
+def track_writes(store):
+    """Keep store in step with Data: append ORM/imported inserts, reload after updates/deletes."""
+    _tracked.add(store)
+    return store
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect(session, flush_context):
+    if not _tracked:
+        return
+    pending = session.info.setdefault('columnar_rows', [])
+    for obj in session.new:
+        if isinstance(obj, Data):
+            pending.append({name: getattr(obj, name) for name in
+                            ['testdate'] + DIMENSIONS + [c for c, _ in PARTICLE_COLUMNS]})
+    if any(isinstance(obj, Data) for obj in (*session.dirty, *session.deleted)):
+        session.info['columnar_reload'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply(session):
+    rows = session.info.pop('columnar_rows', [])
+    reload = session.info.pop('columnar_reload', False)
+    for store in list(_tracked):
+        store.append(rows)
+        if reload:
+            # SQL cannot run inside after_commit; the next query reloads instead
+            store.stale = True
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('columnar_rows', None)
+    session.info.pop('columnar_reload', None)
+
+
+@ingest.rows_inserted.connect
+def _imported(sender, rows):
+    for store in list(_tracked):
+        store.append(rows)
+
+
+def check_parity(store, tolerance=1e-6):
+    """Compare store aggregates with SQL GROUP BYs over Data; return a list of mismatches."""
+    mismatches = []
+    data = partitions.data_source()
+    for group_by in (['Samp_Type'], ['Ship', 'Samp_Type'], ['Ship', 'vlims_lo_samp_point_Desc']):
+        expected = {}
+        aggregates = [func.count(data.id)]
+        for column, _ in PARTICLE_COLUMNS:
+            aggregates += [func.avg(getattr(data, column)), func.min(getattr(data, column)),
+                           func.max(getattr(data, column))]
+        dimensions = [getattr(data, d) for d in group_by]
+        for row in db.session.execute(select(*dimensions, *aggregates).group_by(*dimensions)):
+            expected[tuple(row[:len(group_by)])] = list(row[len(group_by):])
+
+        actual = {tuple(row[:len(group_by)]): list(row[len(group_by):]) for row in store.aggregate(group_by)}
+
+        for key in expected.keys() | actual.keys():
+            want, got = expected.get(key), actual.get(key)
+            if want is None or got is None or any(
+                (a is None) != (b is None) or (a is not None and abs(a - b) > tolerance * max(1.0, abs(a)))
+                for a, b in zip(want, got)
+            ):
+                mismatches.append({'group_by': group_by, 'group': key, 'sql': want, 'memory': got})
+    return mismatches
@@ -0,0 +1,158 @@
+import click
+import time
+from datetime import date
+from flask import current_app
+from flask.cli import with_appcontext
+from models import db, Data, DataDailyRollup
+import rollup
+import migrations
+import partitions
+import sketches
+import ingest
+import export
+import warmer
+
+# `flask <command>` maintenance commands, registered on the app by init_app().
+
+
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Create any missing tables (run `flask upgrade-db` afterwards for schema changes)."""
+    db.create_all()
+    print("Created missing tables")
+
+
+@click.command("rebuild-rollup")
+@with_appcontext
+def rebuild_rollup_command():
+    """Recompute the daily rollup table from the raw Data table."""
+    groups = rollup.rebuild()
+    print(f"Rebuilt data_daily_rollup with {groups} groups")
+
+
+@click.command("upgrade-db")
+@with_appcontext
+def upgrade_db_command():
+    """Apply pending schema migrations (indexes, new columns, backfills)."""
+    applied = migrations.upgrade()
+    print(f"Applied {len(applied)} migration(s): {', '.join(applied) or 'none pending'}")
+
+
+@click.command("archive-data")
+@with_appcontext
+@click.option("--before-year", type=int, default=None,
+              help="Archive every year before this one (default: keep HOT_YEARS in the hot table).")
+def archive_data_command(before_year):
+    """Move closed years of Data to compact per-year cold tables that queries still read."""
+    if before_year is None:
+        before_year = date.today().year - current_app.config['HOT_YEARS'] + 1
+    # On MySQL, give next year its own partition before rows for it arrive
+    for model in (Data, DataDailyRollup):
+        added = partitions.add_year_partitions(model.__table__, date.today().year + 1)
+        if added:
+            print(f"Added {model.__tablename__} partitions for {', '.join(map(str, added))}")
+
+    moved = partitions.archive_before(before_year)
+    for year, rows in moved.items():
+        print(f"Archived {rows} rows of {year} to {partitions.cold_table(year).name}")
+    print(f"{len(moved)} year(s) archived; hot table now starts at {before_year}")
+
+
+@click.command("check-sketch-accuracy")
+@with_appcontext
+def check_sketch_accuracy_command():
+    """Compare merged rollup sketches with exact percentiles of Data per ship and sample point."""
+    mismatches, largest_error = rollup.check_sketches()
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    print(f"largest relative error {largest_error:.4%} (bound {sketches.RELATIVE_ACCURACY:.0%}), "
+          f"{len(mismatches)} mismatch(es)")
+    if mismatches:
+        raise SystemExit(1)
+
+
+@click.command("import-data")
+@with_appcontext
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", type=int, default=None, help="Rows per insert batch.")
+def import_data_command(path, chunk_size):
+    """Stream a VLIMS CSV/XLSX lab export into the Data table."""
+    def report(chunk):
+        print(f"chunk {chunk['chunk']}: {chunk['inserted']}/{chunk['rows']} inserted, "
+              f"{chunk['rejected']} rejected, {chunk['duplicates']} duplicates, "
+              f"{chunk['elapsed_seconds']}s ({chunk['rows_per_second']} rows/s)")
+
+    with open(path, 'rb') as stream:
+        summary = ingest.import_rows(
+            ingest.read_export(stream, path),
+            chunk_size=chunk_size or current_app.config['IMPORT_CHUNK_SIZE'],
+            on_chunk=report,
+        )
+
+    for rejection in summary['rejections']:
+        print(f"row {rejection['row']} rejected: {rejection['error']}")
+    print(f"Imported {summary['inserted']} of {summary['rows']} rows in {summary['elapsed_seconds']}s "
+          f"({summary['rows_per_second']} rows/s), {summary['rejected']} rejected, "
+          f"{summary['duplicates']} duplicates")
+
+
+@click.command("export-data")
+@with_appcontext
+@click.argument("path", type=click.Path(dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(export.FORMATS), default="arrow",
+              help="arrow writes an Arrow IPC file that export.open_snapshot() memory-maps.")
+@click.option("--ship", default=None, help="Only this ship.")
+@click.option("--sample-point", default=None, help="Only this sample point.")
+@click.option("--start-date", type=click.DateTime(["%Y-%m-%d"]), default=None)
+@click.option("--end-date", type=click.DateTime(["%Y-%m-%d"]), default=None)
+def export_data_command(path, fmt, ship, sample_point, start_date, end_date):
+    """Write Data (optionally filtered) to an Arrow snapshot or Parquet file."""
+    if not export.available():
+        raise click.ClickException("Export requires the pyarrow package")
+    statement = export.export_query(
+        ship_name=ship,
+        start_date=start_date.date() if start_date else None,
+        end_date=end_date.date() if end_date else None,
+        sample_point=sample_point,
+    )
+    started = time.perf_counter()
+    rows = export.write_snapshot(path, statement, current_app.config['EXPORT_CHUNK_SIZE'], fmt)
+    elapsed = time.perf_counter() - started
+    print(f"Exported {rows} rows to {path} in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+
+@click.command("warm-cache")
+@click.option("--url", default=None, help="Warm a running server at this base URL (without it, only this process is warmed, as a check).")
+@click.option("--watch", is_flag=True, help="Keep running, re-warming before entries expire and after Data changes.")
+@click.option("--interval", type=int, default=None, help="With --watch, seconds between passes (default: derived from RESPONSE_CACHE_TTL).")
+@with_appcontext
+def warm_cache_command(url, watch, interval):
+    """Precompute the standard dashboard windows (last 30/90/365 days, YTD, each year) into the cache."""
+    cache_warmer = current_app.extensions['cache_warmer']
+    fetch = warmer.http_fetch(url, current_app.config['SECRET_KEY']) if url else None
+
+    def report(run):
+        print(f"Warmed {run['targets']} responses in {run['seconds']}s "
+              f"({run['empty']} windows without data, {run['failed']} failed)")
+
+    report(cache_warmer.warm(fetch))
+    if watch or interval:
+        cache_warmer.run(fetch, interval, report)
+
+
+COMMANDS = [
+    init_db_command,
+    rebuild_rollup_command,
+    upgrade_db_command,
+    archive_data_command,
+    check_sketch_accuracy_command,
+    import_data_command,
+    export_data_command,
+    warm_cache_command,
+]
+
+
+def init_app(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
@@ -0,0 +1,132 @@
+import threading
+from sqlalchemy import event, select, insert, update, exists
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import db, Ship, SamplePoint, Data
+
+# Ship and sample point names live once in their dimension tables; Data and the
+# daily rollup refer to them by integer key. Every Data writer goes through
+# assign_keys (ingest, benchmarks) or the before_flush hook below (ORM), so new
+# names get a dimension row the first time they are seen.
+
+# Data column holding each dimension's name, and the key column it maps to
+DIMENSIONS = [
+    (Ship, 'Ship', 'ship_id'),
+    (SamplePoint, 'vlims_lo_samp_point_Desc', 'sample_point_id'),
+]
+
+# name -> id per dimension model, for committed rows only; ids never change once committed.
+# Ids read inside a transaction may belong to rows that transaction added, so
+# they wait in connection.info until it commits, and are dropped if it rolls back.
+_ids = {Ship: {}, SamplePoint: {}}
+_ids_lock = threading.Lock()
+_PENDING = 'dimension_ids'
+
+
+def _clear_ids():
+    with _ids_lock:
+        for ids in _ids.values():
+            ids.clear()
+
+
+def resolve(connection, model, names):
+    """{name: id} for names, adding dimension rows for any not stored yet."""
+    names = {name for name in names if name is not None}
+    with _ids_lock:
+        found = {name: _ids[model][name] for name in names if name in _ids[model]}
+    missing = names - found.keys()
+    if not missing:
+        return found
+
+    table = model.__table__
+    pending = _pending(connection, model)
+    found.update({name: pending[name] for name in missing if name in pending})
+    missing -= found.keys()
+    if not missing:
+        return found
+
+    stored = _select_ids(connection, table, missing)
+    pending.update(stored)
+    found.update(stored)
+    if len(stored) == len(missing):
+        return found
+
+    for name in missing - stored.keys():
+        try:
+            # Savepoint so a concurrent writer adding the same name does not abort the transaction
+            with connection.begin_nested():
+                connection.execute(insert(table).values(name=name))
+        except IntegrityError:
+            pass
+    added = _select_ids(connection, table, missing - stored.keys())
+    _pending(connection, model).update(added)
+    found.update(added)
+    return found
+
+
+def _pending(connection, model):
+    return connection.info.setdefault(_PENDING, {Ship: {}, SamplePoint: {}})[model]
+
+
+def _select_ids(connection, table, names):
+    return dict(connection.execute(select(table.c.name, table.c.id).where(table.c.name.in_(names))).all())
+
+
+def assign_keys(connection, rows):
+    """Set ship_id / sample_point_id on Data column mappings from their names."""
+    for model, name_column, key_column in DIMENSIONS:
+        ids = resolve(connection, model, {row[name_column] for row in rows})
+        for row in rows:
+            row[key_column] = ids.get(row[name_column])
+    return rows
+
+
+@event.listens_for(Session, 'before_flush')
+def _assign_orm_keys(session, flush_context, instances):
+    """Fill the integer keys of new and renamed Data objects before they are written."""
+    for obj in (*session.new, *session.dirty):
+        if not isinstance(obj, Data):
+            continue
+        for model, name_column, key_column in DIMENSIONS:
+            name = getattr(obj, name_column)
+            ids = resolve(session.connection(), model, [name])
+            setattr(obj, key_column, ids.get(name))
+
+
+@event.listens_for(Engine, 'commit')
+def _remember_committed_ids(connection):
+    pending = connection.info.pop(_PENDING, None)
+    if pending:
+        with _ids_lock:
+            for model, ids in pending.items():
+                _ids[model].update(ids)
+
+
+@event.listens_for(Engine, 'rollback')
+@event.listens_for(Engine, 'rollback_savepoint')
+def _forget_uncommitted_ids(connection, *args):
+    # The rows behind these ids may have been added by the transaction rolled back
+    connection.info.pop(_PENDING, None)
+
+
+def backfill():
+    """Add dimension rows for every name in Data and fill NULL integer keys; return rows updated."""
+    updated = 0
+    for model, name_column, key_column in DIMENSIONS:
+        name = getattr(Data, name_column)
+        db.session.execute(
+            insert(model.__table__).from_select(
+                ['name'],
+                select(name).distinct().where(name.isnot(None), ~exists().where(model.name == name))
+            )
+        )
+        result = db.session.execute(
+            update(Data.__table__).where(
+                getattr(Data, key_column).is_(None), name.isnot(None)
+            ).values({key_column: select(model.id).where(model.name == name).scalar_subquery()})
+        )
+        updated += result.rowcount
+    db.session.commit()
+    _clear_ids()
+    return updated
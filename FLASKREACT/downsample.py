@@ -0,0 +1,47 @@
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets: indices of at most `threshold` points to keep.
+
+    points is a list of (x, y) sorted by x. The first and last points are always
+    kept; each bucket in between contributes the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    Points may carry several y values, (x, y1, y2, ...), to pick one set of
+    points for lines sharing x; the triangle areas of the lines are added up.
+    """
+    if threshold < 3:
+        raise ValueError("threshold must be at least 3")
+    count = len(points)
+    if threshold >= count:
+        return list(range(count))
+
+    keep = [0]
+    bucket_size = (count - 2) / (threshold - 2)
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # Average of the next bucket (or the last point for the final bucket)
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        if next_start >= next_end:
+            next_start, next_end = count - 1, count
+        span = next_end - next_start
+        average_x, *average_ys = [sum(values) / span for values in zip(*points[next_start:next_end])]
+
+        previous_x, *previous_ys = points[previous]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            x, *ys = points[i]
+            area = sum(
+                abs((previous_x - average_x) * (y - previous_y) - (previous_x - x) * (average_y - previous_y))
+                for y, previous_y, average_y in zip(ys, previous_ys, average_ys)
+            )
+            if area > best_area:
+                best, best_area = i, area
+
+        keep.append(best)
+        previous = best
+
+    keep.append(count - 1)
+    return keep
@@ -0,0 +1,196 @@
+import os
+from sqlalchemy import select
+from models import db, Ship, SamplePoint
+import partitions
+import streaming
+
+# Bulk export of Data as Apache Arrow (IPC stream or file) or Parquet, for
+# analysis tools that would otherwise page through the JSON endpoints.
+#
+# Rows are read EXPORT_CHUNK_SIZE at a time, one keyset-paginated query per chunk
+# (streaming.keyset_chunks), and each chunk becomes one record batch (one Parquet row group), so memory stays flat
+# whatever the export size. Ship, Samp_Type and the sample point are
+# dictionary encoded. Their dictionaries only ever grow, so later batches send
+# just the new values (dictionary deltas) and every batch shares the codes.
+#
+# An Arrow IPC *file* is the snapshot format: pyarrow can memory-map it
+# (open_snapshot) and read columns straight from the page cache. pyarrow is
+# optional; without it only `available()` is usable.
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+MIMETYPES = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+FORMATS = list(MIMETYPES)
+
+DICTIONARY_COLUMNS = ['Ship', 'Samp_Type', 'vlims_lo_samp_point_Desc']
+
+
+def available():
+    return pa is not None
+
+
+def schema():
+    """Arrow schema of an export: Data's columns, without the internal dimension keys."""
+    label = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('id', pa.int64()),
+        ('Ship', label),
+        ('Samp_Type', label),
+        ('testdate', pa.date32()),
+        ('vlims_lo_samp_point_Desc', label),
+        ('VLIMS_PARTICLE_COUNT_4_MICRON_SCALE', pa.float64()),
+        ('VLIMS_PARTICLE_COUNT_6_MICRON_SCALE', pa.float64()),
+        ('VLIMS_PARTICLE_COUNT_14_MICRON_SCALE', pa.float64()),
+        ('iso_4406_4_micron', pa.int16()),
+        ('iso_4406_6_micron', pa.int16()),
+        ('iso_4406_14_micron', pa.int16()),
+    ])
+
+
+def export_query(ship_name=None, start_date=None, end_date=None, sample_point=None):
+    """SELECT of the exported columns, ordered by (testdate, id); dates are inclusive."""
+    data = partitions.data_source(start_date.year if start_date else None, end_date.year if end_date else None)
+    filters = []
+    if ship_name:
+        filters.append(data.ship_id == select(Ship.id).where(Ship.name == ship_name).scalar_subquery())
+    if sample_point:
+        filters.append(
+            data.sample_point_id == select(SamplePoint.id).where(SamplePoint.name == sample_point).scalar_subquery()
+        )
+    if start_date:
+        filters.append(data.testdate >= start_date)
+    if end_date:
+        filters.append(data.testdate <= end_date)
+    columns = [getattr(data, name) for name in schema().names]
+    return select(*columns).where(*filters).order_by(data.testdate, data.id)
+
+
+class _Dictionary:
+    """Append-only value -> code mapping for one dictionary-encoded column."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, column):
+        codes = self.codes
+        indices = []
+        for value in column:
+            if value is None:
+                indices.append(None)
+                continue
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+            indices.append(code)
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, pa.int32()), pa.array(self.values, pa.string())
+        )
+
+
+def record_batches(statement, chunk_size):
+    """Yield one RecordBatch per `chunk_size` rows of `statement` (an export_query())."""
+    export_schema = schema()
+    dictionaries = {name: _Dictionary() for name in DICTIONARY_COLUMNS}
+    columns = statement.selected_columns
+    # Core execution on the session's connection: plain tuples, no ORM row loading
+    chunks = streaming.keyset_chunks(
+        statement, columns.testdate, columns.id, chunk_size, db.session.connection().execute
+    )
+    for rows in chunks:
+        columns = zip(*rows)
+        arrays = []
+        for field, column in zip(export_schema, columns):
+            if field.name in dictionaries:
+                arrays.append(dictionaries[field.name].encode(column))
+            else:
+                arrays.append(pa.array(column, field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=export_schema)
+
+
+def _writer(sink, fmt, file=False):
+    if fmt == 'parquet':
+        return pq.ParquetWriter(sink, schema(), compression='zstd')
+    options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+    if file:
+        return pa.ipc.new_file(sink, schema(), options=options)
+    return pa.ipc.new_stream(sink, schema(), options=options)
+
+
+def write(batches, sink, fmt, file=False):
+    """Write record batches to a path or file object; return the number of rows."""
+    rows = 0
+    with _writer(sink, fmt, file) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+class _Chunks:
+    """Write-only file object whose contents are taken out piece by piece."""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def stream(batches, fmt):
+    """Encode record batches as an Arrow IPC stream or Parquet file, yielding bytes per batch."""
+    sink = _Chunks()
+    with _writer(sink, fmt) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            data = sink.take()
+            if data:
+                yield data
+    data = sink.take()
+    if data:
+        yield data
+
+
+def write_snapshot(path, statement, chunk_size, fmt='arrow'):
+    """Write an Arrow IPC file (or Parquet) to `path`, replacing any previous one only once it is complete."""
+    partial = f'{path}.partial'
+    try:
+        rows = write(record_batches(statement, chunk_size), partial, fmt, file=True)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return rows
+
+
+def open_snapshot(path):
+    """Memory-map an Arrow snapshot as a pyarrow Table; its columns are not copied into memory."""
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
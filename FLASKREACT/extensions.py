@@ -0,0 +1,40 @@
+import threading
+from flask import current_app
+from cache import ResponseCache
+from passwords import PasswordHasher
+import serialization
+
+# Objects shared by the blueprints. They are created unconfigured at import and
+# set up by init_app(); none of them touches the database or starts a process
+# pool until a request needs it, so creating an app stays cheap.
+
+response_cache = ResponseCache(variant=serialization.response_variant, vary=serialization.VARY)
+bcrypt = PasswordHasher()
+
+_columnar_lock = threading.Lock()
+
+
+def init_app(app):
+    response_cache.init_app(app)
+    bcrypt.init_app(app)
+
+
+def columnar_store():
+    """The app's in-memory columnar engine, or None when ANALYTICS_ENGINE is 'sql'.
+
+    It is loaded from the database by the first request that needs it and kept
+    current by write hooks and the shared data version from then on.
+    """
+    app = current_app._get_current_object()
+    if app.config['ANALYTICS_ENGINE'] != 'memory':
+        return None
+    store = app.extensions.get('columnar_store')
+    if store is None:
+        with _columnar_lock:
+            store = app.extensions.get('columnar_store')
+            if store is None:
+                import columnar
+                store = columnar.track_writes(columnar.ColumnarStore(app.config['DATA_VERSION_CHECK_INTERVAL']))
+                store.load()
+                app.extensions['columnar_store'] = store
+    return store
@@ -0,0 +1,243 @@
+import csv
+import io
+import math
+import time
+from datetime import datetime, date
+from itertools import islice
+from flask.signals import Namespace
+from sqlalchemy import insert, select
+from models import db, Data
+import rollup
+import cache
+import cleanliness
+import dimensions
+import partitions
+import routing
+
+# Accepted spellings of each Data column in lab exports (matched case-insensitively)
+COLUMN_ALIASES = {
+    'Ship': ['ship', 'ship_name'],
+    'Samp_Type': ['samp_type', 'sample_type'],
+    'testdate': ['testdate', 'test_date'],
+    'vlims_lo_samp_point_Desc': ['vlims_lo_samp_point_desc', 'sample_point'],
+    'VLIMS_PARTICLE_COUNT_4_MICRON_SCALE': ['vlims_particle_count_4_micron_scale', 'particle_count_4_micron'],
+    'VLIMS_PARTICLE_COUNT_6_MICRON_SCALE': ['vlims_particle_count_6_micron_scale', 'particle_count_6_micron'],
+    'VLIMS_PARTICLE_COUNT_14_MICRON_SCALE': ['vlims_particle_count_14_micron_scale', 'particle_count_14_micron'],
+}
+
+PARTICLE_COLUMNS = [column for column, _, _ in rollup.PARTICLE_COLUMNS]
+
+# Only the first few rejected rows are echoed back; the rest are just counted
+MAX_REPORTED_REJECTIONS = 100
+
+# Sent with rows=[...] after each committed batch, for in-process copies of Data
+signals = Namespace()
+rows_inserted = signals.signal('rows-inserted')
+
+
+class InvalidExportError(ValueError):
+    """The export as a whole cannot be imported (unknown format, missing columns)."""
+
+
+def _header_map(header):
+    lookup = {alias: column for column, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    mapping = {}
+    for position, name in enumerate(header):
+        column = lookup.get(str(name or '').strip().lower())
+        if column:
+            mapping[position] = column
+
+    missing = {'Ship', 'Samp_Type', 'testdate'} - set(mapping.values())
+    if missing:
+        raise InvalidExportError(f"Missing required column(s): {', '.join(sorted(missing))}")
+    return mapping
+
+
+def read_csv(stream):
+    """Yield (line_number, {column: raw value}) from a binary CSV stream."""
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    mapping = _header_map(next(reader, []))
+    for values in reader:
+        if not any(values):
+            continue
+        yield reader.line_num, {column: values[i] for i, column in mapping.items() if i < len(values)}
+
+
+def read_xlsx(stream):
+    """Yield (row_number, {column: raw value}) from an XLSX workbook's first sheet."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise InvalidExportError("XLSX import requires the openpyxl package")
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        mapping = _header_map(next(rows, ()))
+        for row_number, values in enumerate(rows, start=2):
+            if not any(value not in (None, '') for value in values):
+                continue
+            yield row_number, {column: values[i] for i, column in mapping.items() if i < len(values)}
+    finally:
+        workbook.close()
+
+
+def read_export(stream, filename):
+    """Pick the reader for an export from its file extension."""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return read_csv(stream)
+    if name.endswith('.xlsx'):
+        return read_xlsx(stream)
+    raise InvalidExportError("Unsupported file type. Upload a .csv or .xlsx export")
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value or '').strip()
+    if not value:
+        raise ValueError("testdate is required")
+    try:
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"Invalid testdate {value!r}. Use YYYY-MM-DD")
+
+
+def _parse_count(column, value):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        count = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {column} {value!r}")
+    if not math.isfinite(count):
+        raise ValueError(f"Invalid {column} {value!r}")
+    if count < 0:
+        raise ValueError(f"{column} cannot be negative")
+    return count
+
+
+def validate_row(raw):
+    """Map one raw export row onto Data column values, raising ValueError if invalid."""
+    ship = str(raw.get('Ship') or '').strip()
+    samp_type = str(raw.get('Samp_Type') or '').strip()
+    if not ship or not samp_type:
+        raise ValueError("Ship and Samp_Type are required")
+
+    sample_point = str(raw.get('vlims_lo_samp_point_Desc') or '').strip() or None
+    if len(ship) > 255 or len(samp_type) > 50 or (sample_point and len(sample_point) > 50):
+        raise ValueError("Ship, Samp_Type or sample point is too long")
+
+    row = {
+        'Ship': ship,
+        'Samp_Type': samp_type,
+        'testdate': _parse_date(raw.get('testdate')),
+        'vlims_lo_samp_point_Desc': sample_point,
+    }
+    for column in PARTICLE_COLUMNS:
+        row[column] = _parse_count(column, raw.get(column))
+    return row
+
+
+def _dedup_key(row):
+    return (row['Ship'], row['vlims_lo_samp_point_Desc'], row['testdate'])
+
+
+def _existing_keys(rows):
+    """(Ship, sample point, testdate) keys from this chunk that are already stored."""
+    keys = {_dedup_key(row) for row in rows}
+    ship_ids = {row['ship_id'] for row in rows}
+    dates = [key[2] for key in keys]
+    # Rows for archived years may already sit in a cold table
+    data = partitions.data_source(min(dates).year, max(dates).year)
+    existing = db.session.execute(
+        select(data.Ship, data.vlims_lo_samp_point_Desc, data.testdate).where(
+            data.ship_id.in_(ship_ids),
+            data.testdate >= min(dates),
+            data.testdate <= max(dates),
+        )
+    )
+    return {tuple(row) for row in existing} & keys
+
+
+def import_rows(records, chunk_size=5000, on_chunk=None):
+    """Validate and insert (row_number, raw) records chunk by chunk.
+
+    Each chunk is inserted with one executemany INSERT, folded into the daily
+    rollup and committed, so memory stays bounded by chunk_size. on_chunk is
+    called with each chunk's report as soon as it is committed.
+    """
+    summary = {'rows': 0, 'inserted': 0, 'rejected': 0, 'duplicates': 0,
+               'elapsed_seconds': 0.0, 'rows_per_second': 0.0, 'chunks': [], 'rejections': []}
+    started = time.perf_counter()
+    records = iter(records)
+    chunk_number = 0
+
+    while True:
+        batch = list(islice(records, chunk_size))
+        if not batch:
+            break
+        chunk_number += 1
+        chunk_started = time.perf_counter()
+
+        rows, keys, rejected, duplicates = [], set(), 0, 0
+        for row_number, raw in batch:
+            try:
+                row = validate_row(raw)
+            except ValueError as e:
+                rejected += 1
+                if len(summary['rejections']) < MAX_REPORTED_REJECTIONS:
+                    summary['rejections'].append({'row': row_number, 'error': str(e)})
+                continue
+            key = _dedup_key(row)
+            if key in keys:
+                duplicates += 1
+                continue
+            keys.add(key)
+            rows.append(row)
+
+        if rows:
+            dimensions.assign_keys(db.session.connection(), rows)
+            existing = _existing_keys(rows)
+            if existing:
+                duplicates += sum(1 for row in rows if _dedup_key(row) in existing)
+                rows = [row for row in rows if _dedup_key(row) not in existing]
+
+        if rows:
+            cleanliness.assign_codes(rows)
+            try:
+                connection = db.session.connection()
+                connection.execute(insert(Data.__table__), rows)
+                rollup.apply_rows(connection, rows)
+                cache.bump_shared_version(db.session)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            cache.bump_data_version()
+            routing.note_data_write()
+            rows_inserted.send(None, rows=rows)
+
+        elapsed = time.perf_counter() - chunk_started
+        report = {
+            'chunk': chunk_number,
+            'rows': len(batch),
+            'inserted': len(rows),
+            'rejected': rejected,
+            'duplicates': duplicates,
+            'elapsed_seconds': round(elapsed, 4),
+            'rows_per_second': round(len(batch) / elapsed, 1) if elapsed else 0.0,
+        }
+        summary['chunks'].append(report)
+        for field in ('rows', 'inserted', 'rejected', 'duplicates'):
+            summary[field] += report[field]
+        if on_chunk:
+            on_chunk(report)
+
+    elapsed = time.perf_counter() - started
+    summary['elapsed_seconds'] = round(elapsed, 4)
+    summary['rows_per_second'] = round(summary['rows'] / elapsed, 1) if elapsed else 0.0
+    return summary
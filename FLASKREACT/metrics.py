@@ -0,0 +1,224 @@
+import bisect
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.sql.util import find_tables
+from serialization import FastJSONProvider
+
+# Per-endpoint request instrumentation exported in Prometheus text format.
+# DB figures come from SQLAlchemy cursor events, serialisation time from the
+# JSON provider, so endpoints need no changes to be measured. Rows fetched are
+# counted as results read them from the DBAPI cursor (cursor.rowcount is not
+# set for SELECTs by every driver).
+
+TIME_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+COUNT_BUCKETS = [0, 1, 2, 5, 10, 25, 50, 100, 1000, 10000, 100000, 1000000]
+SIZE_BUCKETS = [256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216]
+
+# Statements kept per request for the slow-request log, with their bound
+# parameters (the first set of an executemany). Parameters of statements on
+# SENSITIVE_TABLES (emails, password hashes) are left out, as are the string
+# parameters of plain SQL text, whose tables cannot be told.
+MAX_LOGGED_STATEMENTS = 50
+SENSITIVE_TABLES = {'user'}
+REDACTED = '<redacted>'
+MAX_LOGGED_VALUE_LENGTH = 100
+
+
+class Histogram:
+    """Cumulative-bucket histogram with an `endpoint` label."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, value):
+        with self._lock:
+            counts, total = self._series.get(endpoint, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._series[endpoint] = (counts, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for endpoint, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ['+Inf'], counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{endpoint="{endpoint}"}} {total}')
+            lines.append(f'{self.name}_count{{endpoint="{endpoint}"}} {cumulative}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Time spent in the view, per endpoint.', TIME_BUCKETS)
+DB_QUERIES = Histogram('db_queries_per_request', 'SQL statements executed per request.', COUNT_BUCKETS)
+DB_SECONDS = Histogram('db_time_seconds', 'Total time spent in SQL statements per request.', TIME_BUCKETS)
+DB_ROWS = Histogram('db_rows_fetched', 'Rows fetched from result sets per request.', COUNT_BUCKETS)
+SERIALISATION_SECONDS = Histogram('serialisation_seconds', 'Time spent encoding JSON per request.', TIME_BUCKETS)
+RESPONSE_BYTES = Histogram('response_size_bytes', 'Response body size per request.', SIZE_BUCKETS)
+
+HISTOGRAMS = [REQUEST_SECONDS, DB_QUERIES, DB_SECONDS, DB_ROWS, SERIALISATION_SECONDS, RESPONSE_BYTES]
+
+
+def _request_stats():
+    if has_request_context():
+        return g.get('metrics')
+    return None
+
+
+class _CountingCursor:
+    """DBAPI cursor proxy adding the rows read through it to a request's stats."""
+
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats['rows'] += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._stats['rows'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats['rows'] += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _loggable_value(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f'<{len(value)} bytes>'
+    if isinstance(value, str) and len(value) > MAX_LOGGED_VALUE_LENGTH:
+        return value[:MAX_LOGGED_VALUE_LENGTH] + '...'
+    return value
+
+
+def _loggable_parameters(context, parameters, executemany):
+    """A statement's parameters for the slow-request log, without user data."""
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    compiled = context.compiled if context is not None else None
+    textual = compiled is None or isinstance(compiled.statement, TextClause)
+    if not textual:
+        tables = {table.name for table in find_tables(compiled.statement, include_crud=True)}
+        if tables & SENSITIVE_TABLES:
+            return REDACTED
+
+    def loggable(value):
+        return REDACTED if textual and isinstance(value, str) else _loggable_value(value)
+
+    if isinstance(parameters, dict):
+        return {name: loggable(value) for name, value in parameters.items()}
+    return tuple(loggable(value) for value in parameters or ())
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = _request_stats()
+    if stats is None:
+        return
+    stats['queries'] += 1
+    stats['db_seconds'] += elapsed
+    if context is not None and cursor.description is not None:
+        # The result is built on context.cursor right after this event
+        context.cursor = _CountingCursor(cursor, stats)
+    if stats['statements'] is not None and len(stats['statements']) < MAX_LOGGED_STATEMENTS:
+        stats['statements'].append((
+            elapsed, statement, len(parameters) if executemany else 1,
+            _loggable_parameters(context, parameters, executemany)
+        ))
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """JSON provider that adds its encode time to the current request's stats."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            stats = _request_stats()
+            if stats is not None:
+                stats['serialisation_seconds'] += time.perf_counter() - started
+
+
+def init_app(app):
+    """Install the request hooks and timed JSON provider on app.
+
+    SLOW_REQUEST_SECONDS (None to disable) logs requests slower than the
+    threshold together with their SQL statements and bound parameters, except
+    those carrying user data (see SENSITIVE_TABLES).
+    """
+    app.config.setdefault('SLOW_REQUEST_SECONDS', 1.0)
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics = {
+            'started': time.perf_counter(),
+            'queries': 0,
+            'db_seconds': 0.0,
+            'rows': 0,
+            'serialisation_seconds': 0.0,
+            'statements': [] if app.config['SLOW_REQUEST_SECONDS'] is not None else None,
+        }
+
+    @app.after_request
+    def _record_request_metrics(response):
+        stats = g.pop('metrics', None)
+        if stats is None or request.endpoint == 'analytics.get_metrics':
+            return response
+
+        # View name without the blueprint prefix, so series keep their labels across the blueprint split
+        endpoint = request.endpoint.rsplit('.', 1)[-1] if request.endpoint else 'unknown'
+        elapsed = time.perf_counter() - stats['started']
+        REQUEST_SECONDS.observe(endpoint, elapsed)
+        DB_QUERIES.observe(endpoint, stats['queries'])
+        DB_SECONDS.observe(endpoint, stats['db_seconds'])
+        DB_ROWS.observe(endpoint, stats['rows'])
+        SERIALISATION_SECONDS.observe(endpoint, stats['serialisation_seconds'])
+        if not response.is_streamed:
+            RESPONSE_BYTES.observe(endpoint, response.calculate_content_length() or 0)
+
+        threshold = app.config['SLOW_REQUEST_SECONDS']
+        if threshold is not None and elapsed >= threshold:
+            statements = '\n'.join(
+                f'  [{duration * 1000:.1f} ms] {statement} -- parameters: {parameters!r}'
+                + (f' (first of x{rows})' if rows != 1 else '')
+                for duration, statement, rows, parameters in stats['statements']
+            )
+            app.logger.warning(
+                'Slow request %s %s took %.3fs (%d queries, %.3fs in DB)\n%s',
+                request.method, request.full_path, elapsed, stats['queries'], stats['db_seconds'], statements
+            )
+        return response
+
+
+def render():
+    """All histograms in Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
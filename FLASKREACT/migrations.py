@@ -0,0 +1,182 @@
+from datetime import datetime
+from sqlalchemy import func, inspect, select, text
+from models import db, Data, DataDailyRollup, DataVersion, SchemaMigration, Ship, SamplePoint
+import cleanliness
+import dimensions
+import partitions
+import rollup
+
+# db.create_all() only creates missing tables; changes to existing tables
+# (new indexes, columns, backfills) are applied here, in order, by `flask upgrade-db`.
+#
+# The daily rollup is derived from Data. Migrations that change its columns
+# only change the schema; the last of them (widen_rollup_sums) rebuilds it, so
+# an upgrade rebuilds it once however many of them it applies.
+
+
+def _existing_columns(table):
+    return {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+
+
+def _create_indexes(model):
+    # Indexes on columns a later migration adds are created by that migration
+    columns = _existing_columns(model.__table__)
+    for index in model.__table__.indexes:
+        if all(column.name in columns for column in index.columns):
+            index.create(db.engine, checkfirst=True)
+
+
+def _drop_index(table, name):
+    if name not in {index['name'] for index in inspect(db.engine).get_indexes(table.name)}:
+        return
+    on_table = f' ON {table.name}' if db.engine.dialect.name == 'mysql' else ''
+    with db.engine.begin() as connection:
+        connection.execute(text(f'DROP INDEX {name}{on_table}'))
+
+
+def _add_column(table, name):
+    """ALTER TABLE ... ADD COLUMN for a table column missing from the database."""
+    if name in _existing_columns(table):
+        return
+    column = table.c[name]
+    ddl = f'ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(db.engine.dialect)}'
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite cannot add constraints later, only inline with the column
+        for foreign_key in column.foreign_keys:
+            ddl += f' REFERENCES {foreign_key.column.table.name}({foreign_key.column.name})'
+    with db.engine.begin() as connection:
+        connection.execute(text(ddl))
+
+
+def _modify_column(table, name):
+    """MySQL: ALTER TABLE ... MODIFY a column to its declared type. SQLite column types are not enforced."""
+    if db.engine.dialect.name != 'mysql':
+        return
+    column = table.c[name]
+    ddl = f'ALTER TABLE {table.name} MODIFY {name} {column.type.compile(db.engine.dialect)}'
+    if not column.nullable:
+        ddl += ' NOT NULL'
+    if column.default is not None:
+        ddl += f' DEFAULT {column.default.arg!r}'
+    with db.engine.begin() as connection:
+        connection.execute(text(ddl))
+
+
+def _add_foreign_keys(model, name):
+    if db.engine.dialect.name == 'sqlite':
+        return
+    table = model.__table__
+    existing = {tuple(fk['constrained_columns']) for fk in inspect(db.engine).get_foreign_keys(table.name)}
+    if (name,) in existing:
+        return
+    with db.engine.begin() as connection:
+        for foreign_key in table.c[name].foreign_keys:
+            connection.execute(text(
+                f'ALTER TABLE {table.name} ADD CONSTRAINT fk_{table.name}_{name} FOREIGN KEY ({name}) '
+                f'REFERENCES {foreign_key.column.table.name}({foreign_key.column.name})'
+            ))
+
+
+def create_data_indexes():
+    """Composite indexes on Data and DataDailyRollup for the analytics query paths."""
+    _create_indexes(Data)
+    _create_indexes(DataDailyRollup)
+
+
+def create_dimension_tables():
+    """Ship / SamplePoint dimension tables and integer keys on Data, backfilled from the names.
+
+    The string-keyed Data index is replaced by one on the integer keys, and the
+    rollup is recreated on the integer keys (widen_rollup_sums refills it).
+    """
+    Ship.__table__.create(db.engine, checkfirst=True)
+    SamplePoint.__table__.create(db.engine, checkfirst=True)
+    for name in ('ship_id', 'sample_point_id'):
+        _add_column(Data.__table__, name)
+    dimensions.backfill()
+
+    _drop_index(Data.__table__, 'ix_data_ship_samp_point_testdate')
+    _drop_index(Data.__table__, 'ix_data_samp_type_testdate_ship')
+    _create_indexes(Data)
+    for name in ('ship_id', 'sample_point_id'):
+        _add_foreign_keys(Data, name)
+
+    if 'ship_id' not in _existing_columns(DataDailyRollup.__table__):
+        DataDailyRollup.__table__.drop(db.engine)
+        DataDailyRollup.__table__.create(db.engine)
+
+
+def partition_by_year():
+    """MySQL: RANGE partition Data and the rollup on YEAR(testdate). Other databases keep one hot table."""
+    if db.engine.dialect.name != 'mysql':
+        return
+    partitions.partition_table(Data.__table__)
+    # The rollup may still be empty here (widen_rollup_sums rebuilds it), so split it from Data's first year
+    first = db.session.execute(select(func.min(Data.testdate))).scalar()
+    partitions.partition_table(DataDailyRollup.__table__, first.year if first else None)
+
+
+def add_cleanliness_codes():
+    """ISO 4406 scale number columns on Data and the archived years, backfilled in chunks, plus their index."""
+    tables = [Data.__table__] + [partitions.cold_table(year) for year in partitions.archived_years()]
+    for table in tables:
+        for _, code_column in cleanliness.CODE_COLUMNS:
+            _add_column(table, code_column)
+        cleanliness.backfill(table)
+    _create_indexes(Data)
+
+
+def add_rollup_sketches():
+    """Quantile sketch columns on the daily rollup (filled by widen_rollup_sums)."""
+    for name in rollup.SKETCH_NAMES:
+        _add_column(DataDailyRollup.__table__, name)
+
+
+def widen_rollup_sums():
+    """Double precision particle sums on the daily rollup, then the one rebuild of it from Data.
+
+    The rebuild also fills the rollup recreated by create_dimension_tables and
+    the sketches added by add_rollup_sketches.
+    """
+    for name in ('sum_4_micron', 'sum_6_micron', 'sum_14_micron'):
+        _modify_column(DataDailyRollup.__table__, name)
+    rollup.rebuild()
+
+
+def create_data_version():
+    """The data_version counter other processes poll to notice writes to Data (see cache.py)."""
+    DataVersion.__table__.create(db.engine, checkfirst=True)
+
+
+def create_keyset_index():
+    """The (testdate, id) index on Data that keyset chunks and pages seek on."""
+    _create_indexes(Data)
+
+
+MIGRATIONS = [
+    ('0001_data_indexes', create_data_indexes),
+    ('0002_dimension_tables', create_dimension_tables),
+    ('0003_partition_by_year', partition_by_year),
+    ('0004_cleanliness_codes', add_cleanliness_codes),
+    ('0005_rollup_sketches', add_rollup_sketches),
+    ('0006_rollup_double_sums', widen_rollup_sums),
+    ('0007_data_version', create_data_version),
+    ('0008_keyset_index', create_keyset_index),
+]
+
+
+def upgrade():
+    """Apply every migration not yet recorded in schema_migration; return their versions."""
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    applied = {row.version for row in SchemaMigration.query.all()}
+
+    newly_applied = []
+    for version, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        migration()
+        db.session.add(SchemaMigration(version=version, applied_at=datetime.utcnow()))
+        db.session.commit()
+        newly_applied.append(version)
+
+    return newly_applied
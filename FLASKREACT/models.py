@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func
+from routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})  # reads of analytics GETs may go to a replica
 
 # User Model for Authentication
 class User(db.Model):
@@ -8,6 +10,18 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
 
+# Dimension tables: one row per distinct ship / sample point name, referenced
+# from Data and the rollup by integer key (see dimensions.py)
+class Ship(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), unique=True, nullable=False)
+
+
+class SamplePoint(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+
+
 # Data Model for Storing Ship and Sample Data
 class Data(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -18,6 +32,24 @@ class Data(db.Model):
     VLIMS_PARTICLE_COUNT_4_MICRON_SCALE = db.Column(db.Float, nullable=True)
     VLIMS_PARTICLE_COUNT_6_MICRON_SCALE = db.Column(db.Float, nullable=True)
     VLIMS_PARTICLE_COUNT_14_MICRON_SCALE = db.Column(db.Float, nullable=True)
+    # Integer keys for Ship / vlims_lo_samp_point_Desc, set on insert by dimensions.py
+    ship_id = db.Column(db.Integer, db.ForeignKey('ship.id'), nullable=True)
+    sample_point_id = db.Column(db.Integer, db.ForeignKey('sample_point.id'), nullable=True)
+    # ISO 4406 scale numbers of the three particle counts, set on insert by cleanliness.py
+    iso_4406_4_micron = db.Column(db.SmallInteger, nullable=True)
+    iso_4406_6_micron = db.Column(db.SmallInteger, nullable=True)
+    iso_4406_14_micron = db.Column(db.SmallInteger, nullable=True)
+
+    # Composite indexes matching the query paths in app.py
+    __table_args__ = (
+        db.Index('ix_data_ship_id_sample_point_id_testdate', 'ship_id', 'sample_point_id', 'testdate'),
+        db.Index('ix_data_samp_type_testdate_ship_id', 'Samp_Type', 'testdate', 'ship_id'),
+        # Covers the date-range GROUP BY behind /api/cleanliness-distribution
+        db.Index('ix_data_testdate_iso_4406', 'testdate', 'ship_id', 'sample_point_id',
+                 'iso_4406_4_micron', 'iso_4406_6_micron', 'iso_4406_14_micron'),
+        # Keyset chunks and pages (streaming.after) resume from a (testdate, id) position
+        db.Index('ix_data_testdate_id', 'testdate', 'id'),
+    )
 
     def to_dict(self):
         return {
@@ -43,4 +75,59 @@ class Data(db.Model):
             Data.testdate >= start_date,
             Data.testdate <= end_date,
             Data.vlims_lo_samp_point_Desc.in_(['BEFORE FILTER', 'AFTER FILTER'])
-        ).group_by(Data.Ship, Data.vlims_lo_samp_point_Desc).all()
\ No newline at end of file
+        ).group_by(Data.Ship, Data.vlims_lo_samp_point_Desc).all()
+
+
+# Pre-aggregated daily rollup of Data, one row per (ship, Samp_Type, sample point, day).
+# Kept in step with Data by rollup.py so the count/average endpoints never scan raw rows.
+class DataDailyRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ship_id = db.Column(db.Integer, db.ForeignKey('ship.id'), nullable=False)
+    Samp_Type = db.Column(db.String(50), nullable=False)
+    sample_point_id = db.Column(db.Integer, db.ForeignKey('sample_point.id'), nullable=True)
+    testdate = db.Column(db.Date, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    # Double precision: MySQL FLOAT is single precision, too coarse for sums over years of samples
+    sum_4_micron = db.Column(db.Double, nullable=False, default=0.0)
+    count_4_micron = db.Column(db.Integer, nullable=False, default=0)
+    sum_6_micron = db.Column(db.Double, nullable=False, default=0.0)
+    count_6_micron = db.Column(db.Integer, nullable=False, default=0)
+    sum_14_micron = db.Column(db.Double, nullable=False, default=0.0)
+    count_14_micron = db.Column(db.Integer, nullable=False, default=0)
+    # Serialised quantile sketches of the day's particle counts (see sketches.py)
+    sketch_4_micron = db.Column(db.LargeBinary, nullable=True)
+    sketch_6_micron = db.Column(db.LargeBinary, nullable=True)
+    sketch_14_micron = db.Column(db.LargeBinary, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('ship_id', 'Samp_Type', 'sample_point_id', 'testdate',
+                            name='uq_data_daily_rollup_key'),
+        db.Index('ix_data_daily_rollup_samp_type_testdate', 'Samp_Type', 'testdate'),
+        db.Index('ix_data_daily_rollup_sample_point_id_testdate', 'sample_point_id', 'testdate'),
+    )
+
+
+# Schema migrations that have been applied to this database (see migrations.py)
+class SchemaMigration(db.Model):
+    version = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.DateTime, nullable=False)
+
+
+# Single row counting committed transactions that wrote Data, bumped inside each
+# of them, so other processes can tell that Data changed (see cache.py)
+class DataVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+@event.listens_for(DataVersion.__table__, 'after_create')
+def _insert_data_version_row(target, connection, **kw):
+    connection.execute(target.insert().values(id=1, version=0))
+
+
+# Years of Data moved out of the hot table into per-year cold tables (see partitions.py)
+class DataArchive(db.Model):
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    table_name = db.Column(db.String(64), nullable=False)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,177 @@
+from datetime import date, datetime
+from sqlalchemy import (MetaData, Table, Column, Index, select, insert, delete, func, and_, union_all,
+                        text, inspect)
+from sqlalchemy.orm import aliased
+from models import db, Data, DataArchive
+
+# Year-based storage for Data.
+#
+# Hot: the `data` table. On MySQL it (and the daily rollup) is RANGE partitioned
+# on YEAR(testdate), so date predicates prune to the overlapping partitions.
+# Cold: closed years moved by `flask archive-data` into one compact table per
+# year (data_y2019, ...): no foreign keys, one index, ROW_FORMAT=COMPRESSED on
+# MySQL. data_source() routes a year range to the hot table plus only the cold
+# tables it overlaps; the `data_all` view unions everything for ad-hoc queries.
+#
+# Rows written for an archived year after archiving land in the hot table,
+# which is why it is always part of the route.
+
+COLD_TABLE_PREFIX = 'data_y'
+UNION_VIEW = 'data_all'
+
+_cold_metadata = MetaData()
+
+
+def cold_table(year):
+    """Table object for one archived year, with Data's columns."""
+    name = f'{COLD_TABLE_PREFIX}{year}'
+    if name in _cold_metadata.tables:
+        return _cold_metadata.tables[name]
+    return Table(
+        name, _cold_metadata,
+        *[Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                 autoincrement=False)
+          for column in Data.__table__.columns],
+        Index(f'ix_{name}_ship_id_sample_point_id_testdate', 'ship_id', 'sample_point_id', 'testdate'),
+        mysql_row_format='COMPRESSED',
+    )
+
+
+def archived_years():
+    return [year for (year,) in db.session.execute(select(DataArchive.year).order_by(DataArchive.year))]
+
+
+def data_source(first_year=None, last_year=None):
+    """Data, or an alias of it over the hot table and the cold years in [first_year, last_year].
+
+    Use the result wherever Data would be used in a query (columns, filters,
+    select_from). Without archived years in range this is Data itself.
+    """
+    years = [
+        year for year in archived_years()
+        if (first_year is None or year >= first_year) and (last_year is None or year <= last_year)
+    ]
+    if not years:
+        return Data
+
+    names = [column.name for column in Data.__table__.columns]
+    tables = [Data.__table__] + [cold_table(year) for year in years]
+    union = union_all(*[select(*[table.c[name] for name in names]) for table in tables])
+    return aliased(Data, union.subquery('data_partitions'))
+
+
+def _refresh_union_view():
+    names = ', '.join(column.name for column in Data.__table__.columns)
+    parts = [f'SELECT {names} FROM {Data.__table__.name}']
+    parts += [f'SELECT {names} FROM {cold_table(year).name}' for year in archived_years()]
+    with db.engine.begin() as connection:
+        connection.execute(text(f'DROP VIEW IF EXISTS {UNION_VIEW}'))
+        connection.execute(text(f'CREATE VIEW {UNION_VIEW} AS ' + ' UNION ALL '.join(parts)))
+
+
+def archive_year(year):
+    """Move Data rows of `year` from the hot table into its cold table; return rows moved.
+
+    Copy, delete and the DataArchive record commit together, so readers see the
+    rows in exactly one place. The rollup is left alone: it still covers every year.
+    """
+    cold = cold_table(year)
+    cold.create(db.engine, checkfirst=True)
+
+    hot = Data.__table__
+    in_year = and_(hot.c.testdate >= date(year, 1, 1), hot.c.testdate < date(year + 1, 1, 1))
+    names = [column.name for column in hot.columns]
+    try:
+        moved = db.session.execute(
+            insert(cold).from_select(names, select(*[hot.c[name] for name in names]).where(in_year))
+        ).rowcount
+        db.session.execute(delete(hot).where(in_year))
+
+        archive = db.session.get(DataArchive, year)
+        if archive is None:
+            archive = DataArchive(year=year, table_name=cold.name, rows=0)
+            db.session.add(archive)
+        archive.rows += moved
+        archive.archived_at = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    _refresh_union_view()
+    return moved
+
+
+def archive_before(before_year):
+    """Archive every year older than before_year still in the hot table; return {year: rows}."""
+    first = db.session.execute(select(func.min(Data.testdate))).scalar()
+    if first is None:
+        return {}
+
+    moved = {}
+    for year in range(first.year, before_year):
+        in_year = and_(Data.testdate >= date(year, 1, 1), Data.testdate < date(year + 1, 1, 1))
+        has_rows = db.session.execute(select(Data.id).where(in_year).limit(1)).first()
+        if has_rows:
+            moved[year] = archive_year(year)
+    return moved
+
+
+# MySQL native partitioning
+
+def _is_partitioned(connection, table):
+    return bool(connection.execute(text(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL"
+    ), {'table': table.name}).scalar())
+
+
+def _year_partitions(years):
+    return ', '.join(f'PARTITION p{year} VALUES LESS THAN ({year + 1})' for year in years)
+
+
+def partition_table(table, first_year=None):
+    """RANGE partition a MySQL table with `id` and `testdate` columns by YEAR(testdate).
+
+    Every unique key must include the partition column, so the primary key
+    becomes (id, testdate); InnoDB has no foreign keys on partitioned tables,
+    so those are dropped. Years run from first_year (default: the oldest row)
+    to next year, and a pmax partition catches anything later until
+    add_year_partitions splits it.
+    """
+    with db.engine.begin() as connection:
+        if _is_partitioned(connection, table):
+            return
+        for foreign_key in inspect(connection).get_foreign_keys(table.name):
+            connection.execute(text(f"ALTER TABLE {table.name} DROP FOREIGN KEY {foreign_key['name']}"))
+
+        if first_year is None:
+            first = connection.execute(select(func.min(table.c.testdate))).scalar() or date.today()
+            first_year = first.year
+        years = range(first_year, date.today().year + 2)
+        connection.execute(text(
+            f'ALTER TABLE {table.name} DROP PRIMARY KEY, ADD PRIMARY KEY (id, testdate) '
+            f'PARTITION BY RANGE (YEAR(testdate)) '
+            f'({_year_partitions(years)}, PARTITION pmax VALUES LESS THAN MAXVALUE)'
+        ))
+
+
+def add_year_partitions(table, through_year):
+    """Split pmax so each year up to through_year has its own partition (MySQL only)."""
+    if db.engine.dialect.name != 'mysql':
+        return []
+    with db.engine.begin() as connection:
+        if not _is_partitioned(connection, table):
+            return []
+        existing = {name for (name,) in connection.execute(text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ), {'table': table.name})}
+        last = max(int(name[1:]) for name in existing if name != 'pmax')
+        years = list(range(last + 1, through_year + 1))
+        if years:
+            connection.execute(text(
+                f'ALTER TABLE {table.name} REORGANIZE PARTITION pmax INTO '
+                f'({_year_partitions(years)}, PARTITION pmax VALUES LESS THAN MAXVALUE)'
+            ))
+    return years
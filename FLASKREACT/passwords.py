@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """The hashing pool is saturated or too slow; the client should retry later."""
+
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(pw_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded process pool so a login burst cannot hold every request thread.
+
+    At most `workers + queue_size` hashes are in flight (and so at most that many
+    request threads wait on one); beyond that, and when a hash takes longer than
+    `timeout` seconds, HasherBusy is raised so the view can answer 503.
+    workers=0 hashes inline on the request thread.
+    """
+
+    def __init__(self, rounds=12, workers=2, queue_size=2, timeout=5.0):
+        self._executor = None
+        self._lock = threading.Lock()
+        self.configure(rounds, workers, queue_size, timeout)
+
+    def configure(self, rounds=12, workers=2, queue_size=2, timeout=5.0):
+        self.shutdown()
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size) if workers else None
+
+    def init_app(self, app):
+        """Configure from BCRYPT_LOG_ROUNDS and PASSWORD_HASH_*; the pool still starts on first use."""
+        self.configure(
+            rounds=app.config['BCRYPT_LOG_ROUNDS'],
+            workers=app.config['PASSWORD_HASH_WORKERS'],
+            queue_size=app.config['PASSWORD_HASH_QUEUE_SIZE'],
+            timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+        )
+
+    def _pool(self):
+        # Created on first use so each forked server worker gets its own pool
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Password hashing is saturated")
+        try:
+            future = self._pool().submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the hash really finishes, even if this request gives up
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy("Password hashing timed out")
+
+    def generate_password_hash(self, password):
+        return self._run(_hash_password, password, self.rounds)
+
+    def check_password_hash(self, pw_hash, password):
+        return self._run(_check_password, pw_hash, password)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
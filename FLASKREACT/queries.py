@@ -0,0 +1,220 @@
+from sqlalchemy import select, func, case, and_
+from models import DataDailyRollup, Ship, SamplePoint
+import aggregate
+import rollup
+from timebucket import date_bucket
+
+# What the count/average endpoints ask for. They are aliases of /api/aggregate:
+# counts and averages are aggregate.Spec objects, which aggregate.parse_args()
+# completes with the request's dates. The WSGI views run them with
+# aggregate.run() (SQL or the columnar engine) and the ASGI mode executes
+# aggregate.statement(), so both run exactly the same SQL and format the rows
+# with the format_* functions below. Percentiles come from the *_sketches
+# statements: ungrouped daily rows whose sketches the view merges per group,
+# under the labels the specs use (Ship, vlims_lo_samp_point_Desc).
+
+HCU_SAMPLE_POINTS = [f'HCU#{i}' for i in range(1, 10)]
+
+AVERAGE_FIELDS = [
+    'Average_Particle_Count_4_Micron', 'Average_Particle_Count_6_Micron', 'Average_Particle_Count_14_Micron'
+]
+
+AVERAGE_METRICS = ['avg_4_micron', 'avg_6_micron', 'avg_14_micron']
+
+FILTER_POINTS = ['BEFORE FILTER', 'AFTER FILTER']
+PARTICLE_SIZES = ['4_micron', '6_micron', '14_micron']
+
+
+def _date_range(start_date, end_date):
+    filters = []
+    if start_date:
+        filters.append(DataDailyRollup.testdate >= start_date)
+    if end_date:
+        filters.append(DataDailyRollup.testdate <= end_date)
+    return filters
+
+
+def _ship_name():
+    return Ship.name.label('Ship')
+
+
+def _sample_point_name():
+    return SamplePoint.name.label('vlims_lo_samp_point_Desc')
+
+
+def sample_type_counts(start_date=None, end_date=None):
+    """Samples per Samp_Type in an optional date range."""
+    return aggregate.spec(['Samp_Type'], ['count'], start_date, end_date)
+
+
+def ship_counts(samp_type, start_date=None, end_date=None):
+    """Samples of one Samp_Type per ship in an optional date range."""
+    return aggregate.spec(['Ship'], ['count'], start_date, end_date, Samp_Type=samp_type)
+
+
+def _hcu_points(columns, start_date, end_date, ship_name=None):
+    query = select(
+        _sample_point_name(), *columns
+    ).select_from(DataDailyRollup).join(
+        SamplePoint, DataDailyRollup.sample_point_id == SamplePoint.id
+    ).where(
+        SamplePoint.name.in_(HCU_SAMPLE_POINTS),
+        *_date_range(start_date, end_date)
+    )
+    if ship_name:
+        query = query.join(Ship, DataDailyRollup.ship_id == Ship.id).where(Ship.name == ship_name)
+    return query
+
+
+def _ships(columns, sample_point, start_date, end_date):
+    return select(
+        _ship_name(), *columns
+    ).select_from(DataDailyRollup).join(Ship, DataDailyRollup.ship_id == Ship.id).join(
+        SamplePoint, DataDailyRollup.sample_point_id == SamplePoint.id
+    ).where(
+        SamplePoint.name == sample_point,
+        *_date_range(start_date, end_date)
+    )
+
+
+def hcu_point_averages(start_date=None, end_date=None, ship_name=None):
+    """Average particle counts per HCU sample point, fleet-wide or for one ship."""
+    ship_filter = {'Ship': ship_name} if ship_name else {}
+    return aggregate.spec(
+        ['vlims_lo_samp_point_Desc'], AVERAGE_METRICS, start_date, end_date,
+        vlims_lo_samp_point_Desc=HCU_SAMPLE_POINTS, **ship_filter
+    )
+
+
+def hcu_point_sketches(start_date, end_date, ship_name=None):
+    """The daily sketch rows behind hcu_point_averages, to merge per sample point."""
+    return _hcu_points(rollup.sketch_columns(), start_date, end_date, ship_name)
+
+
+def ship_averages(sample_point, start_date=None, end_date=None):
+    """Average particle counts per ship for one sample point (e.g. 'BEFORE FILTER')."""
+    return aggregate.spec(
+        ['Ship'], AVERAGE_METRICS, start_date, end_date, vlims_lo_samp_point_Desc=sample_point
+    )
+
+
+def ship_sketches(sample_point, start_date, end_date):
+    """The daily sketch rows behind ship_averages, to merge per ship."""
+    return _ships(rollup.sketch_columns(), sample_point, start_date, end_date)
+
+
+def filter_efficiency(start_date, end_date, bucket, ship_name=None, paired=False):
+    """BEFORE / AFTER FILTER averages per ship and day/week/month bucket, in one pass over the rollup.
+
+    An inner GROUP BY folds each ship-day into before/after sums and non-null
+    counts with conditional aggregation; the outer one adds those up per bucket.
+    With `paired`, only ship-days sampled on both sides count, and each particle
+    size only where both sides have a reading, so both averages cover the same dates.
+    Columns: Ship, bucket_start, before/after_samples, before/after_avg_<size>.
+    """
+    table = DataDailyRollup
+    daily_columns = []
+    for side, sample_point in zip(('before', 'after'), FILTER_POINTS):
+        is_side = SamplePoint.name == sample_point
+        daily_columns.append(func.sum(case((is_side, table.sample_count), else_=0)).label(f'{side}_samples'))
+        for size in PARTICLE_SIZES:
+            daily_columns += [
+                func.sum(case((is_side, getattr(table, f'sum_{size}')), else_=0)).label(f'{side}_sum_{size}'),
+                func.sum(case((is_side, getattr(table, f'count_{size}')), else_=0)).label(f'{side}_count_{size}'),
+            ]
+    daily = select(table.ship_id, table.testdate, *daily_columns).select_from(table).join(
+        SamplePoint, table.sample_point_id == SamplePoint.id
+    ).where(
+        SamplePoint.name.in_(FILTER_POINTS), *_date_range(start_date, end_date)
+    ).group_by(table.ship_id, table.testdate)
+    if ship_name:
+        daily = daily.join(Ship, table.ship_id == Ship.id).where(Ship.name == ship_name)
+    daily = daily.subquery('filter_days')
+
+    def kept(value, condition):
+        return func.sum(value if condition is None else case((condition, value), else_=0))
+
+    columns = [func.sum(daily.c[f'{side}_samples']).label(f'{side}_samples') for side in ('before', 'after')]
+    for size in PARTICLE_SIZES:
+        both_read = and_(daily.c[f'before_count_{size}'] > 0, daily.c[f'after_count_{size}'] > 0) if paired else None
+        for side in ('before', 'after'):
+            columns.append((kept(daily.c[f'{side}_sum_{size}'], both_read) /
+                            func.nullif(kept(daily.c[f'{side}_count_{size}'], both_read), 0)).label(f'{side}_avg_{size}'))
+
+    bucket_start = date_bucket(bucket, daily.c.testdate).label('bucket_start')
+    statement = select(_ship_name(), bucket_start, *columns).select_from(daily).join(
+        Ship, daily.c.ship_id == Ship.id
+    )
+    if paired:
+        statement = statement.where(daily.c.before_samples > 0, daily.c.after_samples > 0)
+    return statement.group_by(Ship.id, bucket_start).order_by(Ship.name, bucket_start)
+
+
+def format_filter_efficiency(row):
+    """Before/after averages and the share removed by the filter (None without a before average)."""
+    item = {
+        'Ship': row.Ship,
+        'Bucket_Start': row.bucket_start.strftime('%Y-%m-%d'),
+        'Before_Samples': int(row.before_samples or 0),
+        'After_Samples': int(row.after_samples or 0),
+    }
+    for size in PARTICLE_SIZES:
+        label = size.replace('micron', 'Micron')
+        before, after = getattr(row, f'before_avg_{size}'), getattr(row, f'after_avg_{size}')
+        item[f'Before_Average_Particle_Count_{label}'] = round(before, 2) if before else 0.0
+        item[f'After_Average_Particle_Count_{label}'] = round(after, 2) if after else 0.0
+        item[f'Reduction_Ratio_{label}'] = round(1 - after / before, 4) if before and after is not None else None
+    return item
+
+
+FILTER_EFFICIENCY_FIELDS = ['Ship', 'Bucket_Start', 'Before_Samples', 'After_Samples'] + [
+    f'{prefix}_{size.replace("micron", "Micron")}'
+    for size in PARTICLE_SIZES
+    for prefix in ('Before_Average_Particle_Count', 'After_Average_Particle_Count', 'Reduction_Ratio')
+]
+
+
+def format_counts(rows):
+    """{group: count} for rows of (group, count)."""
+    return {row[0]: int(row[1]) for row in rows}
+
+
+def format_averages(row):
+    """The Average_Particle_Count_* fields for a row with avg_4/6/14_micron columns."""
+    return {
+        'Average_Particle_Count_4_Micron': round(row.avg_4_micron, 2) if row.avg_4_micron else 0.0,
+        'Average_Particle_Count_6_Micron': round(row.avg_6_micron, 2) if row.avg_6_micron else 0.0,
+        'Average_Particle_Count_14_Micron': round(row.avg_14_micron, 2) if row.avg_14_micron else 0.0
+    }
+
+
+def format_hcu_points(rows):
+    """hcu_point_averages rows as a list of {'Sample_Point', Average_Particle_Count_* ...}."""
+    return [{'Sample_Point': row.vlims_lo_samp_point_Desc, **format_averages(row)} for row in rows]
+
+
+def format_filter_sides(before_filter_rows, after_filter_rows):
+    """ship_averages rows of both filter sides as one list, BEFORE FILTER first."""
+    return [
+        {'Ship': row.Ship, 'vlims_lo_samp_point_Desc': sample_point, **format_averages(row)}
+        for sample_point, rows in zip(FILTER_POINTS, (before_filter_rows, after_filter_rows))
+        for row in rows
+    ]
+
+
+def quantile_fields(stats):
+    """P50_Particle_Count_4_Micron ... field names for parsed `stats` (see sketches.parse_stats)."""
+    return [
+        f'{name.upper()}_Particle_Count_{size}_Micron'
+        for name, _ in stats for size in ('4', '6', '14')
+    ]
+
+
+def format_quantiles(merged, stats):
+    """Quantile fields from a {sketch column: Sketch} group; 0.0 where nothing was counted."""
+    fields = {}
+    for name, q in stats:
+        for size in ('4', '6', '14'):
+            value = merged[f'sketch_{size}_micron'].quantile(q) if merged else None
+            fields[f'{name.upper()}_Particle_Count_{size}_Micron'] = round(value, 2) if value else 0.0
+    return fields
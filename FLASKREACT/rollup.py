@@ -0,0 +1,269 @@
+import math
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import event, func, insert, select, delete, update, and_, inspect, bindparam
+from sqlalchemy.orm import Session
+from models import db, Data, DataDailyRollup
+import partitions
+import sketches
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Particle columns on Data and the rollup columns that hold their sum / non-null count
+PARTICLE_COLUMNS = [
+    ('VLIMS_PARTICLE_COUNT_4_MICRON_SCALE', 'sum_4_micron', 'count_4_micron'),
+    ('VLIMS_PARTICLE_COUNT_6_MICRON_SCALE', 'sum_6_micron', 'count_6_micron'),
+    ('VLIMS_PARTICLE_COUNT_14_MICRON_SCALE', 'sum_14_micron', 'count_14_micron'),
+]
+
+# Particle columns on Data and the rollup columns that hold their quantile sketch
+SKETCH_COLUMNS = [
+    ('VLIMS_PARTICLE_COUNT_4_MICRON_SCALE', 'sketch_4_micron'),
+    ('VLIMS_PARTICLE_COUNT_6_MICRON_SCALE', 'sketch_6_micron'),
+    ('VLIMS_PARTICLE_COUNT_14_MICRON_SCALE', 'sketch_14_micron'),
+]
+SKETCH_NAMES = [sketch_column for _, sketch_column in SKETCH_COLUMNS]
+
+# Data columns (integer dimension keys, see dimensions.py) that identify a rollup row
+KEY_COLUMNS = ['ship_id', 'Samp_Type', 'sample_point_id', 'testdate']
+
+rollup_table = DataDailyRollup.__table__
+
+
+def sketch_columns():
+    """The serialised sketch columns, for merging rollup rows with sketches.merge_rows()."""
+    return [rollup_table.c[name] for name in SKETCH_NAMES]
+
+
+def _day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def row_key(row):
+    """Rollup key for a mapping of Data column values."""
+    return (row['ship_id'], row['Samp_Type'], row['sample_point_id'], _day(row['testdate']))
+
+
+def _empty_delta():
+    # Sketch deltas are bucket count changes, merged into the stored sketch
+    return {'sample_count': 0, 'sum_4_micron': 0.0, 'count_4_micron': 0,
+            'sum_6_micron': 0.0, 'count_6_micron': 0, 'sum_14_micron': 0.0, 'count_14_micron': 0,
+            'sketch_4_micron': Counter(), 'sketch_6_micron': Counter(), 'sketch_14_micron': Counter()}
+
+
+def accumulate(deltas, row, sign=1):
+    """Add (sign=1) or remove (sign=-1) one Data row's contribution to deltas."""
+    delta = deltas.setdefault(row_key(row), _empty_delta())
+    delta['sample_count'] += sign
+    for column, sum_column, count_column in PARTICLE_COLUMNS:
+        value = row[column]
+        if value is not None:
+            delta[sum_column] += sign * value
+            delta[count_column] += sign
+    for column, sketch_column in SKETCH_COLUMNS:
+        value = row[column]
+        if value is not None:
+            delta[sketch_column][sketches.bucket(value)] += sign
+
+
+def _key_filter(key):
+    return and_(*[
+        rollup_table.c[name].is_(None) if value is None else rollup_table.c[name] == value
+        for name, value in zip(KEY_COLUMNS, key)
+    ])
+
+
+def apply_deltas(connection, deltas):
+    """Apply accumulated deltas to the rollup table on the given connection.
+
+    Sums and counts are added in SQL; sketches are merged here, so the row is
+    read back (and locked, where the database supports it) first.
+    """
+    for key, delta in deltas.items():
+        if not any(delta.values()):
+            continue
+
+        sums = {name: value for name, value in delta.items() if name not in SKETCH_NAMES}
+        current = connection.execute(
+            select(rollup_table.c.id, rollup_table.c.sample_count, *sketch_columns())
+            .where(_key_filter(key)).with_for_update()
+        ).first()
+
+        if current is None:
+            values = dict(zip(KEY_COLUMNS, key))
+            values.update(sums)
+            values.update({name: sketches.Sketch().merge(delta[name]).to_bytes() or None for name in SKETCH_NAMES})
+            connection.execute(insert(rollup_table).values(values))
+        elif current.sample_count + sums['sample_count'] <= 0:
+            # Drop groups that no longer have any samples
+            connection.execute(delete(rollup_table).where(rollup_table.c.id == current.id))
+        else:
+            values = {name: rollup_table.c[name] + value for name, value in sums.items()}
+            values.update({
+                name: sketches.Sketch.from_bytes(getattr(current, name)).merge(delta[name]).to_bytes() or None
+                for name in SKETCH_NAMES
+            })
+            connection.execute(update(rollup_table).where(rollup_table.c.id == current.id).values(values))
+
+
+def apply_rows(connection, rows):
+    """Fold newly inserted Data rows (mappings of column values) into the rollup."""
+    deltas = {}
+    for row in rows:
+        accumulate(deltas, row)
+    apply_deltas(connection, deltas)
+
+
+def _current_values(obj):
+    return {name: getattr(obj, name) for name in KEY_COLUMNS + [c[0] for c in PARTICLE_COLUMNS]}
+
+
+def _previous_values(obj):
+    state = inspect(obj)
+    values = {}
+    for name in KEY_COLUMNS + [c[0] for c in PARTICLE_COLUMNS]:
+        history = state.attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        else:
+            values[name] = getattr(obj, name)
+    return values
+
+
+# Setting an expired attribute (e.g. after a commit) does not load the old value
+# unless a listener asks for it; without it _previous_values would see the new one
+for _name in KEY_COLUMNS + [c[0] for c in PARTICLE_COLUMNS]:
+    event.listen(getattr(Data, _name), 'set', lambda target, value, oldvalue, initiator: None, active_history=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_rollup(session, flush_context):
+    """Keep DataDailyRollup in step with ORM inserts, updates and deletes of Data."""
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Data):
+            accumulate(deltas, _current_values(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Data) and session.is_modified(obj, include_collections=False):
+            accumulate(deltas, _previous_values(obj), sign=-1)
+            accumulate(deltas, _current_values(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Data):
+            accumulate(deltas, _previous_values(obj), sign=-1)
+
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def rebuild():
+    """Recompute the whole rollup from Data (hot and archived years).
+
+    Sums and counts come from a single INSERT ... SELECT; the sketches from one
+    streaming pass over the same rows.
+    """
+    data = partitions.data_source()
+    aggregates = [
+        data.ship_id,
+        data.Samp_Type,
+        data.sample_point_id,
+        data.testdate,
+        func.count(data.id),
+    ]
+    columns = KEY_COLUMNS + ['sample_count']
+    for column, sum_column, count_column in PARTICLE_COLUMNS:
+        aggregates.append(func.coalesce(func.sum(getattr(data, column)), 0.0))
+        aggregates.append(func.count(getattr(data, column)))
+        columns.extend([sum_column, count_column])
+
+    query = select(*aggregates).group_by(
+        data.ship_id, data.Samp_Type, data.sample_point_id, data.testdate
+    )
+
+    db.session.execute(delete(rollup_table))
+    db.session.execute(insert(rollup_table).from_select(columns, query))
+    _rebuild_sketches(data)
+    db.session.commit()
+
+    return db.session.query(func.count(DataDailyRollup.id)).scalar()
+
+
+def _rebuild_sketches(data, batch_size=10000):
+    counts = {}
+    rows = db.session.execute(
+        select(*[getattr(data, name) for name in KEY_COLUMNS], *[getattr(data, c) for c, _ in SKETCH_COLUMNS]),
+        execution_options={'yield_per': batch_size}
+    ).mappings()
+    for row in rows:
+        buckets = counts.setdefault(row_key(row), {name: Counter() for name in SKETCH_NAMES})
+        for column, sketch_column in SKETCH_COLUMNS:
+            if row[column] is not None:
+                buckets[sketch_column][sketches.bucket(row[column])] += 1
+
+    ids = {
+        row_key(row): row['id']
+        for row in db.session.execute(select(rollup_table.c.id, *[rollup_table.c[n] for n in KEY_COLUMNS])).mappings()
+    }
+    statement = update(rollup_table).where(rollup_table.c.id == bindparam('row_id')).values(
+        {name: bindparam(f'new_{name}') for name in SKETCH_NAMES}
+    )
+    updates = [
+        {'row_id': ids[key], **{f'new_{name}': sketches.Sketch(buckets[name]).to_bytes() or None
+                               for name in SKETCH_NAMES}}
+        for key, buckets in counts.items()
+    ]
+    for start in range(0, len(updates), batch_size):
+        db.session.execute(statement, updates[start:start + batch_size])
+
+
+def _exact_percentile(values, q):
+    # The sample at rank floor(q * (n - 1)), which is what the sketch error bound is stated against
+    if np is not None:
+        return float(np.percentile(np.asarray(values, dtype=np.float64), q * 100, method='lower'))
+    return sorted(values)[math.floor(q * (len(values) - 1))]
+
+
+def check_sketches(quantiles=(0.5, 0.9, 0.99)):
+    """Compare merged rollup sketches per ship and sample point with exact percentiles over Data.
+
+    Returns (mismatches, largest relative error seen); a mismatch is a group whose
+    sample count differs or whose estimate is off by more than RELATIVE_ACCURACY.
+    """
+    data = partitions.data_source()
+    values = {}
+    for row in db.session.execute(
+        select(data.ship_id, data.sample_point_id, *[getattr(data, c) for c, _ in SKETCH_COLUMNS])
+    ).mappings():
+        group = values.setdefault((row['ship_id'], row['sample_point_id']), {name: [] for name in SKETCH_NAMES})
+        for column, sketch_column in SKETCH_COLUMNS:
+            if row[column] is not None:
+                group[sketch_column].append(row[column])
+
+    merged = sketches.merge_rows(
+        db.session.execute(select(rollup_table.c.ship_id, rollup_table.c.sample_point_id, *sketch_columns())),
+        ('ship_id', 'sample_point_id'), SKETCH_NAMES
+    )
+
+    mismatches, largest_error = [], 0.0
+    for group in values.keys() | merged.keys():
+        for name in SKETCH_NAMES:
+            exact = values.get(group, {}).get(name, [])
+            sketch = merged.get(group, {}).get(name, sketches.Sketch())
+            if len(exact) != len(sketch):
+                mismatches.append({'group': group, 'column': name, 'samples': len(exact), 'sketched': len(sketch)})
+                continue
+            if not exact:
+                continue
+            for q in quantiles:
+                want, got = _exact_percentile(exact, q), sketch.quantile(q)
+                error = abs(got - want) / want if want else abs(got)
+                largest_error = max(largest_error, error)
+                if error > sketches.RELATIVE_ACCURACY + 1e-9:
+                    mismatches.append({'group': group, 'column': name, 'q': q, 'exact': want, 'sketch': got})
+    return mismatches, largest_error
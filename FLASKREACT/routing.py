@@ -0,0 +1,202 @@
+import itertools
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, text
+
+# Read/write routing over SQLALCHEMY_BINDS.
+#
+# Everything goes to the primary (the default bind) unless a view opts in with
+# use_replica(): the analytics blueprint does so for its GET routes. Such a
+# request is pinned to one healthy replica from READ_REPLICA_BINDS, picked round
+# robin. A replica is healthy when it answers and its replication lag is within
+# REPLICA_MAX_LAG_SECONDS; the result is cached for REPLICA_CHECK_INTERVAL
+# seconds, and a dropped connection marks it down at once. With no healthy
+# replica the request reads from the primary.
+#
+# Reads also stay on the primary for REPLICA_MAX_LAG_SECONDS after a write that
+# a replica may not have caught up with:
+#   - after a client's own writes (signup, imports), for that client only: the
+#     response sets a short-lived WRITE_COOKIE, so it reads its writes whichever
+#     worker serves it next;
+#   - after writes to Data in this process (note_data_write), for everyone,
+#     since cached responses are shared between clients.
+# The cookie only ever moves its holder's reads to the primary.
+
+WRITE_COOKIE = 'db_wrote_at'
+
+def _mysql_lag(connection):
+    try:
+        row = connection.execute(text('SHOW REPLICA STATUS')).mappings().first()
+        column = 'Seconds_Behind_Source'
+    except Exception:
+        # MySQL before 8.0.22
+        row = connection.execute(text('SHOW SLAVE STATUS')).mappings().first()
+        column = 'Seconds_Behind_Master'
+    if row is None:
+        return 0  # not replicating: a standalone copy
+    return row[column]
+
+
+# Replication delay in seconds per dialect; None means replication is broken.
+# Dialects not listed (e.g. SQLite files used as stand-ins) report 0.
+LAG_QUERIES = {
+    'mysql': _mysql_lag,
+}
+
+_last_data_write = float('-inf')
+
+
+class RoutingSession(FlaskSession):
+    """db.session class that sends reads of replica-routed requests to the chosen replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            engine = replica_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _note_write(session, flush_context):
+    session.info['routing_wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _start_lag_window(session):
+    if session.info.pop('routing_wrote', False):
+        note_write()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(session):
+    session.info.pop('routing_wrote', None)
+
+
+def note_write():
+    """Keep this client's reads on the primary for a lag window (call after writes that bypass the ORM session)."""
+    if has_request_context():
+        g.db_wrote = True
+
+
+def note_data_write():
+    """Keep every read of this process on the primary for a lag window, after a write to Data."""
+    global _last_data_write
+    _last_data_write = time.monotonic()
+    note_write()
+
+
+def recent_write(wrote_at, max_lag):
+    """Whether reads should stay on the primary, given the client's WRITE_COOKIE value (or None)."""
+    if time.monotonic() - _last_data_write < max_lag:
+        return True
+    try:
+        return time.time() - float(wrote_at) < max_lag
+    except (TypeError, ValueError):
+        return False
+
+
+class ReplicaSet:
+    """Health-checked replica bind keys of one app."""
+
+    def __init__(self, app):
+        self.app = app
+        self.binds = list(app.config['READ_REPLICA_BINDS'])
+        self._cycle = itertools.cycle(range(len(self.binds))) if self.binds else None
+        self._health = {}  # bind key -> (checked at, healthy, lag)
+        self._lock = threading.Lock()
+
+    def _check(self, engines, key):
+        try:
+            with engines[key].connect() as connection:
+                lag_query = LAG_QUERIES.get(connection.dialect.name)
+                lag = lag_query(connection) if lag_query else 0
+        except Exception:
+            return False, None
+        return lag is not None and lag <= self.app.config['REPLICA_MAX_LAG_SECONDS'], lag
+
+    def healthy(self, engines, key):
+        now = time.monotonic()
+        with self._lock:
+            checked = self._health.get(key)
+        if checked is None or now - checked[0] >= self.app.config['REPLICA_CHECK_INTERVAL']:
+            healthy, lag = self._check(engines, key)
+            checked = (now, healthy, lag)
+            with self._lock:
+                self._health[key] = checked
+        return checked[1]
+
+    def mark_down(self, key):
+        with self._lock:
+            self._health[key] = (time.monotonic(), False, None)
+
+    def pick_key(self, engines):
+        """The bind key of a healthy replica, or None to use the primary."""
+        if not self.binds:
+            return None
+        with self._lock:
+            start = next(self._cycle)
+        for offset in range(len(self.binds)):
+            key = self.binds[(start + offset) % len(self.binds)]
+            if self.healthy(engines, key):
+                return key
+        return None
+
+    def pick(self, engines):
+        """A healthy replica engine, or None to use the primary."""
+        key = self.pick_key(engines)
+        return engines[key] if key is not None else None
+
+    def status(self):
+        with self._lock:
+            health = dict(self._health)
+        return {
+            key: {'healthy': health[key][1], 'lag_seconds': health[key][2]} if key in health else None
+            for key in self.binds
+        }
+
+
+def init_app(app, db):
+    app.config.setdefault('READ_REPLICA_BINDS', [])
+    app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 30)
+    app.config.setdefault('REPLICA_CHECK_INTERVAL', 10)
+    replicas = app.extensions['replicas'] = ReplicaSet(app)
+
+    # Engines are created by db.init_app; watch the replicas' for dropped connections
+    with app.app_context():
+        for key in replicas.binds:
+            event.listen(db.engines[key], 'handle_error', mark_down_on_disconnect(replicas, key))
+
+    @app.after_request
+    def _remember_write(response):
+        if g.pop('db_wrote', False):
+            max_lag = app.config['REPLICA_MAX_LAG_SECONDS']
+            response.set_cookie(WRITE_COOKIE, f'{time.time():.3f}', max_age=max_lag, httponly=True, samesite='Lax')
+        return response
+
+
+def mark_down_on_disconnect(replicas, key):
+    """handle_error listener marking a replica down when its connection drops."""
+    def handle_error(context):
+        if context.is_disconnect:
+            replicas.mark_down(key)
+    return handle_error
+
+
+def use_replica():
+    """Route the rest of this request's reads to a replica (when one is healthy)."""
+    g.db_use_replica = True
+
+
+def replica_engine():
+    """The engine this request reads from, if it is routed to a replica; None for the primary."""
+    if not has_request_context() or not g.get('db_use_replica'):
+        return None
+    if 'db_replica' not in g:
+        wrote = recent_write(request.cookies.get(WRITE_COOKIE), current_app.config['REPLICA_MAX_LAG_SECONDS'])
+        g.db_replica = None if wrote else current_app.extensions['replicas'].pick(
+            current_app.extensions['sqlalchemy'].engines
+        )
+    return g.db_replica
@@ -0,0 +1,158 @@
+import gzip
+from datetime import date
+from flask import request, make_response, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+# Response encoding for the analytics endpoints. The row-per-dict JSON list stays
+# the default; `format=columnar` sends one array per field under a shared header,
+# clients that prefer application/msgpack get MessagePack, and bodies above
+# COMPRESS_MIN_SIZE are gzip/brotli compressed per Accept-Encoding. orjson,
+# msgpack and brotli are optional: without them the stdlib encoder is used,
+# MessagePack is never chosen and only gzip is offered. FastJSONProvider is
+# installed through metrics.TimedJSONProvider so encode time is still measured.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FORMATS = ['rows', 'columnar']
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Request headers respond() picks the body's encoding from, sent back in Vary
+# (with Accept-Encoding, added by the compression hook) so shared caches key on them
+VARY = ['Accept'] if msgpack is not None else []
+
+# Types worth compressing; everything else (images, already-compressed files) is left alone
+COMPRESSIBLE_MIMETYPES = {JSON_MIMETYPE, MSGPACK_MIMETYPE, 'text/csv', 'text/plain', 'text/html'}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider that encodes with orjson when it is installed.
+
+    Output matches the stdlib path (sorted keys, compact separators, dates via
+    the provider's default), except that NaN is written as null.
+    """
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.pop('indent', None)
+        kwargs.pop('separators', None)
+        if orjson is None or kwargs or indent not in (None, 2):
+            if indent is not None:
+                kwargs['indent'] = indent
+            return super().dumps(obj, **kwargs)
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+
+def requested_format():
+    """The `format` query parameter, or None if it is not one of FORMATS."""
+    value = request.args.get('format', 'rows')
+    return value if value in FORMATS else None
+
+
+def to_columnar(rows, fields=None):
+    """{'fields': [...], 'columns': [[...], ...]}: one array per field, in `fields` order."""
+    if fields is None:
+        fields = list(rows[0]) if rows else []
+    return {'fields': fields, 'columns': [[row[field] for row in rows] for field in fields]}
+
+
+def shape(rows, fields=None):
+    """Rows as requested by `format`: unchanged for 'rows', column arrays for 'columnar'."""
+    if request.args.get('format') == 'columnar':
+        return to_columnar(rows, fields)
+    return rows
+
+
+def wants_msgpack(accept_mimetypes=None):
+    """True when MessagePack is installed and the client prefers it over JSON."""
+    if msgpack is None:
+        return False
+    if accept_mimetypes is None:
+        accept_mimetypes = request.accept_mimetypes
+    return accept_mimetypes.best_match([JSON_MIMETYPE, MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE
+
+
+def response_variant():
+    """Representation chosen from request headers, for response cache keys."""
+    return MSGPACK_MIMETYPE if wants_msgpack() else None
+
+
+def _msgpack_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'Cannot serialise {type(value).__name__} to MessagePack')
+
+
+def respond(payload, status=200):
+    """Encode payload as MessagePack or JSON for the current request; return (response, status)."""
+    if wants_msgpack():
+        response = make_response(msgpack.packb(payload, default=_msgpack_default))
+        response.mimetype = MSGPACK_MIMETYPE
+    else:
+        response = jsonify(payload)
+    response.vary.update(VARY)
+    return response, status
+
+
+def choose_encoding(accept_encodings):
+    """'br' or 'gzip' from a parsed Accept-Encoding header, or None."""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return accept_encodings.best_match(offered)
+
+
+def compress(data, encoding, level=6):
+    if encoding == 'br':
+        # Brotli quality runs 0-11; map the gzip-style level onto it
+        return brotli.compress(data, quality=min(11, level))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def init_app(app):
+    """Compress eligible responses after each request.
+
+    COMPRESS_MIN_SIZE (bytes, None to disable) is the smallest body compressed;
+    COMPRESS_LEVEL is the gzip level (brotli quality) used.
+    """
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+
+    @app.after_request
+    def _compress_response(response):
+        threshold = app.config['COMPRESS_MIN_SIZE']
+        if (threshold is None or response.status_code != 200 or response.is_streamed
+                or response.direct_passthrough or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if response.calculate_content_length() < threshold:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        response.set_data(compress(response.get_data(), encoding, app.config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes differ from the identity body, so only a weak validator still holds
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
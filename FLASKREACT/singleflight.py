@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+# Request coalescing: while a computation for a key is running, callers asking
+# for the same key wait for it and get its result (or its exception) instead
+# of starting their own. Waiters give up after `timeout` seconds with
+# SingleFlightTimeout; the computation itself carries on for its own caller.
+
+
+class SingleFlightTimeout(Exception):
+    """An identical in-flight computation did not finish within the timeout."""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-key deduplication of concurrent calls, for threads (do) and asyncio tasks (do_async)."""
+
+    def __init__(self, timeout=30.0):
+        self.timeout = timeout
+        self._calls = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, function):
+        """Return function(), sharing one call among concurrent callers with the same key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.result = function()
+                return call.result
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if not call.done.wait(self.timeout):
+            self._timed_out()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def do_async(self, key, function):
+        """Like do(), for a coroutine function, among tasks of one event loop."""
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = asyncio.get_running_loop().create_future()
+                # Leader failures nobody waited for are not "never retrieved" errors
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                result = await function()
+                future.set_result(result)
+                return result
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            except BaseException:
+                future.cancel()
+                raise
+            finally:
+                with self._lock:
+                    del self._futures[key]
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._timed_out()
+
+    def _timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+        raise SingleFlightTimeout(f"Identical request still running after {self.timeout}s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls) + len(self._futures),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+            }
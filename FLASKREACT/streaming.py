@@ -0,0 +1,85 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import tuple_
+
+# Mimetypes that switch a list endpoint from one JSON document to a row-by-row stream
+STREAM_MIMETYPES = ['application/x-ndjson', 'text/csv']
+
+# Rows fetched from the database per keyset query while streaming
+STREAM_CHUNK_SIZE = 1000
+
+
+def stream_mimetype():
+    """The streaming mimetype the client asked for in Accept, or None for plain JSON."""
+    best = request.accept_mimetypes.best_match(['application/json'] + STREAM_MIMETYPES)
+    if best in STREAM_MIMETYPES and request.accept_mimetypes[best] > request.accept_mimetypes['application/json']:
+        return best
+    return None
+
+
+def encode_cursor(testdate, row_id):
+    """Opaque keyset cursor for the last row of a page, ordered by (testdate, id)."""
+    raw = f"{testdate.strftime('%Y-%m-%d')},{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        testdate, row_id = raw.split(',')
+        return datetime.strptime(testdate, '%Y-%m-%d').date(), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def after(testdate, row_id, last_testdate, last_id):
+    """Predicate for rows ordered after (last_testdate, last_id) by (testdate, id).
+
+    Written as a row-value comparison so it is one range on the (testdate, id)
+    index (ix_data_testdate_id); the equivalent OR of two conditions is not.
+    """
+    return tuple_(testdate, row_id) > tuple_(last_testdate, last_id)
+
+
+def keyset_chunks(statement, testdate, row_id, chunk_size, execute):
+    """Rows of `statement` in lists of up to `chunk_size`, one LIMIT query per list.
+
+    `statement` must be ordered by (testdate, id) and select both as `testdate`
+    and `id`; each query resumes after the last row of the previous one. Unlike
+    yield_per this bounds memory on every driver: mysql-connector has no
+    server-side cursor and buffers the whole result.
+    """
+    chunk = statement
+    while True:
+        rows = execute(chunk.limit(chunk_size)).all()
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+        chunk = statement.where(after(testdate, row_id, last.testdate, last.id))
+
+
+def ndjson_lines(rows):
+    """Encode dict rows as newline-delimited JSON, one line per row."""
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def csv_lines(rows, fields):
+    """Encode dict rows as CSV with a header line, one line per row."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,106 @@
+import pytest
+
+from benchmarks import generate
+
+# Synthetic samples shared by the whole session (see benchmarks/generate.py)
+ROWS = 3000
+
+
+@pytest.fixture(scope='session')
+def database_url(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('data') / 'data.db'}"
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('DATABASE_URL', url)
+        generate.populate(ROWS)
+    return url
+
+
+@pytest.fixture
+def app(database_url):
+    from app import create_app
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SLOW_REQUEST_SECONDS': None,
+        'RESPONSE_CACHE_MAX_ENTRIES': 0,
+    })
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def scratch_app(tmp_path, monkeypatch):
+    """An app on its own small database, for tests that write to Data."""
+    import cache
+    url = f"sqlite:///{tmp_path / 'scratch.db'}"
+    monkeypatch.setenv('DATABASE_URL', url)
+    # Versions committed against earlier scratch databases mean nothing in this one
+    monkeypatch.setattr(cache, '_own_versions', set())
+    monkeypatch.setattr(cache, '_seen_watermark', None)
+    generate.populate(500)
+    from app import create_app
+    return create_app({'SQLALCHEMY_DATABASE_URI': url, 'SLOW_REQUEST_SECONDS': None})
+
+
+def rollup_rows():
+    """The daily rollup as {key: {column: value}} without ids; needs an app context."""
+    import rollup
+    from sqlalchemy import select
+    from models import db
+
+    return {
+        tuple(row[name] for name in rollup.KEY_COLUMNS): {
+            name: value for name, value in row.items() if name != 'id' and name not in rollup.KEY_COLUMNS
+        }
+        for row in db.session.execute(select(rollup.rollup_table)).mappings()
+    }
+
+
+def assert_rollup_matches_rebuild():
+    """Rebuild the rollup from Data and check it equals what incremental maintenance left."""
+    import rollup
+    maintained = rollup_rows()
+    rollup.rebuild()
+    rebuilt = rollup_rows()
+    assert maintained.keys() == rebuilt.keys()
+    for key, values in rebuilt.items():
+        # Sums are added up in a different order, so compare them approximately
+        assert maintained[key] == {
+            name: pytest.approx(value) if name.startswith('sum_') else value for name, value in values.items()
+        }, key
+
+
+@pytest.fixture(scope='session')
+def asgi(database_url):
+    """The asgi module, imported against the test database."""
+    import importlib
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('DATABASE_URL', database_url)
+        return importlib.import_module('asgi')
+
+
+def call_asgi(application, path, query_string='', headers=()):
+    """GET `path` through an ASGI application; return (status, [(name, value)], body)."""
+    import asyncio
+
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': query_string.encode(), 'scheme': 'http', 'http_version': '1.1',
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 1234),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start = messages[0]
+    headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in start['headers']]
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], headers, body
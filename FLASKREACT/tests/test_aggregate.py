@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import func
+
+from models import db, Data
+
+YEAR = {'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+
+
+def test_empty_range_counts_zero(client):
+    response = client.get('/api/aggregate', query_string={
+        'metrics': 'count', 'start_date': '1900-01-01', 'end_date': '1900-01-02'
+    })
+    assert response.status_code == 200
+    assert response.get_json() == [{'count': 0}]
+
+
+@pytest.mark.parametrize('query', [
+    {'dimensions': 'Bogus'},
+    {'metrics': 'median_4_micron'},
+    {'dimensions': 'day,week'},
+    {'dimensions': 'Ship,Ship'},
+    {'metrics': 'count,count'},
+    {'start_date': '2024-02-30'},
+    {'format': 'xml'},
+])
+def test_rejects_parameters_outside_whitelist(client, query):
+    response = client.get('/api/aggregate', query_string=query)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_month_buckets_match_data(app, client):
+    response = client.get('/api/aggregate', query_string={'dimensions': 'month', 'metrics': 'count', **YEAR})
+    assert response.status_code == 200
+
+    with app.app_context():
+        expected = {}
+        for (testdate,) in db.session.query(Data.testdate).filter(Data.testdate.between('2024-01-01', '2024-12-31')):
+            month = testdate.replace(day=1).isoformat()
+            expected[month] = expected.get(month, 0) + 1
+    assert {row['month']: row['count'] for row in response.get_json()} == expected
+
+
+def test_min_max_come_from_data(app, client):
+    response = client.get('/api/aggregate', query_string={
+        'dimensions': 'Ship', 'metrics': 'min_4_micron,max_4_micron,avg_4_micron', 'Samp_Type': 'HCU', **YEAR
+    })
+    assert response.status_code == 200
+
+    with app.app_context():
+        column = Data.VLIMS_PARTICLE_COUNT_4_MICRON_SCALE
+        expected = {
+            row.Ship: (row.low, row.high, row.mean)
+            for row in db.session.query(
+                Data.Ship, func.min(column).label('low'), func.max(column).label('high'), func.avg(column).label('mean')
+            ).filter(Data.Samp_Type == 'HCU', Data.testdate.between('2024-01-01', '2024-12-31')).group_by(Data.Ship)
+        }
+    actual = {row['Ship']: row for row in response.get_json()}
+    assert actual.keys() == expected.keys()
+    for ship, (low, high, mean) in expected.items():
+        assert actual[ship]['min_4_micron'] == low
+        assert actual[ship]['max_4_micron'] == high
+        assert actual[ship]['avg_4_micron'] == pytest.approx(mean)
+
+
+@pytest.mark.parametrize('path, query', [
+    ('/api/sample-type-count', {'dimensions': 'Samp_Type'}),
+    ('/api/ship-hcu-count', {'dimensions': 'Ship', 'Samp_Type': 'HCU'}),
+    ('/api/purifier-count', {'dimensions': 'Ship', 'Samp_Type': 'Purifier'}),
+])
+def test_count_aliases_match_aggregate(client, path, query):
+    counts = client.get(path, query_string=YEAR).get_json()
+    rows = client.get('/api/aggregate', query_string={**query, 'metrics': 'count', **YEAR}).get_json()
+    assert counts == {row[query['dimensions']]: row['count'] for row in rows}
+
+
+def test_average_alias_matches_aggregate(client):
+    averages = client.get('/api/average-particle-count', query_string={**YEAR, 'ship_name': 'Ship 001'}).get_json()
+    rows = client.get('/api/aggregate', query_string={
+        'dimensions': 'vlims_lo_samp_point_Desc', 'metrics': 'avg_4_micron,avg_6_micron,avg_14_micron',
+        'Ship': 'Ship 001', 'vlims_lo_samp_point_Desc': [f'HCU#{i}' for i in range(1, 10)], **YEAR
+    }).get_json()
+
+    def average(value):
+        # The alias reports a group without readings as 0.0
+        return round(value, 2) if value else 0.0
+
+    assert averages == [
+        {
+            'Sample_Point': row['vlims_lo_samp_point_Desc'],
+            **{f'Average_Particle_Count_{size}_Micron': average(row[f'avg_{size}_micron']) for size in ('4', '6', '14')}
+        }
+        for row in rows
+    ]
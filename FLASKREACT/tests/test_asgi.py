@@ -0,0 +1,54 @@
+import pytest
+
+from conftest import call_asgi
+
+pytest.importorskip('aiosqlite')
+
+ORIGIN = 'http://dashboard.example.com'
+
+
+def _cors(headers):
+    """Access-Control-* headers and Vary tokens, case-insensitively."""
+    cors = {(name.lower(), value) for name, value in headers if name.lower().startswith('access-control-')}
+    vary = {token.strip().lower() for name, value in headers if name.lower() == 'vary' for token in value.split(',')}
+    return cors, vary
+
+
+@pytest.mark.parametrize('path, query', [
+    ('/api/sample-type-count', 'start_date=2024-01-01&end_date=2024-12-31'),
+    ('/api/average-particle-count', 'start_date=2024-01-01&end_date=2024-12-31&ship_name=all'),
+    ('/api/average-particle-count', 'start_date=2024-01-01'),
+])
+def test_native_routes_send_flask_cors_headers(asgi, path, query):
+    headers = [('Origin', ORIGIN), ('Accept-Encoding', 'gzip')]
+    flask_response = asgi.app.test_client().get(f'{path}?{query}', headers=headers)
+    assert asgi._served_natively({'headers': []}, asgi._query_args({'query_string': query.encode()}))
+    status, native_headers, body = call_asgi(asgi.application, path, query, headers)
+
+    assert status == flask_response.status_code
+    flask_cors, flask_vary = _cors(list(flask_response.headers.items()))
+    native_cors, native_vary = _cors(native_headers)
+    assert ('access-control-allow-origin', ORIGIN) in native_cors
+    assert ('access-control-allow-credentials', 'true') in native_cors
+    assert native_cors == flask_cors
+    assert native_vary == flask_vary
+
+
+@pytest.mark.parametrize('path', [
+    '/api/sample-type-count', '/api/ship-hcu-count', '/api/purifier-count',
+    '/api/average-particle-count', '/api/filtered-average-particle-count',
+])
+@pytest.mark.parametrize('query', [
+    '', 'start_date=2024-01-01', 'start_date=2024-01-01&end_date=2024-12-31', 'start_date=2024-13-01',
+    'start_date=2024-01-01&end_date=bad', 'start_date=2031-01-01&end_date=2031-12-31',
+    'start_date=2024-01-01&end_date=2024-12-31&ship_name=all',
+])
+def test_native_routes_answer_like_flask(asgi, path, query):
+    # Both modes share the response cache; compute each answer afresh
+    asgi.extensions.response_cache.clear()
+    flask_response = asgi.app.test_client().get(f'{path}?{query}')
+    asgi.extensions.response_cache.clear()
+    status, _, body = call_asgi(asgi.application, path, query)
+
+    assert status == flask_response.status_code
+    assert body == flask_response.get_data()
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+import extensions
+
+CREDENTIALS = {'email': 'pool@example.com', 'password': 'pool-password'}
+
+
+@pytest.fixture
+def auth_app(database_url):
+    from app import create_app
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SLOW_REQUEST_SECONDS': None,
+        'BCRYPT_LOG_ROUNDS': 4,
+        'PASSWORD_HASH_WORKERS': 1,
+        'PASSWORD_HASH_QUEUE_SIZE': 0,
+        'PASSWORD_HASH_RETRY_AFTER': 3,
+    })
+    yield app
+    extensions.bcrypt.shutdown()
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_login_verifies_password(auth_app):
+    client = auth_app.test_client()
+    assert client.post('/signup', json=CREDENTIALS).status_code in (201, 409)
+    assert client.post('/login', json=CREDENTIALS).status_code == 200
+    assert client.post('/login', json={**CREDENTIALS, 'password': 'wrong'}).status_code == 401
+
+
+def test_saturated_pool_answers_503_then_recovers(auth_app):
+    client = auth_app.test_client()
+    assert client.post('/signup', json=CREDENTIALS).status_code in (201, 409)
+
+    # Occupy the only hashing slot with a job that outlasts the login below
+    hasher = extensions.bcrypt
+    busy = threading.Thread(target=hasher._run, args=(time.sleep, 1))
+    busy.start()
+    _wait_for(lambda: hasher._slots._value == 0)
+
+    response = client.post('/login', json=CREDENTIALS)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
+    assert 'error' in response.get_json()
+
+    busy.join()
+    _wait_for(lambda: hasher._slots._value == 1)
+    assert client.post('/login', json=CREDENTIALS).status_code == 200
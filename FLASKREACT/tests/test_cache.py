@@ -0,0 +1,121 @@
+import time
+
+import pytest
+from sqlalchemy import text
+
+import cache
+from extensions import response_cache
+from models import db
+
+PATH = '/api/sample-type-count?start_date=2024-01-01&end_date=2024-12-31'
+
+
+@pytest.fixture
+def cached_app(database_url):
+    from app import create_app
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SLOW_REQUEST_SECONDS': None,
+        'RESPONSE_CACHE_MAX_ENTRIES': 64,
+        'DATA_VERSION_CHECK_INTERVAL': 0,
+    })
+    response_cache.clear()
+    yield app
+    response_cache.clear()
+
+
+def _expiry():
+    (entry,) = response_cache._entries.values()
+    return entry[1]
+
+
+def test_refresh_request_recomputes_and_restores_entry(cached_app):
+    client = cached_app.test_client()
+    assert client.get(PATH).status_code == 200
+    expires_at, hits, misses = _expiry(), response_cache.hits, response_cache.misses
+
+    response = client.get(PATH, environ_overrides={cache.REFRESH_ENVIRON: True})
+    assert response.status_code == 200
+    assert (response_cache.hits, response_cache.misses) == (hits, misses)
+    assert _expiry() > expires_at
+
+
+SECRET_KEY = 'test-secret'
+
+
+@pytest.mark.parametrize('header', [
+    None,
+    '',
+    'garbage',
+    cache.refresh_token('not the key'),
+    cache.refresh_token(SECRET_KEY, now=0),
+    # A fresh timestamp with the signature of another one
+    '{}.{}'.format(int(time.time()) - 1, cache.refresh_token(SECRET_KEY).partition('.')[2]),
+], ids=['missing', 'empty', 'garbage', 'wrong-key', 'stale', 'tampered'])
+def test_forged_refresh_header_is_served_from_cache(cached_app, header):
+    cached_app.config['SECRET_KEY'] = SECRET_KEY
+    client = cached_app.test_client()
+    client.get(PATH)
+    hits = response_cache.hits
+
+    client.get(PATH, headers={} if header is None else {cache.REFRESH_HEADER: header})
+    assert response_cache.hits == hits + 1
+
+
+def test_signed_refresh_header_bypasses_cache(cached_app):
+    cached_app.config['SECRET_KEY'] = SECRET_KEY
+    client = cached_app.test_client()
+    client.get(PATH)
+    hits = response_cache.hits
+
+    client.get(PATH, headers={cache.REFRESH_HEADER: cache.refresh_token(SECRET_KEY)})
+    assert response_cache.hits == hits
+
+
+def test_placeholder_secret_key_never_bypasses_cache(cached_app):
+    cached_app.config['SECRET_KEY'] = 'your_secret_key'
+    client = cached_app.test_client()
+    client.get(PATH)
+    hits = response_cache.hits
+
+    client.get(PATH, headers={cache.REFRESH_HEADER: cache.refresh_token('your_secret_key')})
+    assert response_cache.hits == hits + 1
+
+
+def test_write_by_another_process_invalidates_cache(cached_app):
+    client = cached_app.test_client()
+    client.get(PATH)
+    client.get(PATH)
+    misses = response_cache.misses
+
+    # What another worker's commit leaves behind
+    with cached_app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text('UPDATE data_version SET version = version + 1'))
+
+    assert client.get(PATH).status_code == 200
+    assert response_cache.misses == misses + 1
+
+
+@pytest.mark.parametrize('config, interval', [
+    ({}, 270),
+    ({'RESPONSE_CACHE_TTL': 20}, 1),
+    ({'CACHE_WARM_INTERVAL': 60}, 60),
+])
+def test_warm_interval_follows_ttl(database_url, config, interval):
+    from app import create_app
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, **config})
+    assert app.extensions['cache_warmer'].interval() == interval
+
+
+def test_earlier_watermark_from_a_lagging_reader_is_ignored(monkeypatch):
+    monkeypatch.setattr(cache, '_seen_watermark', None)
+    version = cache.data_version()
+    cache.observe_watermark((10, 500))
+    cache.observe_watermark((8, 480))
+    cache.observe_watermark((10, 500))
+    assert cache.data_version() == version
+
+    cache.observe_watermark((11, 500))
+    assert cache.data_version() == version + 1
+
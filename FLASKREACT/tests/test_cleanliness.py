@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import or_
+
+import cleanliness
+from models import db, Data
+
+YEAR = {'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+
+
+@pytest.mark.parametrize('count, number', [
+    (None, None),
+    (0, 0),
+    (0.01, 0),
+    (0.011, 1),
+    (0.64, 6),
+    (0.65, 7),
+    (1.3, 7),
+    (1.31, 8),
+    (2.5, 8),
+    (5000, 19),
+    (5000.1, 20),
+    (2500000, 28),
+    (2500001, 29),
+])
+def test_scale_number_upper_limits_are_inclusive(monkeypatch, count, number):
+    assert cleanliness.scale_number(count) == number
+    assert cleanliness.scale_numbers([count]) == [number]
+    # Without NumPy
+    monkeypatch.setattr(cleanliness, 'np', None)
+    assert cleanliness.scale_numbers([count]) == [number]
+
+
+def test_format_code():
+    assert cleanliness.format_code(19, 17, 14) == '19/17/14'
+    assert cleanliness.format_code(29, 28, None) == '>28/28/-'
+
+
+def test_orm_writes_get_codes(scratch_app):
+    with scratch_app.app_context():
+        row = db.session.query(Data).first()
+        row.VLIMS_PARTICLE_COUNT_4_MICRON_SCALE = 1.3
+        row.VLIMS_PARTICLE_COUNT_14_MICRON_SCALE = None
+        db.session.commit()
+        assert (row.iso_4406_4_micron, row.iso_4406_14_micron) == (7, None)
+
+
+def test_distribution_counts_every_coded_sample(app, client):
+    response = client.get('/api/cleanliness-distribution', query_string=YEAR)
+    assert response.status_code == 200
+    groups = response.get_json()
+    assert client.get('/api/cleanliness-distribution', query_string={**YEAR, 'ship_name': 'All'}).get_json() == groups
+
+    with app.app_context():
+        expected = db.session.query(Data).filter(
+            Data.testdate.between('2024-01-01', '2024-12-31'),
+            or_(Data.iso_4406_4_micron.isnot(None), Data.iso_4406_6_micron.isnot(None),
+                Data.iso_4406_14_micron.isnot(None))
+        ).count()
+    assert sum(group['Samples'] for group in groups) == expected
+    assert all(group['Samples'] == sum(group['Codes'].values()) for group in groups)
+
+
+def test_distribution_for_one_ship(client):
+    response = client.get('/api/cleanliness-distribution', query_string={**YEAR, 'ship_name': 'Ship 001'})
+    assert response.status_code == 200
+    assert {group['Ship'] for group in response.get_json()} == {'Ship 001'}
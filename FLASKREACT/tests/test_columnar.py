@@ -0,0 +1,104 @@
+import gc
+import threading
+from datetime import date
+
+import pytest
+from sqlalchemy import insert, text
+
+pytest.importorskip('numpy')
+
+import columnar
+import ingest
+from models import db, Data
+
+
+@pytest.fixture
+def store(app):
+    with app.app_context():
+        store = columnar.ColumnarStore(check_interval=0)
+        store.load()
+        yield store
+
+
+def test_parity_with_sql(store):
+    assert len(store) == db.session.query(Data).count()
+    assert columnar.check_parity(store) == []
+
+
+def _row(**values):
+    row = {
+        'Ship': 'Ship 999', 'Samp_Type': 'HCU', 'testdate': date(2024, 6, 1),
+        'vlims_lo_samp_point_Desc': 'HCU#1', 'VLIMS_PARTICLE_COUNT_4_MICRON_SCALE': 100.0,
+        'VLIMS_PARTICLE_COUNT_6_MICRON_SCALE': 10.0, 'VLIMS_PARTICLE_COUNT_14_MICRON_SCALE': 1.0,
+    }
+    row.update(values)
+    return row
+
+
+def _ship_count(store, ship):
+    return sum(row.count for row in store.aggregate(['Ship'], Ship=ship))
+
+
+@pytest.mark.parametrize('bump_version', [True, False], ids=['other-process', 'plain-sql'])
+def test_reloads_after_write_elsewhere(scratch_app, bump_version):
+    with scratch_app.app_context():
+        store = columnar.ColumnarStore(check_interval=0)
+        store.load()
+        assert _ship_count(store, 'Ship 999') == 0
+
+        # Written on a separate connection, the way another worker or a script would
+        with db.engine.begin() as connection:
+            connection.execute(insert(Data.__table__), [_row(), _row(testdate=date(2023, 1, 2))])
+            if bump_version:
+                connection.execute(text('UPDATE data_version SET version = version + 1'))
+        db.session.commit()
+
+        assert _ship_count(store, 'Ship 999') == 2
+        assert columnar.check_parity(store) == []
+
+
+def test_concurrent_requests_reload_once(store, app, monkeypatch):
+    loads = []
+    load = store._load
+
+    def counting_load():
+        loads.append(1)
+        load()
+
+    monkeypatch.setattr(store, '_load', counting_load)
+    store.stale = True
+    errors = []
+
+    def query():
+        try:
+            with app.app_context():
+                store.aggregate(['Samp_Type'])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=query) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(loads) == 1
+
+
+def test_tracked_stores_share_one_set_of_listeners(scratch_app):
+    receivers, tracked = len(ingest.rows_inserted.receivers), len(columnar._tracked)
+    with scratch_app.app_context():
+        first = columnar.track_writes(columnar.ColumnarStore(check_interval=60))
+        second = columnar.track_writes(columnar.ColumnarStore(check_interval=60))
+        first.load()
+        second.load()
+        assert len(ingest.rows_inserted.receivers) == receivers
+
+        db.session.add(Data(**_row()))
+        db.session.commit()
+        assert _ship_count(first, 'Ship 999') == _ship_count(second, 'Ship 999') == 1
+
+    # A store nothing else refers to stops receiving writes
+    del second
+    gc.collect()
+    assert len(columnar._tracked) == tracked + 1
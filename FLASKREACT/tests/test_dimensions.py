@@ -0,0 +1,69 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select, update
+
+import dimensions
+from models import db, Data, Ship, SamplePoint
+
+
+@pytest.fixture
+def dimension_app(scratch_app):
+    # The id cache is per process; start from what this database has committed
+    dimensions._clear_ids()
+    with scratch_app.app_context():
+        yield scratch_app
+    dimensions._clear_ids()
+
+
+def _ship_ids():
+    return dict(db.session.execute(select(Ship.name, Ship.id)).all())
+
+
+def test_ids_added_in_a_transaction_are_cached_on_commit(dimension_app):
+    connection = db.session.connection()
+    first = dimensions.resolve(connection, Ship, ['Ship 900', 'Ship 001', None])
+    # A second lookup in the same transaction sees the uncommitted row
+    assert dimensions.resolve(connection, Ship, ['Ship 900']) == {'Ship 900': first['Ship 900']}
+    assert 'Ship 900' not in dimensions._ids[Ship]
+
+    db.session.commit()
+    assert dimensions._ids[Ship]['Ship 900'] == first['Ship 900'] == _ship_ids()['Ship 900']
+
+
+def test_ids_added_in_a_rolled_back_transaction_are_not_cached(dimension_app):
+    connection = db.session.connection()
+    dimensions.resolve(connection, Ship, ['Ship 900'])
+    dimensions.resolve(connection, Ship, ['Ship 900'])
+    db.session.rollback()
+
+    assert 'Ship 900' not in dimensions._ids[Ship]
+    ids = dimensions.resolve(db.session.connection(), Ship, ['Ship 900'])
+    db.session.commit()
+    assert ids == {'Ship 900': _ship_ids()['Ship 900']}
+
+
+def test_orm_writes_get_keys(dimension_app):
+    row = Data(Ship='Ship 900', Samp_Type='HCU', testdate=date(2024, 3, 1), vlims_lo_samp_point_Desc='HCU#42')
+    db.session.add(row)
+    db.session.commit()
+    ship_id, point_id = row.ship_id, row.sample_point_id
+    assert db.session.get(Ship, ship_id).name == 'Ship 900'
+    assert db.session.get(SamplePoint, point_id).name == 'HCU#42'
+
+    row.Ship = 'Ship 001'
+    row.vlims_lo_samp_point_Desc = None
+    db.session.commit()
+    assert row.ship_id == _ship_ids()['Ship 001']
+    assert row.sample_point_id is None
+
+
+def test_backfill_fills_missing_keys(dimension_app):
+    expected = dict(db.session.execute(select(Data.id, Data.ship_id)).all())
+    db.session.execute(update(Data).where(Data.id % 3 == 0).values(ship_id=None))
+    db.session.commit()
+    nulls = sum(1 for id in expected if id % 3 == 0)
+
+    assert dimensions.backfill() == nulls
+    assert dict(db.session.execute(select(Data.id, Data.ship_id)).all()) == expected
+    assert dimensions.backfill() == 0
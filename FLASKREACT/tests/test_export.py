@@ -0,0 +1,25 @@
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+from models import db, Data
+
+
+@pytest.mark.parametrize('chunk_size', [1000, 7])
+def test_export_returns_every_row_once_in_order(app, client, chunk_size):
+    app.config['EXPORT_CHUNK_SIZE'] = chunk_size
+    response = client.get('/api/export?format=arrow&start_date=2024-01-01&end_date=2024-12-31')
+    assert response.status_code == 200
+
+    reader = pa.ipc.open_stream(response.get_data())
+    batches = list(reader)
+    assert all(batch.num_rows <= chunk_size for batch in batches)
+    table = pa.Table.from_batches(batches, reader.schema)
+
+    with app.app_context():
+        expected = [
+            (row.testdate, row.id) for row in db.session.query(Data.testdate, Data.id)
+            .filter(Data.testdate.between('2024-01-01', '2024-12-31')).order_by(Data.testdate, Data.id)
+        ]
+    assert expected
+    assert list(zip(table.column('testdate').to_pylist(), table.column('id').to_pylist())) == expected
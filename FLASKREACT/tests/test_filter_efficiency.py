@@ -0,0 +1,77 @@
+from datetime import date
+
+import pytest
+
+from models import db, Data
+
+# One ship's BEFORE / AFTER FILTER samples in March 2030, as
+# (day, sample point, 4, 6 and 14 micron counts). Day 2 has no AFTER sample,
+# day 3 no BEFORE sample; some sizes were not read.
+SAMPLES = [
+    (1, 'BEFORE FILTER', 100, 40, 10),
+    (1, 'AFTER FILTER', 20, 10, None),
+    (2, 'BEFORE FILTER', 300, 60, 30),
+    (3, 'AFTER FILTER', 40, None, 5),
+    (4, 'BEFORE FILTER', 200, 20, None),
+    (4, 'AFTER FILTER', 50, 30, 2),
+]
+MARCH = {'ship_name': 'Ship 950', 'start_date': '2030-03-01', 'end_date': '2030-03-31', 'bucket': 'month'}
+
+
+@pytest.fixture
+def march_client(scratch_app):
+    with scratch_app.app_context():
+        db.session.add_all([
+            Data(Ship='Ship 950', Samp_Type='Purifier', testdate=date(2030, 3, day), vlims_lo_samp_point_Desc=point,
+                 VLIMS_PARTICLE_COUNT_4_MICRON_SCALE=count_4, VLIMS_PARTICLE_COUNT_6_MICRON_SCALE=count_6,
+                 VLIMS_PARTICLE_COUNT_14_MICRON_SCALE=count_14)
+            for day, point, count_4, count_6, count_14 in SAMPLES
+        ])
+        db.session.commit()
+    return scratch_app.test_client()
+
+
+def test_averages_every_sample_on_each_side(march_client):
+    response = march_client.get('/api/filter-efficiency', query_string=MARCH)
+    assert response.status_code == 200
+    assert response.get_json() == [{
+        'Ship': 'Ship 950', 'Bucket_Start': '2030-03-01', 'Before_Samples': 3, 'After_Samples': 3,
+        # (100 + 300 + 200) / 3 against (20 + 40 + 50) / 3
+        'Before_Average_Particle_Count_4_Micron': 200.0, 'After_Average_Particle_Count_4_Micron': 36.67,
+        'Reduction_Ratio_4_Micron': 0.8167,
+        # (40 + 60 + 20) / 3 against (10 + 30) / 2
+        'Before_Average_Particle_Count_6_Micron': 40.0, 'After_Average_Particle_Count_6_Micron': 20.0,
+        'Reduction_Ratio_6_Micron': 0.5,
+        # (10 + 30) / 2 against (5 + 2) / 2
+        'Before_Average_Particle_Count_14_Micron': 20.0, 'After_Average_Particle_Count_14_Micron': 3.5,
+        'Reduction_Ratio_14_Micron': 0.825,
+    }]
+
+
+def test_paired_compares_only_days_read_on_both_sides(march_client):
+    response = march_client.get('/api/filter-efficiency', query_string={**MARCH, 'paired': 'true'})
+    assert response.status_code == 200
+    assert response.get_json() == [{
+        # Days 1 and 4
+        'Ship': 'Ship 950', 'Bucket_Start': '2030-03-01', 'Before_Samples': 2, 'After_Samples': 2,
+        # (100 + 200) / 2 against (20 + 50) / 2
+        'Before_Average_Particle_Count_4_Micron': 150.0, 'After_Average_Particle_Count_4_Micron': 35.0,
+        'Reduction_Ratio_4_Micron': 0.7667,
+        # (40 + 20) / 2 against (10 + 30) / 2
+        'Before_Average_Particle_Count_6_Micron': 30.0, 'After_Average_Particle_Count_6_Micron': 20.0,
+        'Reduction_Ratio_6_Micron': 0.3333,
+        # No day has a 14 micron reading on both sides
+        'Before_Average_Particle_Count_14_Micron': 0.0, 'After_Average_Particle_Count_14_Micron': 0.0,
+        'Reduction_Ratio_14_Micron': None,
+    }]
+
+
+def test_day_buckets(march_client):
+    response = march_client.get('/api/filter-efficiency', query_string={**MARCH, 'bucket': 'day'})
+    assert response.status_code == 200
+    rows = response.get_json()
+    assert [(row['Bucket_Start'], row['Before_Samples'], row['After_Samples']) for row in rows] == [
+        ('2030-03-01', 1, 1), ('2030-03-02', 1, 0), ('2030-03-03', 0, 1), ('2030-03-04', 1, 1),
+    ]
+    assert rows[0]['Reduction_Ratio_4_Micron'] == 0.8
+    assert rows[1]['Reduction_Ratio_4_Micron'] is None
@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+import pytest
+
+from downsample import lttb
+
+HCU = {'ship': 'Ship 001', 'startYear': 2020, 'endYear': 2024}
+
+
+def _by_series(rows):
+    series = defaultdict(list)
+    for row in rows:
+        series[row['Sample_Point']].append(row)
+    return series
+
+
+@pytest.fixture
+def details(client):
+    response = client.get('/api/ship-hcu-details', query_string=HCU)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+@pytest.mark.parametrize('query', [{'points': 2}, {'points': 'many'}, {'bucket': 'year'}])
+def test_rejects_invalid_downsampling(client, query):
+    assert client.get('/api/ship-hcu-details', query_string={**HCU, **query}).status_code == 400
+
+
+@pytest.mark.parametrize('points', [3, 4])
+def test_points_keeps_at_most_n_rows_per_series(client, details, points):
+    response = client.get('/api/ship-hcu-details', query_string={**HCU, 'points': points})
+    assert response.status_code == 200
+    rows = response.get_json()
+
+    full = _by_series(details)
+    kept = _by_series(rows)
+    assert kept.keys() == full.keys()
+    assert any(len(series) > points for series in full.values())
+    for name, series in full.items():
+        assert len(kept[name]) == min(points, len(series))
+        # The ends of every series survive, and nothing is made up
+        assert kept[name][0] == series[0] and kept[name][-1] == series[-1]
+        assert all(row in series for row in kept[name])
+
+
+def test_month_buckets_summarise_samples(client, details):
+    response = client.get('/api/ship-hcu-details', query_string={**HCU, 'bucket': 'month'})
+    assert response.status_code == 200
+
+    expected = defaultdict(list)
+    for row in details:
+        expected[row['Sample_Point'], row['Test_Date'][:8] + '01'].append(row['Particle_Count_4_Micron'])
+    buckets = {(row['Sample_Point'], row['Bucket_Start']): row for row in response.get_json()}
+    assert buckets.keys() == expected.keys()
+    for key, values in expected.items():
+        assert buckets[key]['Count'] == len(values)
+        # Missing counts read as 0.0 in the detail rows but are left out of the bucket's statistics
+        readings = [value for value in values if value] or [0.0]
+        assert buckets[key]['Max_Particle_Count_4_Micron'] == pytest.approx(max(readings), abs=0.01)
+        assert buckets[key]['Average_Particle_Count_4_Micron'] == pytest.approx(
+            sum(readings) / len(readings), abs=0.01)
+
+
+def test_lttb_picks_one_set_of_points_for_several_lines():
+    # The second line's only spike is at x=5; a single-line pass over the first would miss it
+    points = [(x, float(x), 10.0 if x == 5 else 0.0) for x in range(12)]
+    keep = lttb(points, 4)
+    assert len(keep) == 4
+    assert keep[0] == 0 and keep[-1] == 11
+    assert 5 in keep
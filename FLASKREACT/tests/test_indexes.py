@@ -0,0 +1,77 @@
+import re
+
+import pytest
+from sqlalchemy import event, select
+
+import streaming
+from models import db, Data
+
+# The filtered analytics queries must be served by the composite indexes
+# (ix_data_*), not by a scan of Data. Each request's SQL is captured as it runs
+# and its plan read back with SQLite's EXPLAIN QUERY PLAN.
+
+
+def _capture(app, run):
+    """(statement, parameters) of every SELECT executed while run() runs."""
+    captured = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        run()
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    return captured
+
+
+def _statements(app, client, path, query):
+    responses = []
+    captured = _capture(app, lambda: responses.append(client.get(path, query_string=query)))
+    (response,) = responses
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return captured
+
+
+def _plan(app, statement, parameters):
+    with app.app_context():
+        connection = db.session.connection().connection.driver_connection
+        rows = connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        return '\n'.join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize('path, query, table, index', [
+    ('/api/ship-hcu-details', {'ship': 'Ship 001', 'startYear': 2023, 'endYear': 2024},
+     'data', 'ix_data_ship_id_sample_point_id_testdate'),
+    ('/api/aggregate', {'dimensions': 'Ship', 'metrics': 'max_4_micron', 'Samp_Type': 'HCU',
+                        'start_date': '2024-01-01', 'end_date': '2024-06-30'},
+     'data', 'ix_data_samp_type_testdate_ship_id'),
+    ('/api/ship-hcu-count', {'start_date': '2024-01-01', 'end_date': '2024-06-30'},
+     'data_daily_rollup', 'ix_data_daily_rollup_samp_type_testdate'),
+])
+def test_filtered_queries_use_index(app, client, path, query, table, index):
+    statements = _statements(app, client, path, query)
+    # The cache's data_version watermark poll reads MAX(data.id) by primary key
+    plans = [_plan(app, statement, parameters) for statement, parameters in statements
+             if re.search(rf'\bFROM {table}\b', statement) and 'data_version' not in statement]
+    assert plans, statements
+    for plan in plans:
+        assert re.search(rf'SEARCH {table} USING (COVERING )?INDEX {index} ', plan), plan
+
+
+def test_keyset_chunks_seek_on_testdate_id_index(app):
+    def run():
+        with app.app_context():
+            statement = select(Data.id, Data.testdate).order_by(Data.testdate, Data.id)
+            chunks = streaming.keyset_chunks(statement, Data.testdate, Data.id, 500, db.session.execute)
+            next(chunks)
+            next(chunks)
+
+    # The second query resumes after the first chunk, and must seek there rather than scan from the start
+    (_, (statement, parameters)) = _capture(app, run)
+    plan = _plan(app, statement, parameters)
+    assert re.search(r'SEARCH data USING (COVERING )?INDEX ix_data_testdate_id ', plan), plan
@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+import ingest
+from conftest import assert_rollup_matches_rebuild
+from models import db, Data
+
+HEADER = 'Ship,Samp_Type,testdate,sample_point,particle_count_4_micron,particle_count_6_micron,particle_count_14_micron'
+
+
+def _import(lines, chunk_size=5000):
+    stream = io.BytesIO('\n'.join([HEADER, *lines]).encode())
+    return ingest.import_rows(ingest.read_export(stream, 'export.csv'), chunk_size=chunk_size)
+
+
+@pytest.mark.parametrize('line, error', [
+    (',HCU,2024-03-01,HCU#1,1,1,1', 'Ship and Samp_Type are required'),
+    ('Ship 900,HCU,2024-31-01,HCU#1,1,1,1', 'Invalid testdate'),
+    ('Ship 900,HCU,2024-03-01,HCU#1,-5,1,1', 'cannot be negative'),
+    ('Ship 900,HCU,2024-03-01,HCU#1,many,1,1', 'Invalid VLIMS_PARTICLE_COUNT_4_MICRON_SCALE'),
+    ('Ship 900,HCU,2024-03-01,HCU#1,nan,1,1', 'Invalid VLIMS_PARTICLE_COUNT_4_MICRON_SCALE'),
+    ('Ship 900,HCU,2024-03-01,HCU#1,1,inf,1', 'Invalid VLIMS_PARTICLE_COUNT_6_MICRON_SCALE'),
+    ('Ship 900,HCU,2024-03-01,HCU#1,1,1,-inf', 'Invalid VLIMS_PARTICLE_COUNT_14_MICRON_SCALE'),
+])
+def test_invalid_row_is_rejected_alone(scratch_app, line, error):
+    with scratch_app.app_context():
+        summary = _import(['Ship 900,HCU,2024-03-02,HCU#1,10,5,1', line])
+
+        assert (summary['inserted'], summary['rejected']) == (1, 1)
+        (rejection,) = summary['rejections']
+        assert rejection['row'] == 3
+        assert error in rejection['error']
+        assert db.session.query(Data).filter_by(Ship='Ship 900').count() == 1
+
+
+def test_duplicates_are_skipped(scratch_app):
+    lines = ['Ship 900,HCU,2024-03-01,HCU#1,10,5,1', 'Ship 900,HCU,2024-03-01,HCU#2,20,6,2']
+    with scratch_app.app_context():
+        first = _import(lines + lines[:1])
+        assert (first['inserted'], first['duplicates']) == (2, 1)
+
+        # Rows already stored are skipped on a second import
+        second = _import(lines + ['Ship 900,HCU,2024-03-02,HCU#1,10,5,1'])
+        assert (second['inserted'], second['duplicates']) == (1, 2)
+        assert db.session.query(Data).filter_by(Ship='Ship 900').count() == 3
+
+
+def test_rollup_matches_rebuild_after_import(scratch_app):
+    lines = [
+        f'Ship {ship:03d},{samp_type},2024-0{month}-1{ship % 10},{point},{ship * 10 + month},{month},'
+        for ship in range(1, 30) for month in range(1, 4)
+        for samp_type, point in (('HCU', f'HCU#{month}'), ('Purifier', 'BEFORE FILTER'))
+    ]
+    with scratch_app.app_context():
+        summary = _import(lines, chunk_size=17)
+        assert summary['inserted'] == len(lines)
+        assert_rollup_matches_rebuild()
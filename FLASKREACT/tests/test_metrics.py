@@ -0,0 +1,57 @@
+import logging
+import uuid
+
+import pytest
+
+import metrics
+from app import create_app
+
+
+@pytest.fixture
+def slow_app(database_url):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SLOW_REQUEST_SECONDS': 0,
+        'RESPONSE_CACHE_MAX_ENTRIES': 0,
+        'DATA_VERSION_CHECK_INTERVAL': 3600,
+        'PASSWORD_HASH_WORKERS': 0,
+        'BCRYPT_LOG_ROUNDS': 4,
+    })
+
+
+def test_slow_request_log_redacts_user_data(slow_app, caplog):
+    email = f'{uuid.uuid4().hex}@example.com'
+    with caplog.at_level(logging.WARNING):
+        response = slow_app.test_client().post('/signup', json={'email': email, 'password': 'hunter2hunter2'})
+    assert response.status_code == 201
+
+    logged = caplog.text
+    assert 'Slow request POST /signup' in logged
+    assert 'INSERT INTO user' in logged
+    assert metrics.REDACTED in logged
+    assert email not in logged
+    assert '$2b$' not in logged
+
+
+def test_slow_request_log_includes_bound_parameters(slow_app, caplog):
+    with caplog.at_level(logging.WARNING):
+        response = slow_app.test_client().get('/api/purifier-count?start_date=2023-02-01&end_date=2023-03-31')
+    assert response.status_code == 200
+
+    logged = caplog.text
+    assert 'Slow request GET /api/purifier-count' in logged
+    assert "'Purifier'" in logged
+    assert '2023-02-01' in logged
+
+
+def _rows_fetched(endpoint):
+    _, total = metrics.DB_ROWS._series.get(endpoint, (None, 0))
+    return total
+
+
+def test_rows_fetched_are_counted(slow_app):
+    client = slow_app.test_client()
+    ships = client.get('/api/ships').get_json()
+    before = _rows_fetched('get_ships')
+    client.get('/api/ships')
+    assert _rows_fetched('get_ships') - before == len(ships) > 0
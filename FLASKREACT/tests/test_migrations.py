@@ -0,0 +1,20 @@
+import migrations
+import rollup
+from conftest import assert_rollup_matches_rebuild
+
+
+def test_upgrade_rebuilds_rollup_once(scratch_app, monkeypatch):
+    rebuilds = []
+    rebuild = rollup.rebuild
+
+    def counting_rebuild():
+        rebuilds.append(1)
+        return rebuild()
+
+    monkeypatch.setattr(rollup, 'rebuild', counting_rebuild)
+    with scratch_app.app_context():
+        assert migrations.upgrade() == [version for version, _ in migrations.MIGRATIONS]
+        assert rebuilds == [1]
+        assert migrations.upgrade() == []
+        assert rebuilds == [1]
+        assert_rollup_matches_rebuild()
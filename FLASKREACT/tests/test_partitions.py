@@ -0,0 +1,49 @@
+from sqlalchemy import func, select, text
+
+import partitions
+from extensions import response_cache
+from models import db, Data, DataArchive
+
+DETAILS = {'ship': 'Ship 001', 'startYear': 2020, 'endYear': 2022}
+
+
+def _ids(source, first_year, last_year):
+    statement = select(source.id).where(source.testdate.between(f'{first_year}-01-01', f'{last_year}-12-31'))
+    return set(db.session.scalars(statement))
+
+
+def test_archived_year_is_still_read(scratch_app):
+    client = scratch_app.test_client()
+    before = client.get('/api/ship-hcu-details', query_string=DETAILS).get_json()
+
+    with scratch_app.app_context():
+        total = db.session.query(Data).count()
+        in_2021 = _ids(Data, 2021, 2021)
+        assert in_2021
+
+        assert partitions.archive_year(2021) == len(in_2021)
+        # Gone from the hot table, in its cold table, and recorded
+        assert _ids(Data, 2021, 2021) == set()
+        cold = partitions.cold_table(2021)
+        assert set(db.session.scalars(select(cold.c.id))) == in_2021
+        assert db.session.get(DataArchive, 2021).rows == len(in_2021)
+
+        # Routed reads and the union view see every row once
+        assert _ids(partitions.data_source(2020, 2022), 2021, 2021) == in_2021
+        assert partitions.data_source(2022, 2024) is Data
+        view_rows = db.session.execute(text(f'SELECT COUNT(*), COUNT(DISTINCT id) FROM {partitions.UNION_VIEW}'))
+        assert tuple(view_rows.one()) == (total, total)
+
+    response_cache.clear()
+    assert client.get('/api/ship-hcu-details', query_string=DETAILS).get_json() == before
+
+
+def test_archive_before_moves_each_older_year(scratch_app):
+    with scratch_app.app_context():
+        first = db.session.execute(select(func.min(Data.testdate))).scalar().year
+        counts = {year: len(_ids(Data, year, year)) for year in range(first, 2022)}
+
+        moved = partitions.archive_before(2022)
+        assert moved == {year: count for year, count in counts.items() if count}
+        assert partitions.archived_years() == sorted(moved)
+        assert db.session.execute(select(func.min(Data.testdate))).scalar().year == 2022
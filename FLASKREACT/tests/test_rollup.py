@@ -0,0 +1,46 @@
+from datetime import date
+
+from sqlalchemy import select
+
+from conftest import assert_rollup_matches_rebuild
+from models import db, Data
+
+
+def _rows(*ids):
+    return db.session.scalars(select(Data).where(Data.id.in_(ids)).order_by(Data.id)).all()
+
+
+def test_orm_insert_update_delete_keep_rollup_in_step(scratch_app):
+    with scratch_app.app_context():
+        db.session.add_all([
+            Data(Ship='Ship 001', Samp_Type='HCU', testdate=date(2024, 6, 1), vlims_lo_samp_point_Desc='HCU#1',
+                 VLIMS_PARTICLE_COUNT_4_MICRON_SCALE=120.5, VLIMS_PARTICLE_COUNT_6_MICRON_SCALE=30.0),
+            # A new ship and sample point, and a row without particle counts
+            Data(Ship='Ship 900', Samp_Type='Purifier', testdate=date(2024, 6, 1),
+                 vlims_lo_samp_point_Desc='BEFORE FILTER'),
+        ])
+        db.session.commit()
+        assert_rollup_matches_rebuild()
+
+        first, second, third = db.session.scalars(select(Data).order_by(Data.id).limit(3)).all()
+        # Changes to a counted value, to the day, and to a key column
+        first.VLIMS_PARTICLE_COUNT_4_MICRON_SCALE = None
+        second.testdate = date(2019, 1, 1)
+        third.Ship = 'Ship 900'
+        db.session.commit()
+        assert_rollup_matches_rebuild()
+
+        for row in _rows(first.id, second.id):
+            db.session.delete(row)
+        db.session.commit()
+        assert_rollup_matches_rebuild()
+
+
+def test_rolled_back_writes_leave_rollup_alone(scratch_app):
+    with scratch_app.app_context():
+        (row,) = db.session.scalars(select(Data).order_by(Data.id).limit(1)).all()
+        row.VLIMS_PARTICLE_COUNT_6_MICRON_SCALE = 10 ** 6
+        db.session.add(Data(Ship='Ship 901', Samp_Type='HCU', testdate=date(2024, 6, 2)))
+        db.session.flush()
+        db.session.rollback()
+        assert_rollup_matches_rebuild()
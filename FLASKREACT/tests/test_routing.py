@@ -0,0 +1,123 @@
+import json
+import shutil
+import sqlite3
+import time
+
+import pytest
+
+import routing
+from conftest import call_asgi
+
+# Two SQLite files stand in for a primary and its read replica. The replica
+# is missing the Purifier rollup rows, so /api/purifier-count shows which one
+# answered: {} from the replica, counts from the primary.
+
+PURIFIER_COUNT = '/api/purifier-count'
+
+
+@pytest.fixture
+def replicated_app(database_url, tmp_path, monkeypatch):
+    source = database_url.removeprefix('sqlite:///')
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    shutil.copy(source, primary)
+    shutil.copy(source, replica)
+    with sqlite3.connect(replica) as connection:
+        connection.execute("DELETE FROM data_daily_rollup WHERE Samp_Type = 'Purifier'")
+
+    monkeypatch.setattr(routing, '_last_data_write', float('-inf'))
+    from app import create_app
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'SQLALCHEMY_BINDS': {'replica1': f'sqlite:///{replica}'},
+        'READ_REPLICA_BINDS': ['replica1'],
+        'RESPONSE_CACHE_MAX_ENTRIES': 0,
+        'SLOW_REQUEST_SECONDS': None,
+        'PASSWORD_HASH_WORKERS': 0,
+        'BCRYPT_LOG_ROUNDS': 4,
+    })
+
+
+def _read_from_primary(client):
+    response = client.get(PURIFIER_COUNT)
+    assert response.status_code == 200
+    return response.get_json() != {}
+
+
+def test_analytics_reads_go_to_the_replica(replicated_app):
+    assert not _read_from_primary(replicated_app.test_client())
+    assert replicated_app.extensions['replicas'].status() == {'replica1': {'healthy': True, 'lag_seconds': 0}}
+
+
+def test_write_keeps_only_the_writer_on_the_primary(replicated_app):
+    writer, other = replicated_app.test_client(), replicated_app.test_client()
+    response = writer.post('/signup', json={'email': 'writer@example.com', 'password': 'hunter2hunter2'})
+    assert response.status_code == 201
+    assert routing.WRITE_COOKIE in response.headers['Set-Cookie']
+
+    assert _read_from_primary(writer)
+    assert not _read_from_primary(other)
+
+
+def test_write_cookie_expires_with_the_lag_window(replicated_app):
+    client = replicated_app.test_client()
+    max_lag = replicated_app.config['REPLICA_MAX_LAG_SECONDS']
+    client.set_cookie(routing.WRITE_COOKIE, str(time.time() - max_lag - 1))
+    assert not _read_from_primary(client)
+    client.set_cookie(routing.WRITE_COOKIE, 'garbage')
+    assert not _read_from_primary(client)
+
+
+def test_data_write_keeps_everyone_on_the_primary(replicated_app):
+    with replicated_app.app_context():
+        routing.note_data_write()
+    assert _read_from_primary(replicated_app.test_client())
+
+
+def test_unhealthy_replica_falls_back_to_primary(replicated_app):
+    replicated_app.extensions['replicas'].mark_down('replica1')
+    assert _read_from_primary(replicated_app.test_client())
+
+
+def test_asgi_routes_reads_like_flask(asgi, replicated_app, monkeypatch):
+    monkeypatch.setattr(asgi, 'app', replicated_app)
+    monkeypatch.setattr(asgi, '_engines', {})
+
+    status, _, body = call_asgi(asgi.application, PURIFIER_COUNT)
+    assert status == 200 and json.loads(body) == {}
+
+    cookie = f'{routing.WRITE_COOKIE}={time.time():.3f}'
+    status, _, body = call_asgi(asgi.application, PURIFIER_COUNT, headers=[('Cookie', cookie)])
+    assert status == 200 and json.loads(body) != {}
+
+
+def test_replicas_at_different_lag_do_not_flush_cache(database_url, tmp_path, monkeypatch):
+    from extensions import response_cache
+
+    # Two replicas whose data_version lag the primary's by one and two writes
+    source = database_url.removeprefix('sqlite:///')
+    binds = {}
+    for lag in (1, 2):
+        replica = tmp_path / f'replica{lag}.db'
+        shutil.copy(source, replica)
+        with sqlite3.connect(replica) as connection:
+            connection.execute('UPDATE data_version SET version = version - ?', (lag,))
+        binds[f'replica{lag}'] = f'sqlite:///{replica}'
+
+    monkeypatch.setattr(routing, '_last_data_write', float('-inf'))
+    from app import create_app
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SQLALCHEMY_BINDS': binds,
+        'READ_REPLICA_BINDS': list(binds),
+        'SLOW_REQUEST_SECONDS': None,
+        'RESPONSE_CACHE_MAX_ENTRIES': 64,
+        'DATA_VERSION_CHECK_INTERVAL': 0,
+    })
+    response_cache.clear()
+    client = app.test_client()
+    client.get(PURIFIER_COUNT)
+    hits = response_cache.hits
+    for _ in range(4):
+        assert client.get(PURIFIER_COUNT).status_code == 200
+    assert response_cache.hits == hits + 4
+    response_cache.clear()
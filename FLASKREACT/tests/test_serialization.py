@@ -0,0 +1,38 @@
+import pytest
+
+import serialization
+from extensions import response_cache
+
+msgpack = pytest.importorskip('msgpack')
+
+PATH = '/api/ship-hcu-count?start_date=2024-01-01&end_date=2024-12-31'
+
+
+@pytest.fixture
+def cached_client(database_url):
+    from app import create_app
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'SLOW_REQUEST_SECONDS': None})
+    response_cache.clear()
+    yield app.test_client()
+    response_cache.clear()
+
+
+@pytest.mark.parametrize('accept, mimetype', [
+    ('application/json', serialization.JSON_MIMETYPE),
+    ('application/msgpack', serialization.MSGPACK_MIMETYPE),
+])
+def test_negotiated_responses_vary_on_accept(cached_client, accept, mimetype):
+    miss = cached_client.get(PATH, headers={'Accept': accept})
+    hit = cached_client.get(PATH, headers={'Accept': accept})
+    not_modified = cached_client.get(PATH, headers={'Accept': accept, 'If-None-Match': hit.headers['ETag']})
+
+    assert (miss.status_code, hit.status_code, not_modified.status_code) == (200, 200, 304)
+    assert miss.mimetype == hit.mimetype == mimetype
+    for response in (miss, hit, not_modified):
+        assert 'Accept' in response.vary
+
+
+def test_json_and_msgpack_bodies_match(cached_client):
+    as_json = cached_client.get(PATH).get_json()
+    as_msgpack = msgpack.unpackb(cached_client.get(PATH, headers={'Accept': 'application/msgpack'}).get_data())
+    assert as_msgpack == as_json
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from flask import jsonify
+
+from extensions import response_cache
+from singleflight import SingleFlight, SingleFlightTimeout
+
+
+def _run_together(count, target):
+    """Run target(i) on `count` threads; return their results (or exceptions) in order."""
+    results = [None] * count
+
+    def run(i):
+        try:
+            results[i] = target(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_concurrent_calls_share_one_computation():
+    flights = SingleFlight(timeout=5)
+    release, calls = threading.Event(), []
+
+    def compute():
+        calls.append(1)
+        release.wait()
+        return 'result'
+
+    threads, results = _run_together(4, lambda i: flights.do('key', compute))
+    _wait_for(lambda: flights.coalesced == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ['result'] * 4
+    assert flights.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 3, 'timeouts': 0}
+
+
+def test_waiters_share_the_error():
+    flights = SingleFlight(timeout=5)
+    release = threading.Event()
+
+    def compute():
+        release.wait()
+        raise ValueError('boom')
+
+    threads, results = _run_together(3, lambda i: flights.do('key', compute))
+    _wait_for(lambda: flights.coalesced == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert [type(result) for result in results] == [ValueError] * 3
+
+
+def test_waiters_time_out_while_the_leader_carries_on():
+    flights = SingleFlight(timeout=0.1)
+    release = threading.Event()
+
+    def compute():
+        release.wait()
+        return 'result'
+
+    threads, results = _run_together(1, lambda i: flights.do('key', compute))
+    _wait_for(lambda: flights.leaders == 1)
+    with pytest.raises(SingleFlightTimeout):
+        flights.do('key', compute)
+    release.set()
+    threads[0].join()
+    assert results == ['result']
+    assert flights.timeouts == 1
+
+
+def test_concurrent_tasks_share_one_computation():
+    flights = SingleFlight(timeout=5)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    async def main():
+        return await asyncio.gather(*[flights.do_async('key', compute) for _ in range(4)])
+
+    assert asyncio.run(main()) == ['result'] * 4
+    assert calls == [1]
+
+
+@pytest.fixture
+def slow_app(database_url):
+    """An app with a cached view that runs until `release` is set."""
+    from app import create_app
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SLOW_REQUEST_SECONDS': None,
+        'SINGLE_FLIGHT_TIMEOUT': 0.2,
+    })
+    app.release, app.calls = threading.Event(), []
+
+    @app.route('/slow')
+    @response_cache.cached
+    def slow():
+        app.calls.append(1)
+        app.release.wait(5)
+        return jsonify({'answer': 42})
+
+    response_cache.clear()
+    yield app
+    app.release.set()
+    response_cache.clear()
+
+
+def test_identical_misses_run_the_view_once(slow_app):
+    flights = response_cache.flights
+    flights.timeout, coalesced = 5, flights.coalesced
+    threads, responses = _run_together(4, lambda i: slow_app.test_client().get('/slow?x=1'))
+    _wait_for(lambda: flights.coalesced == coalesced + 3)
+    slow_app.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert slow_app.calls == [1]
+    assert flights.coalesced == coalesced + 3
+    assert [response.get_json() for response in responses] == [{'answer': 42}] * 4
+
+
+def test_waiter_that_times_out_gets_503(slow_app):
+    threads, responses = _run_together(1, lambda i: slow_app.test_client().get('/slow?x=2'))
+    _wait_for(lambda: slow_app.calls)
+
+    response = slow_app.test_client().get('/slow?x=2')
+    assert response.status_code == 503
+    assert 'error' in response.get_json()
+
+    slow_app.release.set()
+    threads[0].join()
+    assert responses[0].status_code == 200
+    assert slow_app.calls == [1]
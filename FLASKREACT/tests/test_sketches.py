@@ -0,0 +1,87 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+np = pytest.importorskip('numpy')
+
+import rollup
+import sketches
+from models import db, Data
+
+# Fixed samples with their exact percentiles at rank floor(q * (n - 1)),
+# numpy.percentile(..., method='lower'), which the sketch bound is stated against
+VALUES = [250.0, 0.0, 12.0, 1.0, 1000.0, 3.0, 40.0, 2.5, 100.0, 10.0]
+EXACT = {0.0: 0.0, 0.1: 0.0, 0.5: 10.0, 0.9: 250.0, 0.99: 250.0, 1.0: 1000.0}
+
+
+def _within_bound(estimate, exact):
+    return abs(estimate - exact) <= sketches.RELATIVE_ACCURACY * exact
+
+
+def _sketch(values):
+    sketch = sketches.Sketch()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+@pytest.mark.parametrize('q, expected', sorted(EXACT.items()))
+def test_exact_percentiles(q, expected):
+    assert rollup._exact_percentile(VALUES, q) == expected
+    assert float(np.percentile(VALUES, q * 100, method='lower')) == expected
+
+
+@pytest.mark.parametrize('q, expected', sorted(EXACT.items()))
+def test_sketch_within_relative_accuracy(q, expected):
+    assert _within_bound(_sketch(VALUES).quantile(q), expected)
+
+
+def test_bound_holds_on_skewed_sample():
+    values = np.random.default_rng(4406).lognormal(7, 1.5, 5000)
+    sketch = _sketch(values)
+    for q in (0.01, 0.25, 0.5, 0.9, 0.99, 0.999):
+        assert _within_bound(sketch.quantile(q), np.percentile(values, q * 100, method='lower'))
+
+
+def test_merge_and_remove_match_one_sketch():
+    whole = _sketch(VALUES)
+    merged = _sketch(VALUES[:4]).merge(_sketch(VALUES[4:]))
+    assert merged.counts == whole.counts
+    assert sketches.Sketch.from_bytes(merged.to_bytes()).counts == whole.counts
+
+    removed = _sketch(VALUES).merge({bucket: -count for bucket, count in _sketch(VALUES[:4]).counts.items()})
+    assert removed.counts == _sketch(VALUES[4:]).counts
+    assert sketches.Sketch().quantile(0.5) is None
+
+
+def test_rollup_sketches_match_data(app):
+    with app.app_context():
+        mismatches, largest_error = rollup.check_sketches()
+    assert mismatches == []
+    assert largest_error <= sketches.RELATIVE_ACCURACY
+
+
+def test_endpoint_percentiles_against_numpy(app, client):
+    start, end = date(2023, 1, 1), date(2024, 12, 31)
+    response = client.get('/api/average-particle-count', query_string={
+        'start_date': start, 'end_date': end, 'ship_name': 'all', 'stats': 'p50,p90'
+    })
+    assert response.status_code == 200
+
+    with app.app_context():
+        rows = db.session.execute(select(Data.vlims_lo_samp_point_Desc, Data.VLIMS_PARTICLE_COUNT_4_MICRON_SCALE).where(
+            Data.Samp_Type == 'HCU', Data.testdate.between(start, end),
+            Data.VLIMS_PARTICLE_COUNT_4_MICRON_SCALE.isnot(None)
+        )).all()
+    samples = {}
+    for point, value in rows:
+        samples.setdefault(point, []).append(value)
+
+    items = response.get_json()
+    assert {item['Sample_Point'] for item in items} == set(samples)
+    for item in items:
+        for name, q in (('P50', 0.5), ('P90', 0.9)):
+            exact = np.percentile(samples[item['Sample_Point']], q * 100, method='lower')
+            # Responses are rounded to two decimals
+            assert abs(item[f'{name}_Particle_Count_4_Micron'] - exact) <= sketches.RELATIVE_ACCURACY * exact + 0.005
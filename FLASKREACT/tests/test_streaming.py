@@ -0,0 +1,18 @@
+import json
+
+import pytest
+
+import streaming
+
+QUERY = {'ship': 'Ship 001', 'startYear': 2020, 'endYear': 2024}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_stream_matches_json_across_chunk_boundaries(client, monkeypatch, chunk_size):
+    expected = client.get('/api/ship-hcu-details', query_string=QUERY).get_json()
+    monkeypatch.setattr(streaming, 'STREAM_CHUNK_SIZE', chunk_size)
+
+    response = client.get('/api/ship-hcu-details', query_string=QUERY, headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert rows == expected
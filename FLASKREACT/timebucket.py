@@ -0,0 +1,52 @@
+from sqlalchemy import Date
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+# Calendar buckets a date column can be truncated to
+BUCKETS = ['day', 'week', 'month']
+
+
+class date_bucket(FunctionElement):
+    """First day of the day/week (Monday)/month bucket containing a date column.
+
+    Compiled per dialect so the GROUP BY runs in the database:
+        date_bucket('month', Data.testdate)
+    """
+    type = Date()
+    name = 'date_bucket'
+    inherit_cache = True
+    # The unit changes the generated SQL, so it must be part of the statement cache key
+    _traverse_internals = FunctionElement._traverse_internals + [('unit', InternalTraversal.dp_string)]
+
+    def __init__(self, unit, column):
+        if unit not in BUCKETS:
+            raise ValueError(f"Unknown bucket {unit!r}. Use one of: {', '.join(BUCKETS)}")
+        self.unit = unit
+        super().__init__(column)
+
+
+def _column(element, compiler, **kw):
+    return compiler.process(list(element.clauses)[0], **kw)
+
+
+@compiles(date_bucket)
+def _compile_default(element, compiler, **kw):
+    # MySQL / MariaDB
+    column = _column(element, compiler, **kw)
+    if element.unit == 'week':
+        return f"DATE_SUB({column}, INTERVAL WEEKDAY({column}) DAY)"
+    if element.unit == 'month':
+        return f"CAST(DATE_FORMAT({column}, '%%Y-%%m-01') AS DATE)"
+    return f"DATE({column})"
+
+
+@compiles(date_bucket, 'sqlite')
+def _compile_sqlite(element, compiler, **kw):
+    column = _column(element, compiler, **kw)
+    if element.unit == 'week':
+        return f"date({column}, '-6 days', 'weekday 1')"
+    if element.unit == 'month':
+        return f"date({column}, 'start of month')"
+    return f"date({column})"
+
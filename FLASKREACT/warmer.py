@@ -0,0 +1,250 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from sqlalchemy import func, select
+from models import db, Ship, DataDailyRollup
+import cache
+
+# Precomputes the standard dashboard windows into the response cache, so the
+# first viewer after an import does not pay for every aggregation.
+#
+# Windows: the last 30/90/365 days, year to date, and each calendar year with
+# data. Endpoints: the three count routes and both average routes fleet-wide,
+# plus /api/average-particle-count per ship. Each target is fetched like a
+# client would (start_date / end_date, ship_name only when per ship), so it
+# lands under the key real requests use and coalesces with identical live ones.
+#
+# Warming requests are refresh requests (cache.REFRESH_ENVIRON / REFRESH_HEADER):
+# they recompute and re-store their response even while it is cached, so every
+# pass restarts the TTL of all targets. Passes start every CACHE_WARM_INTERVAL
+# seconds, by default RESPONSE_CACHE_TTL less CACHE_WARM_MARGIN, so entries are
+# replaced before they expire. A pass also runs once Data has changed and then
+# been quiet for CACHE_WARM_IMPORT_DELAY seconds; changes are seen through the
+# data version, which includes writes made by other processes (imports from
+# `flask import-data`, other workers).
+#
+# In process, a daemon thread started by the first request does this. As a CLI
+# worker (`flask warm-cache --url ... --watch`) it requests a running server
+# over HTTP instead; each request warms whichever server worker answers it.
+
+log = logging.getLogger(__name__)
+
+FLEET_ENDPOINTS = [
+    '/api/sample-type-count',
+    '/api/ship-hcu-count',
+    '/api/purifier-count',
+    '/api/average-particle-count',
+    '/api/filtered-average-particle-count',
+]
+PER_SHIP_ENDPOINTS = ['/api/average-particle-count']
+
+ROLLING_WINDOWS = [('last_30_days', 30), ('last_90_days', 90), ('last_365_days', 365)]
+
+
+def windows(today, first_year):
+    """(name, start, end) for every standard window as of `today`."""
+    result = [(name, today - timedelta(days=days - 1), today) for name, days in ROLLING_WINDOWS]
+    result.append(('year_to_date', today.replace(month=1, day=1), today))
+    for year in range(first_year, today.year + 1):
+        result.append((str(year), date(year, 1, 1), date(year, 12, 31)))
+    return result
+
+
+def targets(today=None):
+    """(window name, path) for every response to warm; needs an app context."""
+    today = today or date.today()
+    first = db.session.execute(select(func.min(DataDailyRollup.testdate))).scalar()
+    ships = [name for (name,) in db.session.execute(select(Ship.name).order_by(Ship.name))]
+
+    result = []
+    for name, start, end in windows(today, first.year if first else today.year):
+        span = {'start_date': start.isoformat(), 'end_date': end.isoformat()}
+        result += [(name, f'{endpoint}?{urlencode(span)}') for endpoint in FLEET_ENDPOINTS]
+        result += [
+            (name, f'{endpoint}?{urlencode({**span, "ship_name": ship})}')
+            for endpoint in PER_SHIP_ENDPOINTS for ship in ships
+        ]
+    return result
+
+
+def http_fetch(base_url, secret_key, timeout=300):
+    """fetch() for a running server at base_url, sharing this app's SECRET_KEY."""
+    if secret_key in cache.PLACEHOLDER_SECRET_KEYS:
+        log.warning("SECRET_KEY is the placeholder: the server ignores refresh requests, so cached "
+                    "responses are only warmed once they have expired")
+
+    def fetch(path):
+        headers = {cache.REFRESH_HEADER: cache.refresh_token(secret_key)}
+        try:
+            with urlopen(Request(base_url.rstrip('/') + path, headers=headers), timeout=timeout) as response:
+                response.read()
+                return response.status
+        except HTTPError as e:
+            return e.code
+    return fetch
+
+
+class CacheWarmer:
+    """Warms targets() with at most CACHE_WARM_CONCURRENCY requests at a time and records their freshness."""
+
+    def __init__(self, app):
+        self.app = app
+        self._results = {}  # path -> {'window', 'status', 'warmed_at', 'seconds', 'data_version'}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.running = False
+        self.last_run = None
+
+    def interval(self):
+        """Seconds between the starts of two passes."""
+        config = self.app.config
+        if config['CACHE_WARM_INTERVAL'] is not None:
+            return config['CACHE_WARM_INTERVAL']
+        return max(1, config['RESPONSE_CACHE_TTL'] - config['CACHE_WARM_MARGIN'])
+
+    def _client_fetch(self, path):
+        return self.app.test_client().get(path, environ_overrides={cache.REFRESH_ENVIRON: True}).status_code
+
+    def warm(self, fetch=None):
+        """Fetch every target once; return a summary of the pass."""
+        fetch = fetch or self._client_fetch
+        with self.app.app_context():
+            work = targets()
+        capacity = self.app.config['RESPONSE_CACHE_MAX_ENTRIES']
+        if len(work) > capacity:
+            log.warning("Warming %d responses into a cache of %d entries evicts most of them; "
+                        "raise RESPONSE_CACHE_MAX_ENTRIES", len(work), capacity)
+
+        def one(target):
+            window, path = target
+            version = cache.data_version()
+            started = time.perf_counter()
+            try:
+                status = fetch(path)
+            except Exception as e:
+                log.warning("Warming %s failed: %s", path, e)
+                status = None
+            with self._lock:
+                self._results[path] = {
+                    'window': window,
+                    'status': status,
+                    'warmed_at': time.time(),
+                    'seconds': round(time.perf_counter() - started, 3),
+                    'data_version': version,
+                }
+            return status
+
+        self.running = True
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.app.config['CACHE_WARM_CONCURRENCY']) as pool:
+                statuses = list(pool.map(one, work))
+        finally:
+            self.running = False
+        self.last_run = {
+            'finished_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'seconds': round(time.perf_counter() - started, 3),
+            'targets': len(work),
+            # 404 is the endpoints' answer for a window without data; it is not cached
+            'empty': statuses.count(404),
+            'failed': sum(1 for status in statuses if status not in (200, 404)),
+        }
+        return self.last_run
+
+    def status(self):
+        """Per-target freshness: warmed with status 200 against the current data, within the cache TTL."""
+        now = time.time()
+        ttl = self.app.config['RESPONSE_CACHE_TTL']
+        with self._lock:
+            results = dict(self._results)
+        entries = [
+            {
+                'path': path,
+                **result,
+                'fresh': (result['status'] == 200 and result['data_version'] == cache.data_version()
+                          and now - result['warmed_at'] < ttl),
+            }
+            for path, result in sorted(results.items())
+        ]
+        return {
+            'running': self.running,
+            'interval_seconds': self.interval(),
+            'last_run': self.last_run,
+            'fresh': sum(1 for entry in entries if entry['fresh']),
+            'targets': entries,
+        }
+
+    def start(self):
+        """Start the background thread (once per process)."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name='cache-warmer', daemon=True)
+        self._thread.start()
+
+    def _data_version(self):
+        with self.app.app_context():
+            cache.sync_data_version(self.app.config['DATA_VERSION_CHECK_INTERVAL'])
+        return cache.data_version()
+
+    def run(self, fetch=None, interval=None, report=None):
+        """Warm every `interval` seconds (default: interval()) and after Data changes, forever.
+
+        `report`, if given, is called with the summary of each pass.
+        """
+        poll = self.app.config['DATA_VERSION_CHECK_INTERVAL']
+        delay = self.app.config['CACHE_WARM_IMPORT_DELAY']
+        warmed_version = seen_version = cache.data_version()
+        changed_at = None
+        next_pass = time.monotonic() + (interval or self.interval())
+        while True:
+            time.sleep(max(0, min(poll, next_pass - time.monotonic())))
+            try:
+                version = self._data_version()
+            except Exception:
+                log.exception("Reading the data version failed")
+                version = seen_version
+            if version != seen_version:
+                seen_version, changed_at = version, time.monotonic()
+
+            # After a change, let a multi-chunk import finish before warming against it
+            settled = version != warmed_version and time.monotonic() - changed_at >= delay
+            if not settled and time.monotonic() < next_pass:
+                continue
+
+            started = time.monotonic()
+            warmed_version = version
+            try:
+                summary = self.warm(fetch)
+                if report is not None:
+                    report(summary)
+            except Exception:
+                log.exception("Cache warming pass failed")
+            next_pass = started + (interval or self.interval())
+
+
+def init_app(app):
+    app.config.setdefault('CACHE_WARM_ENABLED', False)
+    app.config.setdefault('CACHE_WARM_INTERVAL', None)
+    app.config.setdefault('CACHE_WARM_MARGIN', 30)
+    app.config.setdefault('CACHE_WARM_IMPORT_DELAY', 30)
+    app.config.setdefault('CACHE_WARM_CONCURRENCY', 2)
+    app.config.setdefault('DATA_VERSION_CHECK_INTERVAL', 2)
+    warmer = app.extensions['cache_warmer'] = CacheWarmer(app)
+    if not app.config['CACHE_WARM_ENABLED']:
+        return
+    if warmer.interval() >= app.config['RESPONSE_CACHE_TTL']:
+        log.warning("CACHE_WARM_INTERVAL (%ss) is not below RESPONSE_CACHE_TTL (%ss): warmed responses "
+                    "expire between passes", warmer.interval(), app.config['RESPONSE_CACHE_TTL'])
+
+    # Started from a request rather than here, so each forked server worker runs its own
+    @app.before_request
+    def _start_cache_warmer():
+        warmer.start()